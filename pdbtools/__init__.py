@@ -96,6 +96,7 @@ __all__ = [
     'pdb_merge',
     'pdb_mkensemble',
     'pdb_occ',
+    'pdb_pipe',
     'pdb_reatom',
     'pdb_reres',
     'pdb_rplchain',
@@ -105,6 +106,7 @@ __all__ = [
     'pdb_selaltloc',
     'pdb_selatom',
     'pdb_selchain',
+    'pdb_select',
     'pdb_selelem',
     'pdb_selhetatm',
     'pdb_selresname',
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar representation of the coordinate records of a PDB file.
+
+Reads the ATOM, HETATM, ANISOU, and TER records of a PDB file and stores their
+fields column by column: numerical fields in `array.array` objects, text
+fields in lists of (unstripped) strings. Every other line is kept as-is, so
+that the table can be written back as the exact original text.
+
+Columns are parsed when first read, with one bulk slice and conversion per
+column, so that tools only pay for the fields they use. Atom serial numbers
+and residue numbers are read and written in hybrid-36, as written by
+pdb_reatom and pdb_reres above 99999 and 9999.
+
+Columns can be replaced with `set_column`, which checks that every value fits
+the width of its field. When writing, only the replaced columns are formatted
+again; the remaining fields are copied from the original lines.
+
+Tables can be built from any line iterator: `read_tables` reads a file as a
+series of tables, so that large files are processed a piece at a time rather
+than kept in memory.
+
+This module is not a tool. It is meant to be used by other pdb-tools that need
+to operate on whole columns of the structure, e.g.:
+
+>>> from pdbtools._atomtable import AtomTable
+>>> with open('1CTF.pdb') as fh:
+>>>     table = AtomTable.from_lines(fh)
+>>> x = table.column('x')
+>>> table.set_column('x', [xi + 10.0 for xi in x])
+>>> print(''.join(table.lines()))
+"""
+
+from array import array
+from itertools import repeat
+
+from pdbtools import _hybrid36
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+RECORDS = ('ATOM', 'HETATM', 'ANISOU', 'TER')
+
+# name: (start, end, type, format)
+# Column limits follow the PDB format specification (0-based, end exclusive).
+# Integer ('i') fields are hybrid-36 numbers of the width of the field.
+FIELDS = {
+    'record': (0, 6, 's', None),
+    'serial': (6, 11, 'i', None),
+    'name': (12, 16, 's', None),
+    'altloc': (16, 17, 's', None),
+    'resname': (17, 20, 's', None),
+    'chain': (21, 22, 's', None),
+    'resseq': (22, 26, 'i', None),
+    'icode': (26, 27, 's', None),
+    'x': (30, 38, 'f', '{:>8.3f}'),
+    'y': (38, 46, 'f', '{:>8.3f}'),
+    'z': (46, 54, 'f', '{:>8.3f}'),
+    'occ': (54, 60, 'f', '{:>6.2f}'),
+    'b': (60, 66, 'f', '{:>6.2f}'),
+    'segid': (72, 76, 's', None),
+    'element': (76, 78, 's', None),
+    'charge': (78, 80, 's', None),
+}
+
+MISSING_INT = -99999  # for empty or non-numerical integer fields
+MISSING_FLOAT = float('nan')  # for empty or non-numerical float fields
+
+CHUNK_ROWS = 1000000  # rows per table in `read_tables`
+
+
+def _int_column(values, width):
+    """Converts a list of strings to an array of integers."""
+    try:
+        return array('l', map(int, values))
+    except ValueError:  # hybrid-36, empty, or invalid fields, slow path
+        column = array('l')
+        for value in values:
+            try:
+                column.append(_hybrid36.decode(value, width))
+            except ValueError:
+                column.append(MISSING_INT)
+        return column
+
+
+def _float_column(values):
+    """Converts a list of strings to an array of floats."""
+    try:
+        return array('d', map(float, values))
+    except ValueError:  # empty or invalid fields, slow path
+        column = array('d')
+        for value in values:
+            try:
+                column.append(float(value))
+            except ValueError:
+                column.append(MISSING_FLOAT)
+        return column
+
+
+def _format_column(name, values):
+    """
+    Writes the values of a column as text, padded to the width of the field.
+
+    Missing values are written as blank fields. Raises ValueError if a value
+    does not fit in the field.
+    """
+    start, end, ftype, fmt = FIELDS[name]
+    width = end - start
+    blank = ' ' * width
+
+    text = []
+    for value in values:
+        if ftype == 'i':
+            if value == MISSING_INT:
+                field = blank
+            else:
+                try:
+                    field = _hybrid36.encode(value, width)
+                except ValueError:
+                    field = None
+        elif ftype == 'f':
+            field = fmt.format(value) if value == value else blank  # NaN
+        else:
+            field = value.ljust(width)
+
+        if field is None or len(field) > width:
+            emsg = 'Value does not fit in column \'{}\' ({} characters): {!r}'
+            raise ValueError(emsg.format(name, width, value))
+        text.append(field)
+    return text
+
+
+def _splice(line, start, end, text):
+    """Replaces line[start:end] by text, padding the line if necessary."""
+    body = line.rstrip('\r\n')
+    eol = line[len(body):]
+    if len(body) <= start and not text.strip():
+        return line  # e.g. short TER lines, nothing to write.
+    if len(body) < end:
+        body = body.ljust(end)
+    return body[:start] + text + body[end:] + eol
+
+
+def _read_model(line, previous):
+    """Reads the number of a MODEL record, or counts from the previous one."""
+    try:
+        return int(line[10:14])
+    except ValueError:
+        return previous + 1
+
+
+def _head(fhandle, size, records):
+    """Yields lines up to and including the `size`-th record of `records`."""
+    n_rows = 0
+    for line in fhandle:
+        yield line
+        if line.startswith(records):
+            n_rows += 1
+            if n_rows == size:
+                return
+
+
+def _field(name):
+    """Returns the (start, end, type, format) of a column. Raises KeyError."""
+    try:
+        return FIELDS[name]
+    except KeyError:
+        emsg = 'Unknown column: \'{}\'. Valid columns: {}'
+        raise KeyError(emsg.format(name, ', '.join(sorted(FIELDS))))
+
+
+class AtomTable(object):
+    """
+    Column-oriented table of the coordinate records of a PDB file.
+
+    Attributes
+    ----------
+    model : array of ints
+        Model number of each row, as read from the previous MODEL record,
+        or the initial model number (0 by default) if there is none.
+
+    models : list of ints
+        Numbers of the MODEL records of the table, in order, including
+        models without coordinate records.
+    """
+
+    def __init__(self, lines, rows, model, models):
+        self._lines = lines  # all lines of the file
+        self._rows = rows  # index of each row in self._lines
+        self._columns = {}  # parsed columns, by name
+        self._text = {}  # formatted text of the modified columns
+        self.model = model
+        self.models = models
+
+    @classmethod
+    def from_lines(cls, fhandle, model=0, records=RECORDS):
+        """
+        Build a table from a line-by-line iterator of a PDB file.
+
+        Parameters
+        ----------
+        fhandle : a line-by-line iterator of the original PDB file.
+
+        model : int
+            Model number of the rows before the first MODEL record.
+
+        records : tuple of str
+            Records to read as rows, e.g. ('ATOM', 'HETATM'). By default,
+            the coordinate records in RECORDS.
+
+        Returns
+        -------
+        AtomTable
+        """
+        lines = list(fhandle)
+        rows = array('l', [i for i, line in enumerate(lines)
+                           if line.startswith(records)])
+        starts = [i for i, line in enumerate(lines)
+                  if line.startswith('MODEL')]
+
+        if not starts:  # single model, the common case
+            return cls(lines, rows, array('l', repeat(model, len(rows))), [])
+
+        models = []
+        previous = model
+        for i in starts:
+            previous = _read_model(lines[i], previous)
+            models.append(previous)
+
+        # Model of each row, from the last MODEL record before it.
+        row_models = array('l')
+        n_starts = len(starts)
+        k = 0
+        for i in rows:
+            while k < n_starts and starts[k] < i:
+                model = models[k]
+                k += 1
+            row_models.append(model)
+
+        return cls(lines, rows, row_models, models)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def column(self, name):
+        """Returns the values of a column, e.g. 'resseq' or 'x'."""
+        try:
+            return self._columns[name]
+        except KeyError:
+            start, end, ftype, _ = _field(name)
+
+        lines = self._lines
+        values = [lines[i][start:end] for i in self._rows]
+        if ftype == 'i':
+            values = _int_column(values, end - start)
+        elif ftype == 'f':
+            values = _float_column(values)
+        self._columns[name] = values
+        return values
+
+    def set_column(self, name, values):
+        """
+        Replaces the values of a column.
+
+        Parameters
+        ----------
+        name : str
+            Name of the column, e.g. 'resseq' or 'chain'.
+
+        values : iterable
+            New values of the column, one per row. Numbers are written in
+            the format of the field (hybrid-36 for 'serial' and 'resseq'),
+            and text is left-justified to the width of the field.
+
+        Raises
+        ------
+        ValueError
+            If the number of values does not match the number of rows, or
+            a value does not fit in the width of the field.
+        """
+        _, _, ftype, _ = _field(name)
+        if ftype == 'i':
+            values = array('l', values)
+        elif ftype == 'f':
+            values = array('d', values)
+        else:
+            values = list(values)
+
+        if len(values) != len(self._rows):
+            emsg = 'Column \'{}\' must have {} values, not {}'
+            raise ValueError(emsg.format(name, len(self._rows), len(values)))
+
+        self._text[name] = _format_column(name, values)
+        self._columns[name] = values
+
+    def lines(self):
+        """
+        Writes the table as PDB text.
+
+        This function is a generator.
+
+        Yields
+        ------
+        str (line-by-line)
+            The PDB lines. Lines of unmodified rows are yielded unchanged.
+        """
+        if not self._text:
+            for line in self._lines:
+                yield line
+            return
+
+        updates = [(FIELDS[name][0], FIELDS[name][1], text)
+                   for name, text in sorted(self._text.items())]
+
+        rows = iter(enumerate(self._rows))
+        rowidx, lineidx = next(rows, (None, None))
+        for idx, line in enumerate(self._lines):
+            if idx == lineidx:
+                for start, end, text in updates:
+                    line = _splice(line, start, end, text[rowidx])
+                rowidx, lineidx = next(rows, (None, None))
+            yield line
+
+
+def read_tables(fhandle, size=CHUNK_ROWS, records=RECORDS):
+    """
+    Reads a PDB file as a series of tables.
+
+    Each table holds up to `size` rows and the other lines around them, so
+    that writing the tables one after the other gives back the whole file.
+    Model numbers carry over from one table to the next.
+
+    This function is a generator.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    size : int
+        Maximum number of rows per table.
+
+    records : tuple of str
+        Records to read as rows. See `AtomTable.from_lines`.
+
+    Yields
+    ------
+    AtomTable
+    """
+    fhandle = iter(fhandle)
+    model = 0
+    while True:
+        table = AtomTable.from_lines(_head(fhandle, size, records), model,
+                                     records)
+        if not table._lines:
+            return
+        yield table
+        if table.models:
+            model = table.models[-1]
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Converts many files to an output directory, in one or more processes.
+
+Used by the conversion tools (e.g. pdb_fromcif, pdb_tocif) when given the
+-outdir option, and by pdb_fetch to download many structures. Directories given as input are searched recursively for files
+with the expected extensions, and their structure is kept in the output
+directory. Output files newer than their input file are not converted again.
+
+Each file is converted on its own: if a file cannot be converted, the error is
+reported and the remaining files are converted as usual. Output files are
+written under a temporary name and renamed when complete.
+
+This module is not a tool.
+"""
+
+from functools import partial
+import importlib
+import io
+import multiprocessing
+import os
+import sys
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+except ImportError:  # Python 2
+    ProcessPoolExecutor = None
+
+from pdbtools import _stream
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+_replace = getattr(os, 'replace', os.rename)  # Python 2
+
+
+def parse_outdir(option):
+    """
+    Reads the output directory from an '-outdir:<directory>' option.
+
+    Returns the directory, or None if the option is not -outdir. Exits if
+    the directory is missing or is a file.
+    """
+    name, _, outdir = option.partition(':')
+    if name != '-outdir':
+        return None
+
+    if not outdir or os.path.isfile(outdir):
+        emsg = 'ERROR!! You must provide an output directory: \'{}\'\n'
+        sys.stderr.write(emsg.format(option))
+        sys.exit(1)
+    return outdir
+
+
+def parse_nproc(option):
+    """
+    Reads the number of processes from a '-nproc[:<number>]' option.
+
+    Returns the number of CPUs if no number is given. Exits if the number is
+    not a positive integer.
+    """
+    _, _, nproc = option.partition(':')
+    try:
+        nproc = int(nproc) if nproc else multiprocessing.cpu_count()
+        if nproc < 1:
+            raise ValueError
+    except ValueError:
+        emsg = 'ERROR!! Number of processes must be a positive integer\n'
+        sys.stderr.write(emsg)
+        sys.exit(1)
+    return nproc
+
+
+def find_inputs(paths, extensions):
+    """
+    Lists the files to convert.
+
+    Parameters
+    ----------
+    paths : list of str
+        Files and directories. Files are always converted, regardless of
+        their extension. Directories are searched recursively for files
+        with one of `extensions`, possibly compressed (e.g. '.cif.gz').
+
+    extensions : tuple of str
+        File extensions to look for in directories, e.g. ('.cif',).
+
+    Returns
+    -------
+    list of tuples
+        The path of each file and its path relative to the directory it
+        was found in (or its file name).
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isfile(path):
+            inputs.append((path, os.path.basename(path)))
+
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    name, _ = _stream.split_compression_ext(fname)
+                    if name.lower().endswith(extensions):
+                        fpath = os.path.join(root, fname)
+                        inputs.append((fpath, os.path.relpath(fpath, path)))
+
+        else:
+            emsg = 'ERROR!! File or directory not found: \'{}\'\n'
+            sys.stderr.write(emsg.format(path))
+            sys.exit(1)
+
+    return inputs
+
+
+def output_path(outdir, relpath, extensions, new_ext):
+    """
+    Returns the path of the converted file.
+
+    Example: ('out', 'ab/1abc.cif.gz', ('.cif',), '.pdb') gives
+    'out/ab/1abc.pdb'.
+    """
+    name, _ = _stream.split_compression_ext(relpath)
+    for ext in extensions:
+        if name.lower().endswith(ext):
+            name = name[:-len(ext)]
+            break
+    return os.path.join(outdir, name + new_ext)
+
+
+def list_jobs(paths, outdir, extensions, new_ext):
+    """
+    Lists the input and output path of each file to convert.
+
+    See `find_inputs` and `output_path` for the meaning of the parameters.
+    """
+    jobs = []
+    for inpath, relpath in find_inputs(paths, extensions):
+        jobs.append((inpath, output_path(outdir, relpath, extensions, new_ext)))
+    return jobs
+
+
+def is_up_to_date(inpath, outpath):
+    """True if the output file is not empty and not older than the input."""
+    try:
+        outstat = os.stat(outpath)
+    except OSError:
+        return False
+    if not outstat.st_size:
+        return False
+    return outstat.st_mtime >= os.stat(inpath).st_mtime
+
+
+def convert_file(tool, inpath, outpath, params=()):
+    """
+    Converts one file with the `run` function of a tool.
+
+    Errors are caught, so that they do not stop the conversion of other
+    files: tools write their error messages to stderr and exit, so both the
+    messages and the exit are captured.
+
+    Parameters
+    ----------
+    tool : str
+        Name of the tool, e.g. 'pdb_fromcif'.
+
+    inpath, outpath : str
+        Paths of the input and output files.
+
+    params : tuple
+        Arguments to pass to `run` after the file handle.
+
+    Returns
+    -------
+    str
+        An empty string if the file was converted, or the error message.
+    """
+    module = importlib.import_module('pdbtools.' + tool)
+    tmppath = outpath + '.part'
+
+    stderr = sys.stderr
+    sys.stderr = io.StringIO()
+    try:
+        outdir = os.path.dirname(outpath)
+        if outdir and not os.path.isdir(outdir):
+            try:
+                os.makedirs(outdir)
+            except OSError:  # created by another process
+                if not os.path.isdir(outdir):
+                    raise
+
+        fhandle = _stream.open_file(inpath)
+        try:
+            # Binary formats (e.g. BinaryCIF) are yielded as bytes
+            output, as_bytes = _stream.sniff(module.run(fhandle, *params))
+            mode, empty = ('wb', b'') if as_bytes else ('w', '')
+            with open(tmppath, mode) as outfile:
+                _buffer = []
+                _buffer_size = 5000  # write N lines at a time
+                for lineno, line in enumerate(output):
+                    if not (lineno % _buffer_size):
+                        outfile.write(empty.join(_buffer))
+                        _buffer = []
+                    _buffer.append(line)
+                outfile.write(empty.join(_buffer))
+        finally:
+            fhandle.close()
+
+        _replace(tmppath, outpath)
+        return ''
+
+    except (Exception, SystemExit) as error:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+        messages = sys.stderr.getvalue().splitlines()
+        if isinstance(error, SystemExit) and messages:
+            return messages[0]
+        return 'ERROR!! {}: {}'.format(type(error).__name__, error)
+
+    finally:
+        sys.stderr = stderr
+
+
+def run(tool, jobs, params=(), nproc=1, progress=None,
+        pool=ProcessPoolExecutor, is_done=is_up_to_date, status='converted',
+        noun='files'):
+    """
+    Converts files, in parallel if nproc is larger than one.
+
+    Parameters
+    ----------
+    tool : str or function
+        Name of the tool, e.g. 'pdb_fromcif', or a function called as
+        `tool(inpath, outpath, *params)` that returns an empty string if
+        the job succeeded, or the error message (see `convert_file`).
+
+    jobs : list of tuples
+        Input and output path of each file.
+
+    params : tuple
+        Arguments to pass to the `run` function of the tool.
+
+    nproc : int
+        Number of processes.
+
+    progress : file handle, optional
+        Where to write one line per file as it finishes, and a summary at
+        the end, e.g. sys.stderr.
+
+    pool : class, optional
+        Executor to run the jobs in parallel, e.g. ThreadPoolExecutor for
+        jobs that wait on the network. By default, a process pool.
+
+    is_done : function, optional
+        Called as `is_done(inpath, outpath)`, True if a job can be skipped.
+        By default, `is_up_to_date`.
+
+    status, noun : str, optional
+        How to name successful jobs and their files in the progress lines
+        and summary, e.g. 'fetched' and 'structures'.
+
+    Returns
+    -------
+    dict
+        The number of files 'converted' (or `status`), 'skipped' (e.g. up
+        to date), and 'failed'.
+    """
+    if callable(tool):
+        work, args = tool, tuple(params)
+    else:
+        work, args = partial(convert_file, tool), (params,)
+
+    counts = {status: 0, 'skipped': 0, 'failed': 0}
+    n_jobs = len(jobs)
+    width = len(str(n_jobs))
+    status_width = max(len(status), len('skipped'))
+
+    def report(inpath, error, skipped=False):
+        """Counts a finished file and writes its progress line."""
+        if skipped:
+            name = 'skipped'
+        elif error:
+            name = 'failed'
+        else:
+            name = status
+        counts[name] += 1
+
+        if progress is not None:
+            msg = '[{:>{w}d}/{:d}] {:<{s}s} {}'.format(
+                sum(counts.values()), n_jobs, name, inpath, w=width,
+                s=status_width)
+            if error:
+                msg += ': ' + error
+            progress.write(msg + '\n')
+
+    pending = []
+    for inpath, outpath in jobs:
+        if is_done(inpath, outpath):
+            report(inpath, '', skipped=True)
+        else:
+            pending.append((inpath, outpath))
+
+    if nproc > 1 and len(pending) > 1 and pool is not None:
+        with pool(min(nproc, len(pending))) as executor:
+            futures = {}
+            for inpath, outpath in pending:
+                future = executor.submit(work, inpath, outpath, *args)
+                futures[future] = inpath
+
+            for future in as_completed(futures):
+                report(futures[future], future.result())
+    else:
+        for inpath, outpath in pending:
+            report(inpath, work(inpath, outpath, *args))
+
+    if progress is not None:
+        msg = '{} {} {}, skipped {}, failed {}\n'.format(
+            status.capitalize(), counts[status], noun, counts['skipped'],
+            counts['failed'])
+        progress.write(msg)
+
+    return counts
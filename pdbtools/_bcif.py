@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Reads and writes BinaryCIF files.
+
+BinaryCIF stores each column of a mmCIF category as a compressed array, in a
+MessagePack document. Columns are compressed by a chain of encodings, applied in
+order, for example:
+
+    - FixedPoint: floats multiplied by a factor and rounded to integers;
+    - Delta: integers replaced by the difference to the previous one;
+    - RunLength: repeated integers replaced by (value, count) pairs;
+    - IntegerPacking: integers written as 8- or 16-bit values;
+    - ByteArray: integers or floats written as little-endian bytes;
+    - StringArray: strings replaced by indices in a list of unique strings.
+
+Missing values ('.' and '?') are flagged in a separate mask of the column.
+
+Columns are decoded whole, by reversing the encodings in C-implemented steps
+where possible (`array`, `itertools.accumulate`, list repetition), and rows are
+then assembled from the columns.
+
+See https://github.com/molstar/BinaryCIF for the specification.
+
+This module is not a tool.
+"""
+
+from array import array
+from itertools import chain, repeat
+import sys
+
+try:
+    from itertools import accumulate
+except ImportError:  # Python 2
+    accumulate = None
+
+from pdbtools import _cif
+from pdbtools import _msgpack
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+VERSION = '0.3.0'
+
+# BinaryCIF data types and the matching `array` type codes.
+INT8, INT16, INT32, UINT8, UINT16, UINT32 = 1, 2, 3, 4, 5, 6
+FLOAT32, FLOAT64 = 32, 33
+TYPECODES = {INT8: 'b', INT16: 'h', INT32: 'i', UINT8: 'B', UINT16: 'H',
+             UINT32: 'I', FLOAT32: 'f', FLOAT64: 'd'}
+
+# Mask values
+PRESENT, NOT_SPECIFIED, UNKNOWN = 0, 1, 2
+
+
+class BinaryCIFError(_cif.CIFError):
+    """Malformed BinaryCIF data."""
+
+
+def byte_array(values, dtype):
+    """Writes numbers as little-endian bytes of a given data type."""
+    data = array(TYPECODES[dtype], values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return {'kind': 'ByteArray', 'type': dtype}, data.tobytes()
+
+
+def fixed_point(values, factor):
+    """Converts floats to integers, multiplying them by a factor."""
+    encoding = {'kind': 'FixedPoint', 'factor': factor, 'srcType': FLOAT64}
+    return encoding, [int(round(v * factor)) for v in values]
+
+
+def delta(values):
+    """Replaces each integer by its difference to the previous one."""
+    encoding = {'kind': 'Delta', 'origin': values[0] if values else 0,
+                'srcType': INT32}
+    previous = encoding['origin']
+    deltas = []
+    for value in values:
+        deltas.append(value - previous)
+        previous = value
+    return encoding, deltas
+
+
+def run_length(values):
+    """Replaces runs of equal integers by (value, count) pairs."""
+    encoding = {'kind': 'RunLength', 'srcType': INT32,
+                'srcSize': len(values)}
+    pairs = []
+    append = pairs.append
+    count = 0
+    current = None
+    for value in values:
+        if value == current:
+            count += 1
+        else:
+            if count:
+                append(current)
+                append(count)
+            current, count = value, 1
+    if count:
+        append(current)
+        append(count)
+    return encoding, pairs
+
+
+def _count_runs(values):
+    """Number of runs of equal values."""
+    return sum(1 for a, b in zip(values, values[1:]) if a != b) + bool(values)
+
+
+def integer_packing(values):
+    """
+    Writes integers as 8- or 16-bit values, whichever gives fewer bytes.
+
+    Values that do not fit are written as a sum of values: the limit of the
+    type, repeated as needed, plus the remainder. For example, 300 is written
+    as 127, 127, 46 in signed 8-bit values.
+    """
+    min_value = min(values) if values else 0
+    max_value = max(values) if values else 0
+    is_unsigned = min_value >= 0
+
+    best = None
+    for byte_count in (1, 2):
+        if is_unsigned:
+            upper, lower = (0xff, 0) if byte_count == 1 else (0xffff, 0)
+        elif byte_count == 1:
+            upper, lower = 0x7f, -0x80
+        else:
+            upper, lower = 0x7fff, -0x8000
+
+        if max_value < upper and (is_unsigned or lower < min_value):
+            # All values fit
+            size = len(values)
+        else:
+            size = 0
+            for value in values:
+                if value >= 0:
+                    size += value // upper + 1 if value >= upper else 1
+                else:
+                    size += value // lower + 1 if value <= lower else 1
+        size *= byte_count
+
+        if best is None or size < best[0]:
+            best = (size, byte_count, upper, lower)
+
+    size, byte_count, upper, lower = best
+    if size == len(values) * byte_count:  # no value to split
+        packed = values
+    else:
+        packed = []
+        append = packed.append
+        for value in values:
+            if value >= 0:
+                while value >= upper:
+                    append(upper)
+                    value -= upper
+            else:
+                while value <= lower:
+                    append(lower)
+                    value -= lower
+            append(value)
+
+    if is_unsigned:
+        dtype = UINT8 if byte_count == 1 else UINT16
+    else:
+        dtype = INT8 if byte_count == 1 else INT16
+
+    encoding = {'kind': 'IntegerPacking', 'byteCount': byte_count,
+                'isUnsigned': is_unsigned, 'srcSize': len(values)}
+    return encoding, packed, dtype
+
+
+def encode_ints(values, use_delta=False):
+    """
+    Encodes a column of integers.
+
+    Parameters
+    ----------
+    values : list of int
+
+    use_delta : bool
+        Delta-encode the values first, e.g. for serial numbers.
+
+    Returns
+    -------
+    dict
+        The encoded data: its 'encoding' chain and its 'data' bytes.
+    """
+    encodings = []
+    if use_delta:
+        encoding, values = delta(values)
+        encodings.append(encoding)
+
+    if 2 * _count_runs(values) < len(values):
+        encoding, values = run_length(values)
+        encodings.append(encoding)
+
+    encoding, values, dtype = integer_packing(values)
+    encodings.append(encoding)
+
+    encoding, data = byte_array(values, dtype)
+    encodings.append(encoding)
+    return {'encoding': encodings, 'data': data}
+
+
+def encode_floats(values, factor, use_delta=False):
+    """
+    Encodes a column of floats as fixed-point integers.
+
+    Parameters
+    ----------
+    values : list of float
+
+    factor : int
+        Values are stored with a precision of 1/factor, e.g. 1000 for three
+        decimal places.
+
+    use_delta : bool
+        Delta-encode the integers, e.g. for coordinates.
+    """
+    encoding, values = fixed_point(values, factor)
+    encoded = encode_ints(values, use_delta)
+    encoded['encoding'].insert(0, encoding)
+    return encoded
+
+
+def encode_strings(values):
+    """Encodes a column of strings."""
+    index = {}
+    indices = []
+    for value in values:
+        try:
+            indices.append(index[value])
+        except KeyError:
+            indices.append(index.setdefault(value, len(index)))
+
+    strings = sorted(index, key=index.get)
+    offsets = [0]
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    indices = encode_ints(indices)
+    offsets = encode_ints(offsets, use_delta=True)
+    encoding = {'kind': 'StringArray',
+                'dataEncoding': indices['encoding'],
+                'stringData': ''.join(strings),
+                'offsetEncoding': offsets['encoding'],
+                'offsets': offsets['data']}
+    return {'encoding': [encoding], 'data': indices['data']}
+
+
+def encode_mask(mask):
+    """Encodes the mask of a column, or returns None if no value is missing."""
+    if not any(mask):
+        return None
+    return encode_ints(mask)
+
+
+def column(name, data, mask=None):
+    """
+    Builds an encoded column.
+
+    Parameters
+    ----------
+    name : str
+        Name of the column, without the category, e.g. 'Cartn_x'.
+
+    data : dict
+        The encoded values, as returned by `encode_ints`, `encode_floats`,
+        or `encode_strings`.
+
+    mask : list of int, optional
+        For each row, PRESENT, NOT_SPECIFIED ('.'), or UNKNOWN ('?').
+    """
+    return {'name': name, 'data': data,
+            'mask': encode_mask(mask) if mask is not None else None}
+
+
+def write_file(header, categories, encoder='pdb-tools'):
+    """
+    Writes a BinaryCIF file with a single data block.
+
+    Parameters
+    ----------
+    header : str
+        Name of the data block, e.g. '1CTF'.
+
+    categories : list of tuples
+        The name (e.g. '_atom_site'), number of rows, and list of columns
+        (see `column`) of each category.
+
+    Returns
+    -------
+    bytes
+    """
+    block = {'header': header, 'categories': []}
+    for name, row_count, columns in categories:
+        block['categories'].append({'name': name, 'rowCount': row_count,
+                                    'columns': columns})
+
+    return _msgpack.packb({'version': VERSION, 'encoder': encoder,
+                           'dataBlocks': [block]})
+
+
+def is_bcif(head):
+    """
+    True if the first bytes of a file are those of a BinaryCIF file.
+
+    BinaryCIF files are MessagePack maps, while text mmCIF files start with
+    printable characters.
+    """
+    if not head:
+        return False
+    first = bytearray(head[:1])[0]
+    return 0x80 <= first <= 0x8f or first in (0xde, 0xdf)
+
+
+def _decode_byte_array(data, encoding):
+    """Reads little-endian numbers."""
+    values = array(TYPECODES[encoding['type']])
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _decode_fixed_point(data, encoding):
+    """Divides integers by the fixed-point factor."""
+    factor = float(encoding['factor'])
+    return [v / factor for v in data]
+
+
+def _decode_interval_quantization(data, encoding):
+    """Maps integers to steps between a minimum and a maximum."""
+    low = encoding['min']
+    step = (encoding['max'] - low) / float(encoding['numSteps'] - 1)
+    return [low + step * v for v in data]
+
+
+def _decode_run_length(data, encoding):
+    """Expands (value, count) pairs."""
+    values = list(chain.from_iterable(map(repeat, data[::2], data[1::2])))
+    if len(values) != encoding['srcSize']:
+        raise BinaryCIFError('RunLength data does not match its size')
+    return values
+
+
+def _decode_delta(data, encoding):
+    """Adds up differences, starting from the origin."""
+    if not len(data):
+        return []
+    data = list(data)
+    data[0] += encoding['origin']
+    if accumulate is not None:
+        return list(accumulate(data))
+
+    total = 0
+    for i, value in enumerate(data):
+        total += value
+        data[i] = total
+    return data
+
+
+def _decode_integer_packing(data, encoding):
+    """Adds up values split at the limits of the packed type."""
+    if encoding['isUnsigned']:
+        limits = (0xff if encoding['byteCount'] == 1 else 0xffff,)
+    elif encoding['byteCount'] == 1:
+        limits = (0x7f, -0x80)
+    else:
+        limits = (0x7fff, -0x8000)
+
+    if len(data) == encoding['srcSize']:  # nothing was split
+        return data
+
+    values = []
+    append = values.append
+    total = 0
+    for value in data:
+        total += value
+        if value not in limits:
+            append(total)
+            total = 0
+
+    if len(values) != encoding['srcSize']:
+        raise BinaryCIFError('IntegerPacking data does not match its size')
+    return values
+
+
+def _decode_string_array(data, encoding):
+    """Looks up strings by index."""
+    offsets = decode({'data': encoding['offsets'],
+                      'encoding': encoding['offsetEncoding']})
+    text = encoding['stringData']
+    strings = [text[a:b] for a, b in zip(offsets, offsets[1:])]
+    strings.append('')  # index -1 is a missing value
+
+    indices = decode({'data': data, 'encoding': encoding['dataEncoding']})
+    return [strings[i] for i in indices]
+
+
+DECODERS = {
+    'ByteArray': _decode_byte_array,
+    'FixedPoint': _decode_fixed_point,
+    'IntervalQuantization': _decode_interval_quantization,
+    'RunLength': _decode_run_length,
+    'Delta': _decode_delta,
+    'IntegerPacking': _decode_integer_packing,
+    'StringArray': _decode_string_array,
+}
+
+
+def decode(encoded):
+    """
+    Decodes the data of a column (or mask).
+
+    Parameters
+    ----------
+    encoded : dict
+        The 'data' bytes and their 'encoding' chain.
+
+    Returns
+    -------
+    list or array
+        The values of the column: strings, integers, or floats.
+    """
+    data = encoded['data']
+    for encoding in reversed(encoded['encoding']):
+        decoder = DECODERS.get(encoding.get('kind'))
+        if decoder is None:
+            emsg = 'Unsupported BinaryCIF encoding: \'{}\''
+            raise BinaryCIFError(emsg.format(encoding.get('kind')))
+
+        try:
+            data = decoder(data, encoding)
+        except BinaryCIFError:
+            raise
+        except (KeyError, IndexError, TypeError, ValueError) as error:
+            emsg = 'Malformed {} data: {}'
+            raise BinaryCIFError(emsg.format(encoding['kind'], error))
+    return data
+
+
+def decode_column(column):
+    """
+    Decodes a column, replacing masked values by '.' or '?'.
+    """
+    values = decode(column['data'])
+    if column.get('mask') is None:
+        return values
+
+    mask = decode(column['mask'])
+    missing = (None, '.', '?')
+    if len(mask) and min(mask) == max(mask):  # e.g. all values missing
+        flag = mask[0]
+        return [missing[flag]] * len(mask) if flag else values
+    return [missing[f] if f else v for v, f in zip(values, mask)]
+
+
+def read_category(data, category, select=None):
+    """
+    Reads the rows of a category of the first data block of a BinaryCIF file.
+
+    Parameters
+    ----------
+    data : bytes
+        The whole BinaryCIF file.
+
+    category : str
+        Name of the category, e.g. '_atom_site'.
+
+    select : function, optional
+        Takes the list of tag names of the category and returns the tag
+        names to read. Other columns are not decoded, and are left out of
+        the tags and rows. By default, all columns are read.
+
+    Returns
+    -------
+    tuple
+        The list of tag names (e.g. '_atom_site.Cartn_x') and an iterator
+        over the rows, each a list of values in the same order as the tags,
+        as `_cif.read_category`. Values are integers or floats in numerical
+        columns, and strings otherwise.
+
+    Raises
+    ------
+    BinaryCIFError
+        If the data is malformed.
+    """
+    try:
+        bcif = _msgpack.unpackb(data)
+        categories = bcif['dataBlocks'][0]['categories']
+    except (_msgpack.MessagePackError, KeyError, IndexError, TypeError) as error:
+        emsg = 'Malformed BinaryCIF file: {}'
+        raise BinaryCIFError(emsg.format(error))
+
+    for cat in categories:
+        if cat['name'] == category:
+            break
+    else:
+        return [], iter([])
+
+    columns = cat['columns']
+    if select is not None:
+        selected = set(select(['{}.{}'.format(category, col['name'])
+                               for col in columns]))
+        columns = [col for col in columns
+                   if '{}.{}'.format(category, col['name']) in selected]
+
+    tags = []
+    values_list = []
+    for col in columns:
+        values = decode_column(col)
+        if len(values) != cat['rowCount']:
+            emsg = 'Column \'{}\' does not have {} rows'
+            raise BinaryCIFError(emsg.format(col['name'], cat['rowCount']))
+        tags.append('{}.{}'.format(category, col['name']))
+        values_list.append(values)
+
+    return tags, map(list, zip(*values_list))
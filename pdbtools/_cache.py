@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-disk cache of downloaded structures, used by pdb_fetch.
+
+Files are stored as downloaded (i.e. compressed), under a subdirectory named
+after the middle characters of the PDB code, as in the PDB archive:
+`<cache>/ab/1abc.pdb.gz`. Files are written under a temporary name and renamed
+when complete, so that other processes never read partial files.
+
+Two timestamps of each file are used:
+
+    - its access time is the last time it was used, and the least recently
+      used files are deleted when the cache grows above its maximum size;
+    - its modification time is the last time it was downloaded or validated
+      against the server. Files older than the time-to-live (if any) are
+      revalidated with an If-Modified-Since request before being used.
+
+The cache is configured with environment variables:
+
+    PDBTOOLS_CACHE       cache directory (caching is disabled if not set)
+    PDBTOOLS_CACHE_SIZE  maximum size, in megabytes (default: 1024)
+    PDBTOOLS_CACHE_TTL   time-to-live, in seconds (default: no revalidation)
+
+This module is not a tool.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+ENV_DIR = 'PDBTOOLS_CACHE'
+ENV_SIZE = 'PDBTOOLS_CACHE_SIZE'
+ENV_TTL = 'PDBTOOLS_CACHE_TTL'
+
+DEFAULT_MAX_SIZE = 1024  # megabytes
+
+_replace = getattr(os, 'replace', os.rename)  # Python 2
+_TMP_SUFFIX = '.part'
+
+
+def _read_env_number(name, default):
+    """Reads a positive number from an environment variable. Exits if invalid."""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        value = float(value)
+        if value <= 0:
+            raise ValueError
+    except ValueError:
+        emsg = 'ERROR!! {} must be a positive number: \'{}\'\n'
+        sys.stderr.write(emsg.format(name, value))
+        sys.exit(1)
+    return value
+
+
+class Cache(object):
+    """
+    Directory of downloaded files, with LRU eviction and time-to-live.
+
+    Parameters
+    ----------
+    path : str
+        The cache directory. Created if it does not exist.
+
+    max_size : int
+        Maximum total size of the files, in bytes.
+
+    ttl : float, optional
+        Time, in seconds, after which files must be revalidated. By
+        default, files never expire.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE * 1024 * 1024,
+                 ttl=None):
+        self.root = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._size = None  # running total, read from disk on first commit
+
+    @classmethod
+    def from_env(cls, path=None):
+        """
+        Creates a cache from the environment variables.
+
+        Returns None if no directory is given, either as `path` or in the
+        PDBTOOLS_CACHE variable.
+        """
+        path = path or os.environ.get(ENV_DIR)
+        if not path:
+            return None
+
+        max_size = _read_env_number(ENV_SIZE, DEFAULT_MAX_SIZE)
+        ttl = _read_env_number(ENV_TTL, None)
+        return cls(path, int(max_size * 1024 * 1024), ttl)
+
+    def path(self, name):
+        """Returns the path of a file in the cache, e.g. '1abc.pdb.gz'."""
+        return os.path.join(self.root, name[1:3].lower(), name)
+
+    def get(self, name):
+        """
+        Returns the path of a cached file and marks it as used, or None if
+        the file is not in the cache.
+        """
+        path = self.path(name)
+        try:
+            mtime = os.stat(path).st_mtime
+            os.utime(path, (time.time(), mtime))
+        except OSError:
+            return None
+        return path
+
+    def is_fresh(self, path):
+        """True if a cached file does not need revalidation."""
+        if self.ttl is None:
+            return True
+        try:
+            return time.time() - os.stat(path).st_mtime < self.ttl
+        except OSError:
+            return False
+
+    def validated(self, path):
+        """Marks a cached file as validated (i.e. fresh) now."""
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def open_writer(self, name):
+        """
+        Opens a temporary file to add a file to the cache.
+
+        Returns the file handle, opened in binary mode. Pass it to `commit`
+        (with the same name) once the file is complete, or to `discard`
+        otherwise.
+        """
+        path = self.path(name)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:  # created by another process
+                if not os.path.isdir(dirname):
+                    raise
+
+        fd, tmppath = tempfile.mkstemp(prefix=name + '.', suffix=_TMP_SUFFIX,
+                                       dir=dirname)
+        os.close(fd)
+        return open(tmppath, 'wb')
+
+    def commit(self, handle, name):
+        """
+        Moves a complete file into place, and evicts old files if needed.
+
+        The size of the cache is kept as a running total, so the directory
+        is only walked on the first commit and when the cache is full.
+        """
+        handle.close()
+        path = self.path(name)
+        if self._size is not None:
+            try:
+                self._size -= os.stat(path).st_size  # replaced file
+            except OSError:
+                pass
+            self._size += os.stat(handle.name).st_size
+        _replace(handle.name, path)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.files())
+        if self._size > self.max_size:
+            self.evict()
+
+    def discard(self, handle):
+        """Deletes an incomplete file."""
+        handle.close()
+        try:
+            os.remove(handle.name)
+        except OSError:
+            pass
+
+    def files(self):
+        """Lists the (last use, size, path) of the files in the cache."""
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for fname in files:
+                if fname.endswith(_TMP_SUFFIX):
+                    continue
+                fpath = os.path.join(root, fname)
+                try:
+                    stat = os.stat(fpath)
+                except OSError:  # deleted by another process
+                    continue
+                entries.append((stat.st_atime, stat.st_size, fpath))
+        return entries
+
+    def evict(self):
+        """Deletes the least recently used files until the cache fits."""
+        entries = self.files()
+        total = sum(size for _, size, _ in entries)
+        for _, size, fpath in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                pass
+            total -= size
+        self._size = total
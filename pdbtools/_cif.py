@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming reader for the mmCIF (PDBx) format.
+
+Reads the rows of one category (e.g. `_atom_site`) from a line iterator, one
+row at a time, without loading the file in memory. Values are split with
+`str.split` whenever a line has no quote characters, which is the case for
+nearly all lines of coordinate sections. Other lines go through a scanner that
+follows the CIF quoting rules:
+
+    - values can be enclosed in single or double quotes, and the closing quote
+      must be followed by whitespace or the end of the line, so that values
+      such as "O5'" or 'N"1' are read correctly;
+    - values can be multi-line text fields, starting and ending with a line
+      that begins with a semicolon;
+    - a row of a loop can span several lines;
+    - comments start with a '#' at the beginning of a value, e.g. the '#' in
+      'C#1' is part of the value.
+
+Quotes are removed from the values. Missing ('?') and default ('.') values are
+returned as they are.
+
+This module is not a tool.
+"""
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+WHITESPACE = ' \t\r\n'
+
+
+class CIFError(ValueError):
+    """Malformed mmCIF data."""
+
+
+def split_line(line):
+    """
+    Splits a line of CIF data into values.
+
+    Parameters
+    ----------
+    line : str
+        A single line, without multi-line text fields.
+
+    Returns
+    -------
+    list of str
+        The values, with quotes removed. Comments are ignored.
+    """
+    if '"' not in line and "'" not in line:
+        # A '#' at the start of the line or after whitespace starts a
+        # comment. Without quotes, it is the first such '#'.
+        comment = line.find('#')
+        while comment > 0 and line[comment - 1] not in WHITESPACE:
+            comment = line.find('#', comment + 1)
+        if comment != -1:
+            line = line[:comment]
+        return line.split()
+
+    values = []
+    pos, end = 0, len(line)
+    while pos < end:
+        char = line[pos]
+        if char in WHITESPACE:
+            pos += 1
+
+        elif char == '\'' or char == '"':
+            # Closing quote must be followed by whitespace or end of line.
+            close = line.find(char, pos + 1)
+            while close != -1 and close + 1 < end and \
+                    line[close + 1] not in WHITESPACE:
+                close = line.find(char, close + 1)
+            if close == -1:
+                emsg = 'Unterminated quoted value: {}'
+                raise CIFError(emsg.format(line.rstrip()))
+            values.append(line[pos + 1:close])
+            pos = close + 1
+
+        elif char == '#':  # comment, until the end of the line
+            break
+
+        else:
+            start = pos
+            while pos < end and line[pos] not in WHITESPACE:
+                pos += 1
+            values.append(line[start:pos])
+
+    return values
+
+
+def _prepend(first_line, fhandle):
+    """Yields first_line and then the lines of fhandle."""
+    yield first_line
+    for line in fhandle:
+        yield line
+
+
+def _read_text_field(first_line, lines):
+    """Reads a multi-line text field, from its opening line."""
+    text = [first_line[1:]]
+    for line in lines:
+        if line.startswith(';'):
+            return ''.join(text).rstrip('\r\n')
+        text.append(line)
+    raise CIFError('Unterminated text field')
+
+
+def read_category(fhandle, category):
+    """
+    Reads the rows of a category of a mmCIF file.
+
+    The file is read up to the first tag of the category, and the remaining
+    lines are read only when iterating over the rows. Categories given as
+    pairs of tags and values (instead of a loop) give a single row.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original mmCIF file.
+
+    category : str
+        Name of the category, e.g. '_atom_site'.
+
+    Returns
+    -------
+    tuple
+        The list of tag names (e.g. '_atom_site.Cartn_x') and an iterator
+        over the rows, each a list of values in the same order as the tags.
+        If the category is not in the file, the list of tags is empty.
+
+    Raises
+    ------
+    CIFError
+        If the data is malformed. Raised when iterating over the rows.
+    """
+    prefix = category + '.'
+    fhandle = iter(fhandle)
+
+    previous = ''
+    in_text = False
+    for line in fhandle:
+        if line.startswith(';'):
+            in_text = not in_text
+        elif not in_text and line.startswith(prefix):
+            break
+        if line.strip():
+            previous = line
+    else:
+        return [], iter([])
+
+    if not previous.startswith('loop_'):
+        return _read_pairs(_prepend(line, fhandle), prefix)
+
+    tags = [line.strip()]
+    for line in fhandle:
+        if not line.startswith(prefix):
+            break
+        tags.append(line.strip())
+    else:
+        return tags, iter([])
+
+    return tags, _loop_rows(_prepend(line, fhandle), len(tags))
+
+
+def _loop_rows(lines, n_columns):
+    """Yields the rows of a loop, from its first line of values."""
+    row = []
+    for line in lines:
+        if line.startswith(';'):
+            row.append(_read_text_field(line, lines))
+
+        elif line.startswith(('_', 'loop_', 'data_', 'save_', '#')):
+            # End of loop. Comments end loops only between rows, as in the
+            # '#' lines that separate categories in PDBx files.
+            if not row:
+                return
+            elif not line.startswith('#'):
+                emsg = 'Incomplete row in loop: expected {} values, got {}'
+                raise CIFError(emsg.format(n_columns, len(row)))
+
+        else:
+            values = split_line(line)
+            if not row and len(values) == n_columns:  # fast path
+                yield values
+                continue
+            row.extend(values)
+
+        while len(row) >= n_columns:
+            yield row[:n_columns]
+            row = row[n_columns:]
+
+    if row:
+        emsg = 'Incomplete row in loop: expected {} values, got {}'
+        raise CIFError(emsg.format(n_columns, len(row)))
+
+
+def _read_pairs(lines, prefix):
+    """Reads a category given as tag-value pairs, as a single row."""
+    tags, row = [], []
+    for line in lines:
+        if len(row) < len(tags):  # value on its own line
+            if line.startswith(';'):
+                row.append(_read_text_field(line, lines))
+            else:
+                row.extend(split_line(line)[:1])
+        elif line.startswith(prefix):
+            values = split_line(line)
+            tags.append(values[0])
+            row.extend(values[1:2])
+        else:
+            break
+
+    if len(row) != len(tags):
+        raise CIFError('Missing value for tag: {}'.format(tags[-1]))
+    return tags, iter([row])
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+HTTP client that reuses connections, used by pdb_fetch.
+
+urllib opens a new connection (and, for HTTPS, negotiates a new TLS session)
+for every request. When downloading many files from the same server, most of
+that time is saved by keeping the connections open (HTTP keep-alive) and
+sending the next requests over them. `ConnectionPool` keeps the idle
+connections to each server and hands them out to the threads that need them.
+
+Errors are raised as in urllib: HTTPError for error responses and URLError
+for connection errors.
+
+This module is not a tool.
+"""
+
+import socket
+import threading
+
+# Python 3 vs Python 2
+try:
+    import http.client as httplib
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urljoin, urlsplit
+except ImportError:
+    import httplib
+    from urllib2 import HTTPError, URLError
+    from urlparse import urljoin, urlsplit
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+USER_AGENT = 'pdb-tools'
+MAX_REDIRECTS = 5
+REDIRECT_CODES = frozenset((301, 302, 303, 307, 308))
+
+
+class Response(object):
+    """
+    Body of a successful response.
+
+    Closing the response hands its connection back to the pool, if the body
+    was read entirely and the server keeps the connection open.
+    """
+
+    def __init__(self, pool, key, connection, response, url):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self.url = url
+        self.code = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def read1(self, size=-1):
+        """Reads at most `size` bytes, without waiting for more to arrive."""
+        read = getattr(self._response, 'read1', self._response.read)
+        try:
+            return read(size)
+        except httplib.HTTPException as error:  # e.g. IncompleteRead
+            raise IOError('connection error: {!r}'.format(error))
+
+    def read(self, size=None):
+        """Reads `size` bytes, or the whole body."""
+        try:
+            return self._response.read(size)
+        except httplib.HTTPException as error:
+            raise IOError('connection error: {!r}'.format(error))
+
+    def close(self):
+        if self._connection is None:
+            return
+
+        response = self._response
+        complete = response.isclosed() or response.length == 0
+        reusable = complete and not response.will_close
+        response.close()
+        if reusable:
+            self._pool.release(self._key, self._connection)
+        else:
+            self._connection.close()
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConnectionPool(object):
+    """
+    Keeps connections open between requests to the same server.
+
+    Can be shared by several threads: each connection is used by one request
+    at a time, and new connections are opened when all are busy.
+
+    Parameters
+    ----------
+    timeout : float
+        Time, in seconds, to wait for the server to connect or send data.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._idle = {}  # (scheme, host:port): [connections]
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Returns an idle connection to a server, or a new one, and whether
+        it was used before.
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        scheme, netloc = key
+        if scheme == 'https':
+            return httplib.HTTPSConnection(netloc, timeout=self.timeout), False
+        return httplib.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def release(self, key, connection):
+        """Keeps a connection for the next request to the same server."""
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def close(self):
+        """Closes all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _send(self, url, headers):
+        """Sends a GET request, and returns the response."""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise URLError('unknown url type: {}'.format(parts.scheme))
+
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        while True:
+            connection, reused = self.acquire(key)
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (socket.error, httplib.HTTPException) as error:
+                connection.close()
+                if reused:  # closed by the server while idle, try another
+                    continue
+                raise URLError(error)
+            return Response(self, key, connection, response, url)
+
+    def open(self, url, headers=None):
+        """
+        Sends a GET request, following redirects.
+
+        Parameters
+        ----------
+        url : str
+            The URL, starting with http:// or https://.
+
+        headers : dict, optional
+            Extra request headers, e.g. {'If-Modified-Since': ...}.
+
+        Returns
+        -------
+        Response
+            The response, if successful (2xx). Close it once read.
+
+        Raises
+        ------
+        HTTPError
+            If the server answers with an error, or any other code that is
+            not a redirect (e.g. 304 Not Modified).
+
+        URLError
+            If the server cannot be reached.
+        """
+        all_headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'identity'}
+        all_headers.update(headers or {})
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(url, all_headers)
+            if 200 <= response.code < 300:
+                return response
+
+            code, reason = response.code, response.reason
+            location = response.headers.get('Location')
+            with response:
+                response.read()  # so that the connection can be reused
+
+            if code in REDIRECT_CODES and location:
+                url = urljoin(url, location)
+                continue
+            raise HTTPError(url, code, reason, response.headers, None)
+
+        raise URLError('too many redirects: {}'.format(url))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Encodes and decodes hybrid-36 atom serial and residue numbers.
+
+Hybrid-36 extends the fixed-width numerical fields of the PDB format beyond
+their decimal limits (99999 atoms, 9999 residues). Numbers that fit are written
+in decimal, as usual. Larger numbers are written in base-36, first with an
+uppercase letter as the leading digit (A0000, A0001, ..., ZZZZZ) and then with a
+lowercase one (a0000, ..., zzzzz). Files with fewer atoms and residues than the
+decimal limits are therefore unchanged.
+
+See http://cci.lbl.gov/hybrid_36/ for the original specification.
+
+This module is not a tool.
+"""
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+DIGITS_UPPER = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS_LOWER = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+# All two-digit base-36 strings, e.g. _PAIRS_UPPER[37] == '11'. Encoding
+# takes two digits at a time from these tables.
+_PAIRS_UPPER = tuple(a + b for a in DIGITS_UPPER for b in DIGITS_UPPER)
+_PAIRS_LOWER = tuple(a + b for a in DIGITS_LOWER for b in DIGITS_LOWER)
+
+
+def _limits(width):
+    """Returns the (min, max decimal, offset, max) values of a field width."""
+    min_value = 1 - 10 ** (width - 1)
+    max_decimal = 10 ** width - 1
+    block = 26 * 36 ** (width - 1)  # numbers per letter case
+    # Value that A000... encodes, minus the base-36 value of A000...
+    offset = 10 ** width - 10 * 36 ** (width - 1)
+    return min_value, max_decimal, offset, max_decimal + 2 * block
+
+
+# width: (min, max decimal, offset, max)
+_LIMITS = {width: _limits(width) for width in (4, 5)}
+
+MIN_SERIAL = _LIMITS[5][0]
+MAX_SERIAL = _LIMITS[5][3]  # 87440031
+MIN_RESID = _LIMITS[4][0]
+MAX_RESID = _LIMITS[4][3]  # 2436111
+
+
+def _base36(value, width, pairs):
+    """Writes a positive integer with exactly `width` base-36 digits."""
+    text = ''
+    for _ in range(width // 2):
+        value, remainder = divmod(value, 1296)
+        text = pairs[remainder] + text
+    if width % 2:
+        text = pairs[value][1] + text
+    return text
+
+
+def encode(value, width):
+    """
+    Writes an integer as a hybrid-36 number of a given width.
+
+    Parameters
+    ----------
+    value : int
+        The number to write.
+
+    width : int
+        The width of the field, 5 for atom serials and 4 for residue
+        numbers.
+
+    Returns
+    -------
+    str
+        The number, right-justified to `width` characters.
+
+    Raises
+    ------
+    ValueError
+        If the number does not fit in the field, even in hybrid-36.
+    """
+    min_value, max_decimal, offset, max_value = _LIMITS[width]
+    if min_value <= value <= max_decimal:
+        return str(value).rjust(width)
+    elif max_decimal < value <= max_value:
+        value -= offset
+        if value < 36 ** width:
+            return _base36(value, width, _PAIRS_UPPER)
+        return _base36(value - 26 * 36 ** (width - 1), width, _PAIRS_LOWER)
+
+    emsg = 'Number does not fit in {} hybrid-36 characters: {}'
+    raise ValueError(emsg.format(width, value))
+
+
+def decode(text, width):
+    """
+    Reads a hybrid-36 number of a given width.
+
+    Parameters
+    ----------
+    text : str
+        The field, as sliced from the line, e.g. ' 1234' or 'A0000'.
+
+    width : int
+        The width of the field, 5 for atom serials and 4 for residue
+        numbers.
+
+    Returns
+    -------
+    int
+
+    Raises
+    ------
+    ValueError
+        If the field is empty or not a valid hybrid-36 number.
+    """
+    try:
+        return int(text)
+    except ValueError:  # not decimal, slow path
+        pass
+
+    if len(text) == width and text.isalnum():
+        _, _, offset, _ = _LIMITS[width]
+        if text.isupper() and text[0] in DIGITS_UPPER[10:]:
+            return int(text, 36) + offset
+        elif text.islower() and text[0] in DIGITS_LOWER[10:]:
+            return int(text, 36) + offset + 26 * 36 ** (width - 1)
+
+    emsg = 'Invalid hybrid-36 number: \'{}\''
+    raise ValueError(emsg.format(text))
+
+
+def encode_serial(value):
+    """Writes an atom serial number, as in columns 7-11 of ATOM records."""
+    return encode(value, 5)
+
+
+def decode_serial(text):
+    """Reads an atom serial number, e.g. line[6:11] of an ATOM record."""
+    return decode(text, 5)
+
+
+def encode_resid(value):
+    """Writes a residue number, as in columns 23-26 of ATOM records."""
+    return encode(value, 4)
+
+
+def decode_resid(text):
+    """Reads a residue number, e.g. line[22:26] of an ATOM record."""
+    return decode(text, 4)
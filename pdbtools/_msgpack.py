@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Minimal MessagePack encoder and decoder, used for BinaryCIF files.
+
+Supports the types that BinaryCIF needs: None, booleans, integers, floats,
+strings, bytes, lists (and tuples), and dictionaries. Floats are always written
+in double precision. Extension types are not supported.
+
+See https://github.com/msgpack/msgpack/blob/master/spec.md for the format.
+
+This module is not a tool.
+"""
+
+import struct
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+_text_type = type(u'')
+
+# (largest value, format) of unsigned and signed integers, smallest first
+_UINTS = ((0xff, b'\xcc', '>B'), (0xffff, b'\xcd', '>H'),
+          (0xffffffff, b'\xce', '>I'), (0xffffffffffffffff, b'\xcf', '>Q'))
+_INTS = ((-0x80, b'\xd0', '>b'), (-0x8000, b'\xd1', '>h'),
+         (-0x80000000, b'\xd2', '>i'), (-0x8000000000000000, b'\xd3', '>q'))
+
+
+def _pack_length(length, fix_marker, fix_max, markers):
+    """Writes the header of a str/bin/array/map of a given length."""
+    if fix_marker is not None and length <= fix_max:
+        return struct.pack('>B', fix_marker | length)
+    for marker, fmt in markers:
+        if length < 1 << (8 * struct.calcsize(fmt)):
+            return marker + struct.pack(fmt, length)
+    raise ValueError('Object too large for MessagePack: {}'.format(length))
+
+
+def _pack_int(value):
+    """Writes an integer in the smallest format that holds it."""
+    if 0 <= value < 0x80:
+        return struct.pack('>B', value)
+    elif -32 <= value < 0:
+        return struct.pack('>b', value)
+    elif value > 0:
+        for limit, marker, fmt in _UINTS:
+            if value <= limit:
+                return marker + struct.pack(fmt, value)
+    else:
+        for limit, marker, fmt in _INTS:
+            if value >= limit:
+                return marker + struct.pack(fmt, value)
+    raise ValueError('Integer too large for MessagePack: {}'.format(value))
+
+
+def _pack(obj, chunks):
+    """Appends the encoded object to a list of byte strings."""
+    if obj is None:
+        chunks.append(b'\xc0')
+    elif obj is True:
+        chunks.append(b'\xc3')
+    elif obj is False:
+        chunks.append(b'\xc2')
+    elif isinstance(obj, int):
+        chunks.append(_pack_int(obj))
+    elif isinstance(obj, float):
+        chunks.append(b'\xcb' + struct.pack('>d', obj))
+    elif isinstance(obj, _text_type):
+        data = obj.encode('utf-8')
+        chunks.append(_pack_length(len(data), 0xa0, 31,
+                                   ((b'\xd9', '>B'), (b'\xda', '>H'),
+                                    (b'\xdb', '>I'))))
+        chunks.append(data)
+    elif isinstance(obj, (bytes, bytearray)):
+        chunks.append(_pack_length(len(obj), None, 0,
+                                   ((b'\xc4', '>B'), (b'\xc5', '>H'),
+                                    (b'\xc6', '>I'))))
+        chunks.append(bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        chunks.append(_pack_length(len(obj), 0x90, 15,
+                                   ((b'\xdc', '>H'), (b'\xdd', '>I'))))
+        for item in obj:
+            _pack(item, chunks)
+    elif isinstance(obj, dict):
+        chunks.append(_pack_length(len(obj), 0x80, 15,
+                                   ((b'\xde', '>H'), (b'\xdf', '>I'))))
+        for key, value in obj.items():
+            _pack(key, chunks)
+            _pack(value, chunks)
+    else:
+        emsg = 'Cannot encode object of type \'{}\' in MessagePack'
+        raise TypeError(emsg.format(type(obj).__name__))
+
+
+def packb(obj):
+    """
+    Encodes an object in MessagePack format.
+
+    Parameters
+    ----------
+    obj : None, bool, int, float, str, bytes, list, tuple, or dict
+        The object to encode. Containers can be nested.
+
+    Returns
+    -------
+    bytes
+
+    Raises
+    ------
+    TypeError
+        If the object, or one of its items, has an unsupported type.
+    """
+    chunks = []
+    _pack(obj, chunks)
+    return b''.join(chunks)
+
+
+# Fixed-size types: marker -> struct format
+_FIXED = {
+    0xca: '>f', 0xcb: '>d',
+    0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+    0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q',
+}
+
+# Variable-size types: marker -> (kind, struct format of the length)
+_SIZED = {
+    0xc4: ('bin', '>B'), 0xc5: ('bin', '>H'), 0xc6: ('bin', '>I'),
+    0xd9: ('str', '>B'), 0xda: ('str', '>H'), 0xdb: ('str', '>I'),
+    0xdc: ('array', '>H'), 0xdd: ('array', '>I'),
+    0xde: ('map', '>H'), 0xdf: ('map', '>I'),
+}
+
+
+class MessagePackError(ValueError):
+    """Malformed MessagePack data."""
+
+
+def _unpack(data, pos):
+    """Decodes the object starting at `pos`. Returns it and the next position."""
+    marker = data[pos]
+    pos += 1
+
+    if marker <= 0x7f:
+        return marker, pos
+    elif marker >= 0xe0:
+        return marker - 0x100, pos
+    elif 0xa0 <= marker <= 0xbf:
+        kind, length = 'str', marker & 0x1f
+    elif 0x90 <= marker <= 0x9f:
+        kind, length = 'array', marker & 0x0f
+    elif 0x80 <= marker <= 0x8f:
+        kind, length = 'map', marker & 0x0f
+    elif marker == 0xc0:
+        return None, pos
+    elif marker == 0xc2:
+        return False, pos
+    elif marker == 0xc3:
+        return True, pos
+    elif marker in _FIXED:
+        fmt = _FIXED[marker]
+        return struct.unpack_from(fmt, data, pos)[0], pos + struct.calcsize(fmt)
+    elif marker in _SIZED:
+        kind, fmt = _SIZED[marker]
+        length = struct.unpack_from(fmt, data, pos)[0]
+        pos += struct.calcsize(fmt)
+    else:
+        emsg = 'Unsupported MessagePack type: 0x{:02x}'
+        raise MessagePackError(emsg.format(marker))
+
+    if kind == 'str':
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    elif kind == 'bin':
+        return bytes(data[pos:pos + length]), pos + length
+    elif kind == 'array':
+        items = []
+        for _ in range(length):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+
+    items = {}
+    for _ in range(length):
+        key, pos = _unpack(data, pos)
+        items[key], pos = _unpack(data, pos)
+    return items, pos
+
+
+def unpackb(data):
+    """
+    Decodes an object in MessagePack format.
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded object.
+
+    Returns
+    -------
+    The decoded object. Arrays are returned as lists, bin values as bytes.
+
+    Raises
+    ------
+    MessagePackError
+        If the data is truncated, malformed, or has extension types.
+    """
+    data = bytearray(data)  # indexing gives integers, also in Python 2
+    try:
+        obj, pos = _unpack(data, 0)
+    except (IndexError, struct.error):
+        raise MessagePackError('Truncated MessagePack data')
+    except UnicodeDecodeError as error:
+        raise MessagePackError('Invalid string: {}'.format(error))
+
+    if pos != len(data):
+        raise MessagePackError('Unexpected data after MessagePack object')
+    return obj
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Residue range selections, shared by the tools that select or delete residues.
+
+A selection is a comma-separated list of residue numbers and ranges. Ranges
+have three components, start, end, and step, e.g. 1:10:2. Start and end are
+optional and default to the first and last residues, respectively. Ranges can
+be restricted to one chain by prefixing them with its identifier, e.g.
+A:10:200:2 or B:5: (a single residue of a chain is written as A:5:5).
+
+Steps refer to the position of the residues in the file, regardless of their
+numbers. While reading a file, a residue in a range with a step is selected if
+its position, counting all residues from the start of the file, is a multiple
+of the step (as in pdb_delres). Alternatively, `resolve_steps` selects every
+N-th of the residues within the range, given all residues of the file (as in
+pdb_selres).
+
+Residue numbers above 9999 are read from the file in hybrid-36 notation (A000,
+A001, ...), and are given in decimal in the selections, e.g. 10000:10010.
+
+Selections are stored as sorted, non-overlapping intervals, one list per
+chain, so their size does not depend on the length of the ranges. Ranges with
+a step are kept apart, since they depend on the order of the residues.
+
+This module is not a tool.
+"""
+
+from bisect import bisect_right
+
+from pdbtools import _hybrid36
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+# Residue numbers have at most 4 characters, in hybrid-36 above 9999.
+MIN_RESID = _hybrid36.MIN_RESID
+MAX_RESID = _hybrid36.MAX_RESID
+
+
+class RangeError(ValueError):
+    """
+    Invalid residue selection.
+
+    Attributes
+    ----------
+    field : str
+        Which part of the selection is invalid: 'start', 'end', 'step',
+        'range' (format or order of the range), or 'chain'.
+
+    reason : str
+        Why the value is invalid: 'number' (not an integer), 'bounds'
+        (outside the valid values), 'order' (start larger than end), or
+        'format'.
+
+    value : str
+        The offending value, or the whole range for 'order' and 'format'.
+    """
+
+    messages = {
+        'number': "Not a valid number: '{value}'",
+        'bounds': ("Residue numbers must be between {min} and {max}: "
+                   "'{value}'"),
+        'step': "Step value must be a positive number: '{value}'",
+        'order': 'Start ({start}) cannot be larger than end ({end})',
+        'format': ("Residue range must be in 'a:z:s' where a and z are "
+                   "optional (default to first residue and last "
+                   "respectively), and s is an optional step value (to "
+                   "return every s-th residue): '{value}'"),
+        'chain': "Chain identifiers must be a single character: '{value}'",
+    }
+
+    def __init__(self, field, reason, value, start=None, end=None):
+        self.field = field
+        self.reason = reason
+        self.value = value
+        self.start = start
+        self.end = end
+
+        if field in ('step', 'chain') and reason != 'number':
+            template = self.messages[field]
+        else:
+            template = self.messages[reason]
+        msg = template.format(value=value, start=start, end=end,
+                              min=MIN_RESID, max=MAX_RESID)
+        super(RangeError, self).__init__(msg)
+
+
+def _in_intervals(intervals, resid):
+    """True if resid is in one of the sorted, non-overlapping intervals."""
+    idx = bisect_right(intervals, [resid, float('inf')]) - 1
+    return idx >= 0 and resid < intervals[idx][1]
+
+
+def _to_int(value, field):
+    """Converts a field of the selection to an integer, or raises."""
+    try:
+        return int(value)
+    except ValueError:
+        raise RangeError(field, 'number', value)
+
+
+class ResidueRanges(object):
+    """
+    A selection of residues, as intervals of residue numbers.
+
+    Use `parse` to build one from the command-line option of a tool, and
+    `matcher` to test residues against it while reading a file.
+    """
+
+    def __init__(self):
+        self._plain = {}  # chain: [[start, end], ...] (end is exclusive)
+        self._stepped = []  # (chain, start, end, step)
+
+    @classmethod
+    def parse(cls, option):
+        """
+        Builds a selection from a comma-separated list of ranges.
+
+        Raises
+        ------
+        RangeError
+            If any of the ranges is not valid.
+        """
+        selection = cls()
+        for entry in option.split(','):
+            selection.add(*cls._parse_entry(entry))
+        return selection
+
+    @staticmethod
+    def _parse_entry(entry):
+        """Returns (start, end, step, chain) from a single range."""
+        fields = entry.split(':')
+
+        chain = None
+        if len(fields) >= 3 and fields[0].strip():
+            try:
+                int(fields[0])
+            except ValueError:
+                chain = fields[0]
+                fields = fields[1:]
+                if len(chain) != 1:
+                    raise RangeError('chain', 'format', chain)
+
+        if len(fields) == 1:  # single residue
+            resid = _to_int(fields[0], 'start')
+            if not (MIN_RESID <= resid <= MAX_RESID):
+                raise RangeError('start', 'bounds', fields[0])
+            return (resid, resid, 1, chain)
+
+        elif len(fields) > 3:
+            raise RangeError('range', 'format', entry)
+
+        start, end, step = (fields + [''])[:3]
+
+        if start.strip():
+            start_str, start = start, _to_int(start, 'start')
+            if not (MIN_RESID <= start <= MAX_RESID):
+                raise RangeError('start', 'bounds', start_str)
+        else:
+            start = MIN_RESID
+
+        if end.strip():
+            end_str, end = end, _to_int(end, 'end')
+            if not (MIN_RESID <= end <= MAX_RESID):
+                raise RangeError('end', 'bounds', end_str)
+        else:
+            end = MAX_RESID
+
+        if step.strip():
+            step_str, step = step, _to_int(step, 'step')
+            if step < 1:
+                raise RangeError('step', 'bounds', step_str)
+        else:
+            step = 1
+
+        if start > end:
+            raise RangeError('range', 'order', entry, start, end)
+
+        return (start, end, step, chain)
+
+    def add(self, start, end, step=1, chain=None):
+        """
+        Adds a range of residues to the selection.
+
+        Parameters
+        ----------
+        start, end : int
+            First and last residue numbers of the range (inclusive).
+
+        step : int, optional
+            Select only every `step`-th residue in the range.
+
+        chain : str, optional
+            Restrict the range to this chain. By default, the range
+            applies to all chains.
+        """
+        if step > 1:
+            self._stepped.append((chain, start, end + 1, step))
+        else:
+            self._plain.setdefault(chain, []).append([start, end + 1])
+
+    def has_steps(self):
+        """True if any of the ranges has a step."""
+        return bool(self._stepped)
+
+    def resolve_steps(self, residues):
+        """
+        Returns a copy of the selection with the ranges with a step replaced
+        by the residue numbers they select.
+
+        Every N-th residue within each range is selected, and then all
+        residues with the same numbers (in the chain of the range, if any).
+
+        Parameters
+        ----------
+        residues : list of tuples
+            The (chain, resid) tuples of all residues of a file, in the
+            order they appear in it.
+
+        Returns
+        -------
+        ResidueRanges
+        """
+        selection = ResidueRanges()
+        for chain, intervals in self._plain.items():
+            for start, end in intervals:
+                selection.add(start, end - 1, chain=chain)
+
+        for chain, start, end, step in self._stepped:
+            if chain is not None:
+                candidates = [r for r in residues if r[0] == chain]
+            else:
+                candidates = residues
+            in_range = [resid for _, resid in candidates
+                        if start <= resid < end]
+            for resid in in_range[::step]:
+                selection.add(resid, resid, chain=chain)
+        return selection
+
+    def _merged(self):
+        """Returns the ranges without a step as non-overlapping intervals."""
+        plain = {}
+        for chain, intervals in self._plain.items():
+            intervals = sorted(intervals)
+            merged = [list(intervals[0])]
+            for start, end in intervals[1:]:
+                if start <= merged[-1][1]:  # overlapping or adjacent
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            plain[chain] = merged
+        return plain
+
+    def matcher(self, as_bytes=False):
+        """
+        Returns a function that tests residues against the selection.
+
+        The function takes the chain identifier and residue number fields of
+        a line, i.e. line[21:26], and returns True if the residue is
+        selected. It must be called once for every ATOM, HETATM, ANISOU, and
+        TER line, in order, to count the residues for ranges with a step:
+        a residue is selected by a range with a step if its position in
+        the file, counting from 0, is a multiple of the step.
+
+        Parameters
+        ----------
+        as_bytes : bool, optional
+            If True, the function takes `bytes` instead of `str`.
+        """
+        stepped = self._stepped
+        if as_bytes:
+            stepped = [(chain if chain is None else chain.encode('utf-8'),
+                        start, end, step)
+                       for chain, start, end, step in stepped]
+
+        plain = self._merged()
+        if as_bytes:
+            plain = dict((k if k is None else k.encode('utf-8'), v)
+                         for k, v in plain.items())
+
+        if as_bytes:
+            def _decode_resid(text):
+                return _hybrid36.decode_resid(text.decode('ascii', 'replace'))
+        else:
+            _decode_resid = _hybrid36.decode_resid
+
+        state = {'res_id': None, 'selected': False, 'position': -1}
+
+        def _match(res_id):
+            if res_id == state['res_id']:  # same residue as last call
+                return state['selected']
+
+            state['res_id'] = res_id
+            state['position'] += 1
+            chain = res_id[:1]
+            try:
+                resid = _decode_resid(res_id[1:])
+            except ValueError:  # e.g. bare TER, belongs to previous residue
+                return state['selected']
+
+            selected = False
+            for key in (None, chain):
+                intervals = plain.get(key)
+                if intervals and _in_intervals(intervals, resid):
+                    selected = True
+                    break
+
+            if not selected:
+                position = state['position']
+                for s_chain, start, end, step in stepped:
+                    if s_chain is not None and s_chain != chain:
+                        continue
+                    if start <= resid < end and not position % step:
+                        selected = True
+                        break
+
+            state['selected'] = selected
+            return selected
+
+        return _match
+
+
+def as_ranges(residues, step=1):
+    """
+    Returns a ResidueRanges object from a collection of residue numbers.
+
+    Objects that are already ResidueRanges are returned as they are. Used
+    to keep accepting lists and sets of residue numbers in `run` functions.
+
+    Parameters
+    ----------
+    residues : ResidueRanges, or list/set of ints
+        The residue numbers.
+
+    step : int, optional
+        Select only the residues whose position in the file is a multiple
+        of `step`, as for a range with a step, e.g. 1:10:2.
+
+    Raises
+    ------
+    ValueError
+        If a step is given with a ResidueRanges object, which has its own.
+    """
+    if isinstance(residues, ResidueRanges):
+        if step != 1:
+            emsg = 'Cannot apply a step to a ResidueRanges object: {}'
+            raise ValueError(emsg.format(step))
+        return residues
+
+    selection = ResidueRanges()
+    for resid in residues:
+        selection.add(resid, resid)
+    if step != 1:
+        intervals = selection._merged().get(None, [])
+        selection = ResidueRanges()
+        for start, end in intervals:
+            selection.add(start, end - 1, step)
+    return selection
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fast writers of atom records, in PDB and mmCIF format.
+
+Formatting a line with a single `str.format` template is simple, but costly
+when repeated for millions of atoms. The writers in this module split each line
+in blocks of columns and format each block only when needed:
+
+    - blocks that depend on few distinct values (e.g. atom and element names,
+      occupancies, charges) are formatted once per value and cached;
+    - the residue block (name, chain, number, insertion code) is formatted
+      once per residue and reused for its consecutive atoms;
+    - only the coordinates are formatted for every atom.
+
+The blocks are then concatenated. The output is identical to that of the
+templates the writers replace.
+
+This module is not a tool.
+"""
+
+from pdbtools import _hybrid36
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+EMPTY = frozenset(('.', '?'))  # mmCIF missing/default values
+
+
+class FormatLimitError(ValueError):
+    """Raised when an atom does not fit in the columns of a PDB line."""
+    pass
+
+
+class Memo(dict):
+    """
+    Cache of the results of a function of one (hashable) argument.
+
+    Looking up a value calls the function only the first time, e.g.
+    `fmt = Memo(lambda v: '%6.2f' % float(v)); fmt['1.0']`. The cache is
+    emptied when it reaches `max_size` values.
+    """
+
+    def __init__(self, func, max_size=65536):
+        super(Memo, self).__init__()
+        self.func = func
+        self.max_size = max_size
+
+    def __missing__(self, key):
+        if len(self) >= self.max_size:
+            self.clear()
+        value = self[key] = self.func(key)
+        return value
+
+
+def _pdb_charge(charge):
+    """Converts a mmCIF charge (e.g. -1) to PDB notation (e.g. 1-)."""
+    try:
+        charge = int(charge)
+    except ValueError:
+        charge = 0
+    if charge:
+        return '{}{}'.format(abs(charge), '+' if charge > 0 else '-')
+    return '  '
+
+
+class PDBAtomWriter(object):
+    """
+    Writes _atom_site rows of a mmCIF file as PDB ATOM/HETATM lines.
+
+    Parameters
+    ----------
+    columns : dict
+        Index of each field in the rows: 'record', 'atname', 'altloc',
+        'resname', 'chainid', 'resnum', 'icode', 'x', 'y', 'z', 'occ',
+        'bfactor', 'element', and 'charge'. Missing fields can point to a
+        '?' at the end of the rows.
+
+    Attributes
+    ----------
+    write : function
+        Takes a row (list of str) and the serial number of the atom, and
+        returns the PDB line. Raises FormatLimitError if the atom does not
+        fit in the PDB format, e.g. if the chain identifier is too long.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.write = self._compile()
+
+    def _compile(self):
+        """Builds the `write` function for the columns of the rows."""
+        i_record = self.columns['record']
+        i_atname = self.columns['atname']
+        i_altloc = self.columns['altloc']
+        i_resname = self.columns['resname']
+        i_chainid = self.columns['chainid']
+        i_resnum = self.columns['resnum']
+        i_icode = self.columns['icode']
+        i_x = self.columns['x']
+        i_y = self.columns['y']
+        i_z = self.columns['z']
+        i_occ = self.columns['occ']
+        i_bfactor = self.columns['bfactor']
+        i_element = self.columns['element']
+        i_charge = self.columns['charge']
+
+        empty = EMPTY
+        _encode_serial = _hybrid36.encode_serial
+        _decimal = str
+
+        def fmt_name(key):
+            """Columns 13-16 (atom name), padded as in the PDB."""
+            atname, element = key
+            if len(atname) < 4 and atname[0].isalpha() and len(element) < 2:
+                atname = ' ' + atname  # pad
+            return '{:<4s}'.format(atname)
+
+        def fmt_tail(key):
+            """Columns 67-80 (segment, element, charge)."""
+            segid, element, charge = key
+            charge = _pdb_charge(charge)
+            return '      {:<4s}{:<2s}{:2s}\n'.format(segid, element, charge)
+
+        record_block = Memo('{:6s}'.format)
+        name_block = Memo(fmt_name)
+        altloc_block = Memo(lambda v: ' ' if v in empty else '{:1s}'.format(v))
+        occ_block = Memo(lambda v: '{:6.2f}'.format(
+            1.0 if v in empty else float(v)))
+        bfactor_block = Memo(lambda v: '{:6.2f}'.format(
+            0.0 if v in empty else float(v)))
+        tail_block = Memo(fmt_tail)
+
+        # Residue block: columns 18-30, reused for consecutive atoms.
+        residue = [None, None]  # key, text
+
+        def fmt_residue(key):
+            """Columns 18-30 (residue name, chain, number, insertion code)."""
+            resname, chainid, resnum, icode = key
+            if len(chainid) > 1:
+                emsg = 'Chain IDs is too large: \'{}\''
+                raise FormatLimitError(emsg.format(chainid))
+
+            resnum = int(resnum)
+            try:
+                resnum = _hybrid36.encode_resid(resnum)
+            except ValueError:
+                emsg = 'Too many residues (\'{}\') in chain \'{}\' '
+                raise FormatLimitError(emsg.format(resnum, chainid))
+
+            if icode in empty:
+                icode = ' '
+            return '{:3s} {:1s}{:>4s}{:1s}   '.format(resname, chainid, resnum,
+                                                      icode)
+
+        def write(fields, serial):
+            """Writes one row as a PDB line."""
+            if serial < 100000:
+                serial = _decimal(serial).rjust(5)
+            else:
+                try:
+                    serial = _encode_serial(serial)
+                except ValueError:
+                    emsg = 'Number of atoms exceeds PDB format limit: \'{}\''
+                    raise FormatLimitError(emsg.format(serial))
+
+            key = (fields[i_resname], fields[i_chainid], fields[i_resnum],
+                   fields[i_icode])
+            if key != residue[0]:
+                residue[0], residue[1] = key, fmt_residue(key)
+
+            element = fields[i_element]
+            if element in empty:
+                element = ' '
+
+            return ''.join((
+                record_block[fields[i_record]],
+                serial,
+                ' ',
+                name_block[(fields[i_atname], element)],
+                altloc_block[fields[i_altloc]],
+                residue[1],
+                '%8.3f%8.3f%8.3f' % (float(fields[i_x]), float(fields[i_y]),
+                                     float(fields[i_z])),
+                occ_block[fields[i_occ]],
+                bfactor_block[fields[i_bfactor]],
+                tail_block[(fields[i_chainid], element, fields[i_charge])],
+            ))
+
+        return write
+
+
+class CIFAtomWriter(object):
+    """
+    Writes PDB ATOM/HETATM lines as _atom_site rows of a mmCIF file.
+
+    The rows have the columns listed in `TAGS`, in this order.
+
+    Attributes
+    ----------
+    write : function
+        Takes a PDB line, the serial number of the atom, and the model
+        number, and returns the mmCIF row.
+    """
+
+    TAGS = (
+        'group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id',
+        'label_comp_id', 'label_asym_id', 'label_entity_id', 'label_seq_id',
+        'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy',
+        'B_iso_or_equiv', 'pdbx_formal_charge', 'auth_seq_id',
+        'auth_comp_id', 'auth_asym_id', 'auth_atom_id', 'pdbx_PDB_model_num',
+    )
+
+    def __init__(self):
+        self.write = self._compile()
+
+    @staticmethod
+    def _compile():
+        """Builds the `write` function."""
+
+        def atom_names(key):
+            """Element and atom name columns, and the auth atom name."""
+            atname, element = key
+            element = element.strip() or '?'
+            atname = atname.strip().replace('"', "'")
+            if "'" in atname:
+                atname = '"{}"'.format(atname)
+            return ('{:2s} {:6s} '.format(element, atname),
+                    ' {:4s} '.format(atname))
+
+        def residue_names(key):
+            """Label residue columns, and the auth residue columns."""
+            resname = key[:3]
+            chainid = key[4] if key[4] != ' ' else '?'
+            resnum = key[5:9].strip()
+            if resnum[:1].isalpha():  # hybrid-36
+                resnum = str(_hybrid36.decode_resid(resnum))
+            icode = key[9] if key[9] != ' ' else '?'
+            label = '{:3s} {:3s} ? {:5s} {:1s} '.format(resname, chainid,
+                                                        resnum, icode)
+            auth = '{:5s} {:3s} {:1s}'.format(resnum, resname, chainid)
+            return (label, auth)
+
+        record_block = Memo(lambda v: '{:<6s} '.format(v.strip()))
+        name_blocks = Memo(atom_names)
+        altloc_block = Memo(lambda v: '? ' if v == ' ' else v + ' ')
+        charge_block = Memo(lambda v: '{:1s} '.format(v.strip() or '?'))
+        residue_blocks = Memo(residue_names)
+        model_block = Memo('{:1d}\n'.format)
+
+        def write(line, serial, model_no):
+            """Writes one PDB line as a mmCIF row."""
+            names, auth_name = name_blocks[(line[12:16], line[76:78])]
+            residue, auth_residue = residue_blocks[line[17:27]]
+            return ''.join((
+                record_block[line[0:6]],
+                '{:5d} '.format(serial),
+                names,
+                altloc_block[line[16]],
+                residue,
+                '%10.3f %10.3f %10.3f %10.3f %10.3f ' % (
+                    float(line[30:38]), float(line[38:46]),
+                    float(line[46:54]), float(line[54:60]),
+                    float(line[60:66])),
+                charge_block[line[78:80]],
+                auth_residue,
+                auth_name,
+                model_block[model_no],
+            ))
+
+        return write
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Selection expressions, shared by the tools that select or delete atoms.
+
+An expression combines selectors with `and`, `or`, `not`, and parentheses,
+e.g. 'chain A,B and resname ALA,GLY and not element H'. Each selector is a
+keyword followed by a comma-separated list of values (without spaces):
+
+    chain <ids>        chain identifier (column 22)
+    resname <names>    residue name (columns 18-20)
+    name <names>       atom name (columns 13-16)
+    element <symbols>  element symbol (columns 77-78)
+    segid <ids>        segment identifier (columns 73-76)
+    resid <ranges>     residue numbers, as in pdb_selres, e.g. 1:10,A:20:
+    hetatm             HETATM records (and their ANISOU records); no values
+
+The expression is compiled once into a single Python function that filters a
+file in one pass. Selectors test ATOM, HETATM, and ANISOU records. TER records
+are tested only by the selectors that make sense for them (chain, resname,
+resid); other selectors are ignored for TER records, and TER records are kept
+if none applies. All other records are kept.
+
+This module is not a tool.
+"""
+
+from pdbtools import _ranges
+from pdbtools import _stream
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+# keyword: (start, end, strip, tests TER records)
+FIELDS = {
+    'chain': (21, 22, False, True),
+    'resname': (17, 20, True, True),
+    'name': (12, 16, True, False),
+    'element': (76, 78, True, False),
+    'segid': (72, 76, True, False),
+}
+
+OPERATORS = set(['and', 'or', 'not', '(', ')'])
+KEYWORDS = set(FIELDS) | set(['resid', 'hetatm'])
+
+_TEMPLATE = """
+def _filter(fhandle):
+    het = False
+    for line in fhandle:
+        if line.startswith(atom_records):
+            {het}
+            if not ({atom_test}):
+                continue
+        elif line.startswith(ter_record):
+            if not ({ter_test}):
+                continue
+        yield line
+"""
+
+
+class SelectionError(ValueError):
+    """Invalid selection expression."""
+
+
+class Selection(object):
+    """
+    A compiled selection expression.
+
+    Use `parse` to build one from an expression, and `filter` to select
+    the lines of a file.
+    """
+
+    def __init__(self, tree):
+        # Nested tuples: ('and', a, b, ...), ('or', a, b, ...),
+        # ('not', a), or ('sel', keyword, values)
+        self.tree = tree
+
+    @classmethod
+    def parse(cls, expression):
+        """
+        Builds a selection from an expression.
+
+        Raises
+        ------
+        SelectionError
+            If the expression is not valid.
+        """
+        tokens = expression.replace('(', ' ( ').replace(')', ' ) ').split()
+        if not tokens:
+            raise SelectionError('Selection expression is empty')
+
+        tree, pos = _parse_or(tokens, 0)
+        if pos != len(tokens):
+            emsg = "Unexpected '{}' in selection"
+            raise SelectionError(emsg.format(tokens[pos]))
+        return cls(tree)
+
+    @classmethod
+    def from_values(cls, keyword, values, invert=False):
+        """
+        Builds a selection from a single selector.
+
+        Parameters
+        ----------
+        keyword : str
+            The selector, e.g. 'chain'.
+
+        values : set, list, or tuple
+            The values to select, e.g. set(['A', 'B']).
+
+        invert : bool, optional
+            If True, selects the lines that do NOT match the values.
+        """
+        tree = ('sel', keyword, frozenset(values))
+        if invert:
+            tree = ('not', tree)
+        return cls(tree)
+
+    def compile(self, as_bytes=False):
+        """
+        Returns a generator function that filters a line iterator.
+
+        Parameters
+        ----------
+        as_bytes : bool, optional
+            If True, the function filters `bytes` lines, not `str`.
+        """
+        namespace = {}
+
+        def _encode(value):
+            return _stream.to_bytes(value) if as_bytes else value
+
+        atom_test = _to_source(self.tree, namespace, as_bytes, False)
+        ter_test = _to_source(self.tree, namespace, as_bytes, True)
+
+        het = 'pass'
+        if _uses(self.tree, 'hetatm'):
+            het = ('if not line.startswith(anisou_record): '
+                   'het = line.startswith(hetatm_record)')
+
+        namespace['atom_records'] = _encode(('ATOM', 'HETATM', 'ANISOU'))
+        namespace['ter_record'] = _encode('TER')
+        namespace['hetatm_record'] = _encode('HETATM')
+        namespace['anisou_record'] = _encode('ANISOU')
+
+        source = _TEMPLATE.format(het=het,
+                                  atom_test=atom_test or 'True',
+                                  ter_test=ter_test or 'True')
+        exec(compile(source, '<selection>', 'exec'), namespace)
+        return namespace['_filter']
+
+    def filter(self, fhandle):
+        """
+        Filters the lines of a PDB file.
+
+        Parameters
+        ----------
+        fhandle : a line-by-line iterator of the original PDB file.
+            Lines can be `str` or `bytes`, and are yielded as such.
+
+        Returns
+        -------
+        iterator
+            The selected lines and all non-coordinate lines.
+        """
+        fhandle, as_bytes = _stream.sniff(fhandle)
+        return self.compile(as_bytes)(fhandle)
+
+
+def _parse_or(tokens, pos):
+    """expr := term ('or' term)*"""
+    node, pos = _parse_and(tokens, pos)
+    nodes = [node]
+    while pos < len(tokens) and tokens[pos] == 'or':
+        node, pos = _parse_and(tokens, pos + 1)
+        nodes.append(node)
+    if len(nodes) == 1:
+        return nodes[0], pos
+    return ('or',) + tuple(nodes), pos
+
+
+def _parse_and(tokens, pos):
+    """term := factor ('and' factor)*"""
+    node, pos = _parse_not(tokens, pos)
+    nodes = [node]
+    while pos < len(tokens) and tokens[pos] == 'and':
+        node, pos = _parse_not(tokens, pos + 1)
+        nodes.append(node)
+    if len(nodes) == 1:
+        return nodes[0], pos
+    return ('and',) + tuple(nodes), pos
+
+
+def _parse_not(tokens, pos):
+    """factor := 'not' factor | '(' expr ')' | selector"""
+    if pos >= len(tokens):
+        raise SelectionError('Selection expression ends unexpectedly')
+
+    token = tokens[pos]
+    if token == 'not':
+        node, pos = _parse_not(tokens, pos + 1)
+        return ('not', node), pos
+
+    elif token == '(':
+        node, pos = _parse_or(tokens, pos + 1)
+        if pos >= len(tokens) or tokens[pos] != ')':
+            raise SelectionError("Missing ')' in selection")
+        return node, pos + 1
+
+    elif token not in KEYWORDS:
+        emsg = "Unknown selector: '{}'. Valid selectors: {}"
+        raise SelectionError(emsg.format(token, ', '.join(sorted(KEYWORDS))))
+
+    elif token == 'hetatm':
+        return ('sel', token, None), pos + 1
+
+    # Values
+    pos += 1
+    if pos >= len(tokens) or tokens[pos] in OPERATORS:
+        emsg = "Selector '{}' needs at least one value"
+        raise SelectionError(emsg.format(token))
+
+    values = tokens[pos]
+    if token == 'resid':
+        try:
+            ranges = _ranges.ResidueRanges.parse(values)
+        except _ranges.RangeError as error:
+            raise SelectionError(str(error))
+        if ranges.has_steps():
+            emsg = "Steps are not supported in selections: '{}'"
+            raise SelectionError(emsg.format(values))
+        return ('sel', token, ranges), pos + 1
+
+    values = frozenset(v for v in values.split(',') if v)
+    if not values:
+        emsg = "Selector '{}' needs at least one value"
+        raise SelectionError(emsg.format(token))
+    if token == 'chain' and any(len(v) > 1 for v in values):
+        emsg = "Chain identifiers must be a single character: '{}'"
+        raise SelectionError(emsg.format(tokens[pos]))
+    return ('sel', token, values), pos + 1
+
+
+def _uses(tree, keyword):
+    """True if the selector is used anywhere in the expression."""
+    if tree[0] == 'sel':
+        return tree[1] == keyword
+    return any(_uses(node, keyword) for node in tree[1:])
+
+
+def _to_source(tree, namespace, as_bytes, ter):
+    """
+    Translates an expression to Python source code.
+
+    Values are stored in `namespace`, and referred to by name in the code.
+    Selectors that do not apply to TER records are dropped from the
+    expression when `ter` is True; returns None if nothing is left.
+    """
+    operator = tree[0]
+    if operator == 'not':
+        inner = _to_source(tree[1], namespace, as_bytes, ter)
+        return None if inner is None else '(not {})'.format(inner)
+
+    elif operator in ('and', 'or'):
+        parts = [_to_source(node, namespace, as_bytes, ter)
+                 for node in tree[1:]]
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return None
+        return '({})'.format(' {} '.format(operator).join(parts))
+
+    _, keyword, values = tree
+    if keyword == 'hetatm':
+        return None if ter else 'het'
+
+    name = 'v{}'.format(len(namespace))
+    if keyword == 'resid':
+        namespace[name] = values.matcher(as_bytes)
+        return '{}(line[21:26])'.format(name)
+
+    start, end, strip, tests_ter = FIELDS[keyword]
+    if ter and not tests_ter:
+        return None
+
+    namespace[name] = _stream.to_bytes(values) if as_bytes else values
+    if strip:
+        return 'line[{}:{}].strip() in {}'.format(start, end, name)
+    return 'line[{}:{}] in {}'.format(start, end, name)
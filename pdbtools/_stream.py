@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helper functions to read and write PDB data streams.
+
+Files compressed with gzip, bzip2, or xz (and zstandard, if the optional
+`zstandard` package is installed) are decompressed on the fly by `open_file`,
+which detects the compression from the first bytes of the file. Output files
+are compressed by `open_output` according to their extension.
+
+Tools that only compare columns against ASCII values can process the raw
+bytes of a file directly, which avoids decoding and encoding every line.
+Their `run` functions accept both `str` and `bytes` lines, using `sniff` to
+find out which one they are getting, and their `main` functions use
+`binary_streams` to read and write bytes whenever possible. Line endings are
+translated in the binary path exactly as in text mode, so that the output of
+both is the same.
+
+This module is not a tool.
+"""
+
+import bz2
+from functools import partial
+import gzip
+import io
+from itertools import chain as iter_chain
+import os
+import sys
+
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+# (magic bytes, file extension)
+COMPRESSION_FORMATS = (
+    (b'\x1f\x8b', '.gz'),
+    (b'BZh', '.bz2'),
+    (b'\xfd7zXZ\x00', '.xz'),
+    (b'\x28\xb5\x2f\xfd', '.zst'),
+)
+
+READ_SIZE = 1048576  # bytes read at a time by `iter_lines`
+
+
+def sniff(fhandle):
+    """
+    Peeks at the first line of a line iterator to find out its type.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    Returns
+    -------
+    tuple
+        An iterator yielding the same lines as `fhandle`, including the
+        first, and True if the lines are `bytes` (and not `str`).
+    """
+    fhandle = iter(fhandle)
+    for first_line in fhandle:
+        as_bytes = isinstance(first_line, bytes) and bytes is not str
+        return iter_chain((first_line,), fhandle), as_bytes
+    return fhandle, False
+
+
+def to_bytes(value):
+    """
+    Encodes a string, or a tuple/list/set of strings, to bytes.
+
+    Used to match the options given to a tool to the type of its input.
+    """
+    if isinstance(value, bytes):
+        return value
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        return type(value)(to_bytes(v) for v in value)
+    return value.encode('utf-8')
+
+
+def binary_streams(instream, outstream):
+    """
+    Returns the binary layer of a pair of text streams, if both have one.
+
+    Parameters
+    ----------
+    instream : file handle opened in text mode, e.g. sys.stdin.
+
+    outstream : file handle opened in text mode, e.g. sys.stdout.
+
+    Returns
+    -------
+    tuple
+        The input stream, the output stream, and the empty string of the
+        matching type (to join lines before writing). If either stream
+        does not expose a binary buffer (e.g. Python 2, StringIO), the
+        original text streams are returned. If the input stream translates
+        line endings, the input is an iterator of lines with the same
+        endings (see `iter_lines`).
+    """
+    try:
+        inbuffer, outbuffer = instream.buffer, outstream.buffer
+    except AttributeError:
+        return instream, outstream, ''
+
+    if _translates_newlines(instream):
+        inbuffer = iter_lines(inbuffer)
+    return inbuffer, outbuffer, b''
+
+
+def _translates_newlines(stream):
+    """
+    True if a text stream translates '\r\n' and '\r' line endings to '\n'.
+
+    Files opened in text mode do (universal newlines). The standard input
+    only does on Windows, and keeps line endings as they are elsewhere.
+    """
+    return stream is not sys.stdin or os.name == 'nt'
+
+
+def _translate(data):
+    """Replaces '\r\n' and '\r' line endings by '\n'."""
+    if b'\r' in data:
+        return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return data
+
+
+def iter_lines(buffer):
+    """
+    Yields the lines of a binary stream, with universal newlines.
+
+    Lines ending in '\r\n' or '\r' are yielded ending in '\n', as when
+    reading the stream in text mode. The stream is read in blocks of
+    READ_SIZE bytes, and each block is translated and split at once.
+
+    Parameters
+    ----------
+    buffer : file handle opened in binary mode, e.g. sys.stdin.buffer.
+
+    Yields
+    ------
+    bytes (line-by-line)
+    """
+    read = getattr(buffer, 'read1', buffer.read)
+    rest = b''
+    for chunk in iter(partial(read, READ_SIZE), b''):
+        data = rest + chunk
+        # A '\r' at the end might be the first half of a '\r\n'.
+        cut = len(data) - 1 if data.endswith(b'\r') else len(data)
+        block = _translate(data[:cut])
+        end = block.rfind(b'\n') + 1
+        for line in block[:end].splitlines(True):
+            yield line
+        rest = block[end:] + data[cut:]
+
+    for line in _translate(rest).splitlines(True):
+        yield line
+
+
+class CompressedFile(io.TextIOWrapper):
+    """Text-mode handle of a compressed file that keeps its file name."""
+
+    def __init__(self, buffer, name):
+        super(CompressedFile, self).__init__(buffer)
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+
+def _open_compressed(path, ext, mode):
+    """Opens a compressed file in text mode ('r' or 'w')."""
+    bmode = mode + 'b'
+    if ext == '.gz':
+        stream = gzip.GzipFile(path, bmode)
+    elif ext == '.bz2':
+        stream = bz2.BZ2File(path, bmode)
+    elif ext == '.xz' and lzma is not None:
+        stream = lzma.LZMAFile(path, bmode)
+    elif ext == '.zst' and zstandard is not None:
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(
+                open(path, bmode), closefd=True
+            )
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(
+                open(path, bmode), closefd=True
+            )
+    else:
+        emsg = 'ERROR!! Compression format not supported: \'{}\'\n'
+        sys.stderr.write(emsg.format(path))
+        sys.exit(1)
+
+    return CompressedFile(stream, path)
+
+
+def open_file(path):
+    """
+    Opens a file for reading in text mode, decompressing it if necessary.
+
+    The compression format is detected from the first bytes of the file,
+    regardless of its extension. Used by `check_input` in place of
+    `open(path, 'r')`.
+
+    Parameters
+    ----------
+    path : str
+        Path to a plain or compressed file.
+
+    Returns
+    -------
+    file handle
+        A text-mode file handle. Its `buffer` attribute gives the
+        (decompressed) bytes.
+    """
+    with open(path, 'rb') as fh:
+        magic = fh.read(6)
+
+    for prefix, ext in COMPRESSION_FORMATS:
+        if magic.startswith(prefix):
+            return _open_compressed(path, ext, 'r')
+    return open(path, 'r')
+
+
+def open_output(path):
+    """
+    Opens a file for writing in text mode, compressing it if its extension
+    is one of .gz, .bz2, .xz, or .zst.
+    """
+    for _, ext in COMPRESSION_FORMATS:
+        if path.endswith(ext):
+            return _open_compressed(path, ext, 'w')
+    return open(path, 'w')
+
+
+def split_compression_ext(path):
+    """
+    Splits the compression extension from a file name, if any.
+
+    Example: '1ctf.pdb.gz' gives ('1ctf.pdb', '.gz') and '1ctf.pdb' gives
+    ('1ctf.pdb', '').
+    """
+    for _, ext in COMPRESSION_FORMATS:
+        if path.endswith(ext):
+            return path[:-len(ext)], ext
+    return path, ''
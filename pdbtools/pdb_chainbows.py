@@ -40,6 +40,8 @@ import os
 import string
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -64,7 +66,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
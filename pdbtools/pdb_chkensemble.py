@@ -33,10 +33,11 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
-import itertools
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -61,7 +62,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -72,6 +73,58 @@ def check_input(args):
     return fh
 
 
+def _fingerprint(atom_uids):
+    """Order-independent hash of a collection of atom identifiers."""
+    mask = (1 << 64) - 1
+    hsum, hxor = 0, 0
+    for atom_uid in atom_uids:
+        h = hash(atom_uid)
+        hsum = (hsum + h) & mask
+        hxor ^= h
+    return (len(atom_uids), hsum, hxor)
+
+
+def _check_model(reference, model_no, model_atoms):
+    """
+    Compares the atoms of a model to those of the reference model.
+
+    Returns the reference, created from this model if None, and True if
+    the models differ. Differences are written to stderr.
+    """
+    if reference is None:
+        atoms = set(model_atoms)
+        return (model_no, atoms, _fingerprint(atoms)), False
+
+    # Fast path: same atoms, no need to build a set.
+    ref_no, ref_atoms, ref_fingerprint = reference
+    if _fingerprint(model_atoms) == ref_fingerprint:
+        return reference, False
+
+    model_atoms = set(model_atoms)
+    difference_ij = ref_atoms - model_atoms
+    difference_ji = model_atoms - ref_atoms
+
+    if difference_ij or difference_ji:
+        msg = 'Models {} and {} differ:\n'
+        sys.stderr.write(msg.format(ref_no, model_no))
+
+        if len(difference_ij):
+            d_ij = sorted(difference_ij)
+            msg = 'Atoms in model {} only:\n'
+            sys.stderr.write(msg.format(ref_no))
+            sys.stderr.write('\n'.join(d_ij))
+
+        if len(difference_ji):
+            d_ji = sorted(difference_ji)
+            msg = 'Atoms in model {} only:\n'
+            sys.stderr.write(msg.format(model_no))
+            sys.stderr.write('\n'.join(d_ji))
+
+        return reference, True
+
+    return reference, False  # e.g. duplicated atoms
+
+
 def run(fhandle):
     """
     Check if the ensemble is valid.
@@ -79,6 +132,11 @@ def run(fhandle):
     - Same atoms in each model
     - Paired MODEL/ENDMDL tags
 
+    Every model is compared to the first one using an order-independent
+    fingerprint of its atoms. Models are only compared atom by atom if
+    their fingerprints differ. Only the first and the current model are
+    kept in memory.
+
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
@@ -90,7 +148,10 @@ def run(fhandle):
     """
     model_open = False
     model_no = None
-    model_data = {}  # list of sets
+    model_atoms = []  # atoms of the current model
+    model_list = set()
+    reference = None  # first model: (number, atoms, fingerprint)
+    bad_ensemble = False
     records = ('ATOM', 'HETATM', 'ANISOU', 'TER')
     for lineno, line in enumerate(fhandle):
         if line.startswith('MODEL'):
@@ -101,7 +162,8 @@ def run(fhandle):
 
             model_open = True
             model_no = int(line[10:14])
-            model_data[model_no] = set()
+            model_list.add(model_no)
+            model_atoms = []
 
         elif line.startswith('ENDMDL'):
             if not model_open:
@@ -109,8 +171,12 @@ def run(fhandle):
                 sys.stderr.write(emsg.format(lineno))
                 return 1
 
+            reference, differs = _check_model(reference, model_no, model_atoms)
+            bad_ensemble |= differs
+
             model_open = False
             model_no = None  # will fail to add lines if a new model is not open
+            model_atoms = []
 
         elif line.startswith(records):
             if not model_open:
@@ -119,42 +185,19 @@ def run(fhandle):
                 return 1
 
             atom_uid = line[6:27]
-            model_data[model_no].add(atom_uid)
+            model_atoms.append(atom_uid)
         else:
             if model_open:  # Missing last ENDMDL
                 emsg = 'ERROR!! ENDMDL record missing at line \'{}\'\n'
                 sys.stderr.write(emsg.format(lineno))
                 return 1
 
-    # Verify all models have the same atoms
-    bad_ensemble = False
-    model_no_list = list(model_data.keys())
-    for model_i, model_j in itertools.combinations(model_no_list, 2):
-        atoms_i = model_data[model_i]
-        atoms_j = model_data[model_j]
-
-        difference_ij = atoms_i - atoms_j
-        difference_ji = atoms_j - atoms_i
-
-        if difference_ij or difference_ji:
-            bad_ensemble = True
-            msg = 'Models {} and {} differ:\n'
-            sys.stderr.write(msg.format(model_i, model_j))
-
-            if len(difference_ij):
-                d_ij = sorted(difference_ij)
-                msg = 'Atoms in model {} only:\n'
-                sys.stderr.write(msg.format(model_i))
-                sys.stderr.write('\n'.join(d_ij))
-
-            if len(difference_ji):
-                d_ji = sorted(difference_ji)
-                msg = 'Atoms in model {} only:\n'
-                sys.stderr.write(msg.format(model_j))
-                sys.stderr.write('\n'.join(d_ji))
+    if model_open:  # file ends without ENDMDL
+        reference, differs = _check_model(reference, model_no, model_atoms)
+        bad_ensemble |= differs
 
     if not bad_ensemble:
-        n_models = len(model_data)
+        n_models = len(model_list)
         msg = 'Ensemble of {} models *seems* OK\n'
         sys.stdout.write(msg.format(n_models))
         return 0
@@ -35,6 +35,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _select
+from pdbtools import _stream
+
 __author__ = ["Joao Rodrigues", "Joao M.C. Teixeira"]
 __email__ = ["j.p.g.l.m.rodrigues@gmail.com", "joaomcteixeira@gmail.com"]
 
@@ -70,7 +73,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -87,7 +90,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -120,6 +123,7 @@ def run(fhandle, chain_set):
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
 
     chain_set : set, or list, or tuple
         The group of chains to remove. Example: ('A', 'B').
@@ -131,11 +135,8 @@ def run(fhandle, chain_set):
         removed.
     """
 
-    records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
-    for line in fhandle:
-        if line.startswith(records):
-            if line[21] in chain_set:
-                continue
+    selection = _select.Selection.from_values('chain', chain_set, invert=True)
+    for line in selection.filter(fhandle):
         yield line
 
 
@@ -146,20 +147,23 @@ def main():
     # Check Input
     pdbfh, element = check_input(sys.argv[1:])
 
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
+
     # Do the job
-    new_pdb = run(pdbfh, element)
+    new_pdb = run(pdbin, element)
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_pdb):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                pdbout.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
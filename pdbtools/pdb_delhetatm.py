@@ -34,6 +34,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -58,7 +60,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -78,6 +80,7 @@ def run(fhandle):
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
 
     Yields
     ------
@@ -89,15 +92,20 @@ def run(fhandle):
     char_ranges = (slice(6, 11), slice(11, 16),
                    slice(16, 21), slice(21, 26), slice(26, 31))
 
+    hetatm, anisou, conect = 'HETATM', 'ANISOU', 'CONECT'
+    fhandle, as_bytes = _stream.sniff(fhandle)
+    if as_bytes:
+        hetatm, anisou, conect = _stream.to_bytes((hetatm, anisou, conect))
+
     het_serials = set()
     for line in fhandle:
-        if line.startswith('HETATM'):
+        if line.startswith(hetatm):
             het_serials.add(line[6:11])
             continue
-        elif line.startswith('ANISOU'):
+        elif line.startswith(anisou):
             if line[6:11] in het_serials:
                 continue
-        elif line.startswith('CONECT'):
+        elif line.startswith(conect):
             if any(line[cr] in het_serials for cr in char_ranges):
                 continue
 
@@ -111,20 +119,23 @@ def main():
     # Check Input
     pdbfh = check_input(sys.argv[1:])
 
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
+
     # Do the job
-    new_pdb = run(pdbfh)
+    new_pdb = run(pdbin)
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_pdb):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                pdbout.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
@@ -20,16 +20,20 @@ Deletes a range of residues from a PDB file.
 
 The range option has three components: start, end, and step. Start and end
 are optional and if ommitted the range will start at the first residue or
-end at the last, respectively. The step option can only be used if both start
-and end are provided. Note that the start and end values of the range are
-purely numerical, while the range actually refers to every N-th residue,
-regardless of their sequence number.
+end at the last, respectively. Note that the start and end values of the range
+are purely numerical, while the step refers to every N-th residue of the file,
+counted from the first, regardless of their sequence number. Several ranges
+can be given, separated by commas, and each can be restricted to a single
+chain by prefixing it with its identifier.
 
 Usage:
-    python pdb_delres.py -[resid]:[resid]:[step] <pdb file>
+    python pdb_delres.py -[chain:][resid]:[resid]:[step] <pdb file>
 
 Example:
     python pdb_delres.py -1:10 1CTF.pdb # Deletes residues 1 to 10
+    python pdb_delres.py -1:10,20:30 1CTF.pdb # Deletes residues 1 to 10 and 20 to 30
+    python pdb_delres.py -A:1:10,B:::2 1CTF.pdb # Deletes residues 1 to 10 of chain A
+                                                # and every 2nd residue of chain B
     python pdb_delres.py -1: 1CTF.pdb # Deletes residues 1 to END
     python pdb_delres.py -:5 1CTF.pdb # Deletes residues from START to 5.
     python pdb_delres.py -::5 1CTF.pdb # Deletes every 5th residue
@@ -45,6 +49,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _ranges
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -53,14 +60,6 @@ def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
     """
 
-    def is_integer(string):
-        """Returns True if the string contains *any* integer"""
-        try:
-            int(string)
-            return True
-        except ValueError:
-            return False
-
     # Defaults
     option = ':::'
     fh = sys.stdin  # file handle
@@ -88,7 +87,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -105,77 +104,38 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
         sys.exit(1)
 
     # Validate option
-    if not (1 <= option.count(':') <= 2):
-        emsg = 'ERROR!! Residue range must be in \'a:z:s\' where a and z are '
-        emsg += 'optional (default to first residue and last respectively), and'
-        emsg += 's is an optional step value (to return every s-th residue).\n'
-        sys.stderr.write(emsg)
-        sys.exit(1)
-
-    start, end, step = None, None, 1
-    slices = [num if num.strip() else None for num in option.split(':')]
-    if len(slices) == 3:
-        start, end, step = slices
-    elif len(slices) == 2:
-        start, end = slices
-    elif len(slices) == 1:
-        if option.startswith(':'):
-            end = slices[0]
-        elif option.endswith(':'):
-            start = slices[0]
-
-    if start is None:
-        start = -1000  # residues cannot reach this value (max 4 char)
-    elif not is_integer(start):
-        emsg = 'ERROR!! Starting value must be numerical: \'{}\'\n'
-        sys.stderr.write(emsg.format(start))
-        sys.exit(1)
-    elif not (-999 <= int(start) < 9999):
-        emsg = 'ERROR!! Starting value must be between -999 and 9998: \'{}\'\n'
-        sys.stderr.write(emsg.format(start))
-        sys.exit(1)
-
-    if end is None:
-        end = 10000  # residues cannot reach this value (max 4 char)
-    elif not is_integer(end):
-        emsg = 'ERROR!! End value must be numerical: \'{}\'\n'
-        sys.stderr.write(emsg.format(end))
-        sys.exit(1)
-    elif not (-999 <= int(end) < 9999):
-        emsg = 'ERROR!! End value must be between -999 and 9998: \'{}\'\n'
-        sys.stderr.write(emsg.format(end))
-        sys.exit(1)
+    messages = {
+        ('start', 'number'): 'Starting value must be numerical',
+        ('start', 'bounds'): 'Starting value must be between {} and {}',
+        ('end', 'number'): 'End value must be numerical',
+        ('end', 'bounds'): 'End value must be between {} and {}',
+        ('step', 'number'): 'Step value must be numerical',
+        ('step', 'bounds'): 'Step value must be a positive number',
+    }
 
-    if step is None:
-        step = 1
-    elif not is_integer(step):
-        emsg = 'ERROR!! Step value must be numerical: \'{}\'\n'
-        sys.stderr.write(emsg.format(step))
-        sys.exit(1)
-    elif int(step) <= 0:
-        emsg = 'ERROR!! Step value must be a positive number: \'{}\'\n'
-        sys.stderr.write(emsg.format(step))
-        sys.exit(1)
-
-    start, end, step = int(start), int(end), int(step)
-
-    if start >= end:
-        emsg = 'ERROR!! Start ({}) cannot be larger than end ({})\n'
-        sys.stderr.write(emsg.format(start, end))
+    try:
+        resrange = _ranges.ResidueRanges.parse(option)
+    except _ranges.RangeError as error:
+        emsg = messages.get((error.field, error.reason))
+        if emsg is None:
+            emsg = str(error)
+        else:
+            emsg = emsg.format(_ranges.MIN_RESID, _ranges.MAX_RESID)
+            emsg += ': \'{}\''.format(error.value)
+        sys.stderr.write('ERROR!! {}\n'.format(emsg))
         sys.exit(1)
 
-    resrange = set(range(start, end + 1))
-    return (fh, resrange, step)
+    return (fh, resrange)
 
 
-def run(fhandle, residue_range, step):
+def run(fhandle, residue_range, step=1):
     """
     Delete residues within a certain numbering range.
 
@@ -184,30 +144,29 @@ def run(fhandle, residue_range, step):
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
 
-    residue_range : set, list, or tuple
-        The residues describing the range.
+    residue_range : ResidueRanges, or list/set of ints
+        The residues to delete, as returned by `check_input`.
 
-    step : int
-        The step at which delete.
+    step : int, optional
+        Delete only every `step`-th residue of the file, counted from the
+        first, among those in a list/set of residue numbers. ResidueRanges
+        objects carry their own steps.
 
     Yields
     ------
     str (line-by-line)
         All lines except RECORDS within the residue range.
     """
-    prev_res = None
-    res_counter = -1
+    fhandle, as_bytes = _stream.sniff(fhandle)
+    is_selected = _ranges.as_ranges(residue_range, step).matcher(as_bytes)
     records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+    if as_bytes:
+        records = _stream.to_bytes(records)
     for line in fhandle:
         if line.startswith(records):
-
-            res_id = line[21:26]  # include chain ID
-            if res_id != prev_res:
-                prev_res = res_id
-                res_counter += 1
-
-            if int(line[22:26]) in residue_range and res_counter % step == 0:
+            if is_selected(line[21:26]):  # include chain ID
                 continue
 
         yield line
@@ -218,22 +177,25 @@ delete_residues = run
 
 def main():
     # Check Input
-    pdbfh, resrange, step = check_input(sys.argv[1:])
+    pdbfh, resrange = check_input(sys.argv[1:])
+
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
 
     # Do the job
-    new_pdb = run(pdbfh, resrange, step)
+    new_pdb = run(pdbin, resrange)
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_pdb):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                pdbout.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
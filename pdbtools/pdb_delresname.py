@@ -37,6 +37,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _select
+from pdbtools import _stream
+
 __author__ = ["Joao Rodrigues", "Joao M.C. Teixeira"]
 __email__ = ["j.p.g.l.m.rodrigues@gmail.com", "joaomcteixeira@gmail.com"]
 
@@ -72,7 +75,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -89,7 +92,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -123,6 +126,7 @@ def run(fhandle, resname_set):
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
 
     Yields
     ------
@@ -130,11 +134,8 @@ def run(fhandle, resname_set):
         The PDB lines not matching the residues selected.
         Non-coord lines are yielded as well.
     """
-    records = ('ATOM', 'HETATM', 'ANISOU', 'TER')
-    for line in fhandle:
-        if line.startswith(records):
-            if line[17:20].strip() in resname_set:
-                continue
+    selection = _select.Selection.from_values('resname', resname_set, invert=True)
+    for line in selection.filter(fhandle):
         yield line
 
 
@@ -145,20 +146,23 @@ def main():
     # Check Input
     pdbfh, resname_set = check_input(sys.argv[1:])
 
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
+
     # Do the job
-    new_pdb = run(pdbfh, resname_set)
+    new_pdb = run(pdbin, resname_set)
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_pdb):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                pdbout.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
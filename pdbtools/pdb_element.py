@@ -34,6 +34,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -58,7 +60,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
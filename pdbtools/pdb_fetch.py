@@ -18,14 +18,48 @@
 """
 Downloads a structure in PDB format from the RCSB website.
 
-Allows downloading the (first) biological structure if selected.
+Allows downloading a biological assembly (by default, the first) if selected.
+
+Structures can also be downloaded in mmCIF or BinaryCIF format with the
+-format option, e.g. large structures that are not available in PDB format.
+They are converted to PDB format as they are downloaded, as with pdb_fromcif,
+without writing the mmCIF file to disk.
+
+Files are downloaded from the RCSB by default. Other servers (e.g. a local
+mirror of the PDB archive) can be given with one or more -mirror options or,
+separated by commas, in the PDBTOOLS_MIRRORS environment variable. Servers are
+tried in order until one sends the file.
+
+Downloaded files can be kept in a cache directory, given with the -cache option
+or the PDBTOOLS_CACHE environment variable, and are then read from disk on the
+next requests. The cache is limited to PDBTOOLS_CACHE_SIZE megabytes (default:
+1024), deleting the least recently used files first. If PDBTOOLS_CACHE_TTL is
+set, cached files older than that many seconds are checked for updates on the
+server. If the server cannot be reached, cached files are used regardless of
+their age. The -offline option only reads files from the cache.
+
+Many structures can be downloaded at once with the -outdir option, one file per
+structure (e.g. 1brs.pdb), from codes given as arguments or listed in files.
+Downloads run -nconn at a time (default: 4), reusing the connections to the
+server. Downloads that fail with a server or network error are retried a few
+times, after increasing delays. Failed downloads are reported without stopping
+the others, and structures already in the directory are not downloaded again.
 
 Usage:
-    python pdb_fetch.py [-biounit] <pdb code>
+    python pdb_fetch.py [-biounit[:<n>]] [-format:<pdb|cif|bcif>]
+        [-mirror:<url> ...] [-cache:<directory>] [-offline] <pdb code>
+    python pdb_fetch.py [options] -outdir:<dir> [-nconn:<n>] <code|file> ...
 
 Example:
     python pdb_fetch.py 1brs  # downloads unit cell, all 6 chains
     python pdb_fetch.py -biounit 1brs  # downloads biounit, 2 chains
+    python pdb_fetch.py -biounit:2 -format:cif 1brs  # second biounit
+    python pdb_fetch.py -format:bcif 4v6x
+    python pdb_fetch.py -mirror:http://pdb.example.org/ 1brs
+    python pdb_fetch.py -cache:$HOME/.pdb_cache 1brs
+    python pdb_fetch.py -offline -cache:$HOME/.pdb_cache 1brs
+    python pdb_fetch.py -outdir:structures 1brs 1ctf
+    python pdb_fetch.py -outdir:structures -nconn:8 codes.txt
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -34,68 +68,379 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
-import gzip
+from email.utils import formatdate
+import io
+import os
+import random
 import re
 import sys
+import time
+import zlib
 
-# Python 3 vs Python 2
-if sys.version_info[0] < 3:
-    from cStringIO import StringIO as IO
-    from urllib2 import Request, build_opener
-    from urllib2 import HTTPError
-else:
-    from io import BytesIO as IO
-    from urllib.request import Request, build_opener
-    from urllib.error import HTTPError
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2
+    ThreadPoolExecutor = None
+
+from pdbtools import _batch
+from pdbtools import _cache
+from pdbtools import _http
+from pdbtools._http import HTTPError, URLError
+from pdbtools import pdb_fromcif
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+BASE_URL = 'https://files.rcsb.org/download/'
+ENV_MIRRORS = 'PDBTOOLS_MIRRORS'  # comma-separated base URLs
+FORMATS = ('pdb', 'cif', 'bcif')
+CHUNK_SIZE = 64 * 1024  # bytes read from the network at a time
+
+NCONN = 4  # simultaneous downloads (-outdir)
+RETRIES = 4  # retries of downloads that fail with transient errors (-outdir)
+BACKOFF = 1.0  # seconds before the first retry, doubled at every retry
+MAX_BACKOFF = 60.0
+
+_POOL = _http.ConnectionPool()  # shared by all downloads
+_replace = getattr(os, 'replace', os.rename)  # Python 2
+
+
+def _read_codes(path):
+    """Reads PDB codes from a file, separated by spaces, commas, or lines."""
+    codes = []
+    with open(path, 'r') as handle:
+        for line in handle:
+            line = line.split('#')[0]  # comments
+            codes.extend(line.replace(',', ' ').split())
+    return codes
+
 
 def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
     """
 
     # Defaults
-    option = False
-
-    if len(args) == 1:
-        # pdb code only
-        if not re.match(r'[0-9a-zA-Z]{4}$', args[0]):
-            emsg = 'ERROR!! Invalid PDB code: \'{}\'\n'
-            sys.stderr.write(emsg.format(args[0]))
+    biounit = 0
+    fmt = 'pdb'
+    mirrors = []
+    offline = False
+    cache_dir = None
+    outdir = None
+    nconn = NCONN
+
+    while len(args) > 1 and args[0].startswith('-'):
+        option, args = args[0], args[1:]
+        name, _, value = option.partition(':')
+        if name == '-biounit':
+            try:
+                biounit = int(value) if value else 1
+                if biounit < 1:
+                    raise ValueError
+            except ValueError:
+                emsg = 'ERROR!! Biounit number must be a positive integer\n'
+                sys.stderr.write(emsg)
+                sys.exit(1)
+        elif name == '-format':
+            fmt = value.lower()
+            if fmt not in FORMATS:
+                emsg = 'ERROR!! Format must be one of {}: \'{}\'\n'
+                sys.stderr.write(emsg.format(', '.join(FORMATS), value))
+                sys.exit(1)
+        elif name == '-mirror' and value:
+            mirrors.append(value)
+        elif option == '-offline':
+            offline = True
+        elif option.startswith('-cache:') and len(option) > 7:
+            cache_dir = option[7:]
+        elif name == '-outdir':
+            outdir = _batch.parse_outdir(option)
+        elif name == '-nconn':
+            try:
+                nconn = int(option.partition(':')[2])
+                if nconn < 1:
+                    raise ValueError
+            except ValueError:
+                emsg = 'ERROR!! Number of connections must be a positive '
+                emsg += 'integer\n'
+                sys.stderr.write(emsg)
+                sys.exit(1)
+        else:
+            emsg = 'ERROR!! Invalid option: \'{}\'\n'
+            sys.stderr.write(emsg.format(option))
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        pdb_code = args[0]
+    if not args or (outdir is None and len(args) != 1):
+        sys.stderr.write(__doc__)
+        sys.exit(1)
 
-    elif len(args) == 2:
-        # biounit & pdb code
-        if not re.match(r'\-biounit$', args[0]):
-            emsg = 'ERROR!! Invalid option: \'{}\'\n'
-            sys.stderr.write(emsg.format(args[0]))
-            sys.stderr.write(__doc__)
-            sys.exit(1)
+    pdb_codes = []
+    for arg in args:
+        if outdir is not None and os.path.isfile(arg):
+            pdb_codes.extend(_read_codes(arg))
+        else:
+            pdb_codes.append(arg)
 
-        if not re.match(r'[0-9a-zA-Z]{4}$', args[1]):
+    for pdb_code in pdb_codes:
+        if not re.match(r'[0-9a-zA-Z]{4}$', pdb_code):
             emsg = 'ERROR!! Invalid PDB code: \'{}\'\n'
-            sys.stderr.write(emsg.format(args[0]))
+            sys.stderr.write(emsg.format(pdb_code))
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        option = True
-        pdb_code = args[1]
-    else:
+    if not pdb_codes:
+        emsg = 'ERROR!! No PDB codes to fetch\n'
+        sys.stderr.write(emsg)
+        sys.exit(1)
+
+    if biounit and fmt == 'bcif':
+        emsg = 'ERROR!! Biounits are not available in BinaryCIF format\n'
+        sys.stderr.write(emsg)
+        sys.exit(1)
+
+    cache = _cache.Cache.from_env(cache_dir)
+    if offline and cache is None:
+        emsg = 'ERROR!! The -offline option requires a cache directory\n'
+        sys.stderr.write(emsg)
         sys.stderr.write(__doc__)
         sys.exit(1)
 
-    return (pdb_code, option)
+    if outdir is None:
+        pdb_codes = pdb_codes[0]
+    return (pdb_codes, biounit, cache, offline, fmt, mirrors or None, outdir,
+            nconn)
+
+
+def _read_chunks(response, chunk_size=CHUNK_SIZE):
+    """
+    Yields the body of a HTTP response as it arrives, in chunks of at most
+    `chunk_size` bytes.
+    """
+    # read1 returns what is available instead of waiting for a full chunk
+    read = getattr(response, 'read1', response.read)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
 
+def _read_file(path, chunk_size=CHUNK_SIZE):
+    """Yields the contents of a file in chunks of `chunk_size` bytes."""
+    with open(path, 'rb') as handle:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _gunzip(chunks):
+    """
+    Decompresses a stream of gzipped chunks incrementally.
+
+    Concatenated gzip members (as written by e.g. `cat a.gz b.gz`) are
+    decompressed one after the other.
+
+    Raises
+    ------
+    zlib.error
+        If the data is not valid gzip data, or is truncated.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip header
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data
+            if chunk:  # next gzip member
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    yield decompressor.flush()
+    if not getattr(decompressor, 'eof', True):  # Python 2 has no eof
+        raise zlib.error('incomplete or truncated stream')
+
+
+def _split_lines(blocks):
+    """Yields the lines of a stream of byte blocks, as str."""
+    pending = b''
+    for block in blocks:
+        block = pending + block
+        last_newline = block.rfind(b'\n') + 1
+        pending = block[last_newline:]
+        if last_newline:
+            for line in block[:last_newline].decode('utf-8').splitlines(True):
+                yield line
+
+    if pending:
+        yield pending.decode('utf-8')
+
+
+def _file_name(pdbid, biounit=0, fmt='pdb'):
+    """Returns the name of a file on the server, e.g. '1brs.pdb1.gz'."""
+    pdbid = pdbid.lower()
+    if not biounit:
+        return '{0}.{1}.gz'.format(pdbid, fmt)
+    elif fmt == 'pdb':
+        return '{0}.pdb{1:d}.gz'.format(pdbid, biounit)
+    return '{0}-assembly{1:d}.{2}.gz'.format(pdbid, biounit, fmt)
+
+
+def _get_mirrors():
+    """Returns the base URLs of the servers to download files from."""
+    mirrors = os.environ.get(ENV_MIRRORS, '').replace(',', ' ').split()
+    return mirrors or [BASE_URL]
+
+
+def _open_url(fname, cached=None, mirrors=None):
+    """
+    Requests a file from each server in turn, and returns the first response.
+
+    If a cached copy of the file is given, asks the server to send the file
+    only if it changed since the copy was last validated. Raises HTTPError
+    with code 304 if it did not. If no server sends the file, raises the
+    error of the last one.
+    """
+    headers = {}
+    if cached is not None:
+        since = formatdate(os.stat(cached).st_mtime, usegmt=True)
+        headers['If-Modified-Since'] = since
+
+    error = None
+    for base_url in mirrors or _get_mirrors():
+        url = base_url.rstrip('/') + '/' + fname
+        try:
+            return _POOL.open(url, headers)
+        except URLError as e:  # includes HTTPError
+            if getattr(e, 'code', None) == 304:
+                raise
+            error = e
+    raise error
+
+
+def _cache_download(response, cache, name):
+    """
+    Decompresses a download while adding it to the cache.
+
+    The file is added to the cache only if it was downloaded and
+    decompressed entirely, without errors.
+    """
+    handle = cache.open_writer(name)
+    try:
+        def _tee():
+            for chunk in _read_chunks(response):
+                handle.write(chunk)
+                yield chunk
+
+        for block in _gunzip(_tee()):
+            yield block
+
+    except BaseException:  # includes closing the generator early
+        cache.discard(handle)
+        raise
+
+    cache.commit(handle, name)
+
+
+def _describe(error):
+    """Returns the message of a download error."""
+    if isinstance(error, HTTPError):
+        return '({0}) {1}'.format(error.code, error.msg)
+    elif isinstance(error, URLError):
+        return str(error.reason)
+    return str(error)
+
+
+class _BlockStream(io.RawIOBase):
+    """Binary file-like object reading from an iterator of byte blocks."""
+
+    def __init__(self, blocks):
+        super(_BlockStream, self).__init__()
+        self._blocks = iter(blocks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._blocks, None)
+            if self._pending is None:  # end of data
+                self._pending = b''
+                return 0
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _from_cif(blocks):
+    """
+    Converts a mmCIF or BinaryCIF file to PDB lines, with pdb_fromcif.
 
-def run(pdbid, biounit=False):
+    The file is read from a stream of byte blocks, so that text mmCIF files
+    are converted as they are downloaded.
+    """
+    stream = io.BufferedReader(_BlockStream(blocks), CHUNK_SIZE)
+    fhandle = io.TextIOWrapper(stream, encoding='utf-8')
+    for line in pdb_fromcif.run(fhandle):
+        yield line
+
+
+def _fetch(pdbid, biounit=False, cache=None, offline=False, fmt='pdb',
+           mirrors=None):
+    """
+    Yields the lines of a structure, from the cache or the server.
+
+    Same as `run`, but raises errors instead of reporting them: HTTPError or
+    URLError if the file cannot be downloaded, and IOError or zlib.error if
+    it is incomplete or invalid.
+    """
+    fname = _file_name(pdbid, biounit, fmt)
+
+    cached = cache.get(fname) if cache is not None else None
+    if cached is None and offline:
+        raise IOError('not in cache (offline mode)')
+
+    response = None
+    if cached is None or not (offline or cache.is_fresh(cached)):
+        try:
+            response = _open_url(fname, cached, mirrors)
+
+        except URLError as e:  # includes HTTPError
+            if cached is None:
+                raise
+            elif getattr(e, 'code', None) == 304:  # not modified
+                cache.validated(cached)
+            else:
+                wmsg = '[!] Using cached structure: {0}\n'
+                sys.stderr.write(wmsg.format(_describe(e)))
+
+    if response is None:
+        blocks = _gunzip(_read_file(cached))
+    elif cache is None:
+        blocks = _gunzip(_read_chunks(response))
+    else:
+        blocks = _cache_download(response, cache, fname)
+
+    lines = _split_lines(blocks) if fmt == 'pdb' else _from_cif(blocks)
+    try:
+        for line in lines:
+            yield line
+    finally:
+        if response is not None:
+            response.close()
+
+
+def run(pdbid, biounit=False, cache=None, offline=False, fmt='pdb',
+        mirrors=None):
     """
     Download the structure in PDB format from the RCSB PDB website.
 
+    The file is decompressed as it is downloaded, and lines are yielded as
+    soon as they arrive, without keeping the whole file in memory. Files in
+    mmCIF format are converted to PDB format as they arrive.
+
     This function is a generator.
 
     Parameters
@@ -103,8 +448,21 @@ def run(pdbid, biounit=False):
     pdbid : str
         The alpha-numeric code of the PBDID.
 
-    biounit : bool
-        Whether to download biounit version.
+    biounit : bool or int
+        Whether to download biounit version, or the number of the biounit.
+
+    cache : `_cache.Cache`, optional
+        Cache to read the structure from, and to add it to once downloaded.
+
+    offline : bool
+        Read the structure from the cache only.
+
+    fmt : str
+        Format of the file to download: 'pdb', 'cif', or 'bcif'.
+
+    mirrors : list of str, optional
+        Base URLs of the servers to try, in order. By default, the servers
+        in PDBTOOLS_MIRRORS, or the RCSB.
 
     Yield
     -----
@@ -112,46 +470,140 @@ def run(pdbid, biounit=False):
         The original PBD data.
     """
 
-    base_url = 'https://files.rcsb.org/download/'
-    pdb_type = '.pdb1' if biounit else '.pdb'
-    pdb_url = base_url + pdbid.lower() + pdb_type + '.gz'
-
     try:
-        request = Request(pdb_url)
-        opener = build_opener()
-        url_data = opener.open(request).read()
+        for line in _fetch(pdbid, biounit, cache, offline, fmt, mirrors):
+            yield line
 
-    except HTTPError as e:
-        emsg = '[!] Error fetching structure: ({0}) {1}\n'
-        sys.stderr.write(emsg.format(e.code, e.msg))
+    except (IOError, zlib.error) as e:  # includes HTTPError, URLError
+        emsg = '[!] Error fetching structure: {0}\n'
+        sys.stderr.write(emsg.format(_describe(e)))
         return
 
-    else:
 
+fetch_structure = run
+
+
+def _is_transient(error):
+    """True if a failed download may succeed if retried."""
+    if isinstance(error, HTTPError):
+        return error.code >= 500 or error.code == 429  # Too Many Requests
+    return isinstance(error, IOError)  # network errors, incomplete files
+
+
+def _backoff(attempt):
+    """
+    Returns the delay before a retry, in seconds.
+
+    The delay doubles at every attempt, and is randomized (jitter) so that
+    failed downloads are not all retried at once.
+    """
+    delay = min(MAX_BACKOFF, BACKOFF * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def fetch_file(pdbid, outpath, biounit=False, cache=None, offline=False,
+               fmt='pdb', mirrors=None):
+    """
+    Downloads a structure to a file, retrying transient errors.
+
+    The file is written under a temporary name and renamed when complete.
+    See `run` for the parameters.
+
+    Returns
+    -------
+    str
+        An empty string if the file was downloaded, or the error message.
+    """
+    tmppath = outpath + '.part'
+    attempt = 0
+    while True:
         try:
-            buf = IO(url_data)
-            gz_handle = gzip.GzipFile(fileobj=buf, mode='rb')
-            for line in gz_handle:
-                yield line.decode('utf-8')
-
-        except IOError as e:
-            emsg = '[!] Error fetching structure: ({0}) {1}\n'
-            sys.stderr.write(emsg.format(e.code, e.msg))
-            return
+            with open(tmppath, 'w') as handle:
+                handle.writelines(_fetch(pdbid, biounit, cache, offline, fmt,
+                                         mirrors))
+            _replace(tmppath, outpath)
+            return ''
 
-        finally:
-            gz_handle.close()
+        except (IOError, zlib.error, SystemExit) as e:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
 
+            if isinstance(e, SystemExit):  # pdb_fromcif could not convert
+                return '[!] Error converting structure'
+            elif offline or attempt >= RETRIES or not _is_transient(e):
+                return '[!] Error fetching structure: {0}'.format(_describe(e))
+
+        time.sleep(_backoff(attempt))
+        attempt += 1
 
-fetch_structure = run
+
+def _is_fetched(pdbid, outpath):
+    """True if a structure was already downloaded to a (non-empty) file."""
+    return os.path.isfile(outpath) and os.path.getsize(outpath) > 0
+
+
+def fetch_all(pdbids, outdir, biounit=False, cache=None, offline=False,
+              fmt='pdb', mirrors=None, nconn=NCONN, progress=None):
+    """
+    Downloads structures to a directory, several at a time.
+
+    Parameters
+    ----------
+    pdbids : list of str
+        The PDB codes of the structures.
+
+    outdir : str
+        The output directory. Each structure is written in PDB format to a
+        file named after its code, e.g. 1brs.pdb (or 1brs.pdb1 for the
+        first biounit).
+        Existing files are not downloaded again.
+
+    nconn : int
+        Number of simultaneous downloads.
+
+    progress : file handle, optional
+        Where to write one line per structure as it finishes, and a
+        summary at the end, e.g. sys.stderr.
+
+    See `run` for the other parameters.
+
+    Returns
+    -------
+    dict
+        The number of structures 'fetched', 'skipped' (already in the
+        directory), and 'failed'.
+    """
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    ext = '.pdb{:d}'.format(biounit) if biounit else '.pdb'
+    jobs = []
+    seen = set()
+    for pdbid in pdbids:
+        pdbid = pdbid.lower()
+        if pdbid not in seen:
+            seen.add(pdbid)
+            jobs.append((pdbid, os.path.join(outdir, pdbid + ext)))
+
+    params = (biounit, cache, offline, fmt, mirrors)
+    return _batch.run(fetch_file, jobs, params, nconn, progress,
+                      pool=ThreadPoolExecutor, is_done=_is_fetched,
+                      status='fetched', noun='structures')
 
 
 def main():
     # Check Input
-    pdb_code, biounit = check_input(sys.argv[1:])
+    (pdb_code, biounit, cache, offline, fmt, mirrors, outdir,
+     nconn) = check_input(sys.argv[1:])
+
+    # Download many structures to a directory (-outdir)
+    if outdir is not None:
+        counts = fetch_all(pdb_code, outdir, biounit, cache, offline, fmt,
+                           mirrors, nconn, progress=sys.stderr)
+        sys.exit(1 if counts['failed'] else 0)
 
     # Do the job
-    new_pdb = run(pdb_code, biounit)
+    new_pdb = run(pdb_code, biounit, cache, offline, fmt, mirrors)
 
     try:
         _buffer = []
@@ -40,6 +40,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -75,7 +78,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -92,7 +95,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -138,6 +141,10 @@ def run(fhandle, option_list):
 
     option_set = set(option_list)  # empty if option_list is empty
 
+    _decode = _hybrid36.decode_resid
+    _encode = _hybrid36.encode_resid
+    max_resid = _hybrid36.MAX_RESID
+
     # Keep track of residue numbering
     # Keep track of residues read (chain, resname, resid)
     offset = 0
@@ -149,7 +156,8 @@ def run(fhandle, option_list):
 
         if line.startswith(records):
             res_uid = line[17:27]  # resname, chain, resid, icode
-            id_res = line[21] + line[22:26].strip()  # A99, B12
+            resid = _decode(line[22:26])
+            id_res = line[21] + str(resid)  # A99, B12
             has_icode = line[26].strip()  # ignore ' ' here
 
             # unfortunately, this is messy but not all PDB files follow a nice
@@ -178,8 +186,12 @@ def run(fhandle, option_list):
                 line = line[:26] + ' ' + line[27:]
 
             # Modify resid if necessary
-            resid = int(line[22:26]) + offset
-            line = line[:22] + str(resid).rjust(4) + line[26:]
+            resid += offset
+            if resid > max_resid:
+                emsg = 'Cannot set residue number above {}.\n'
+                sys.stderr.write(emsg.format(max_resid))
+                sys.exit(1)
+            line = line[:22] + _encode(resid) + line[26:]
             seen_ids.add(id_res)
 
             # Reset offset on TER
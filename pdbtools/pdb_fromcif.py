@@ -18,14 +18,40 @@
 """
 Rudimentarily converts a mmCIF file to the PDB format.
 
-Will not convert if the file does not 'fit' in PDB format, e.g. too many
-chains, residues, or atoms. Will convert only the coordinate section.
+Will not convert if the file does not 'fit' in PDB format, e.g. chain
+identifiers longer than one character. Atom serials above 99999 and residue
+numbers above 9999 are written in hybrid-36 notation (A0000, A000, ...). Will
+convert only the coordinate section.
+
+Models are written as soon as they are read. Since a single model is written
+without MODEL/ENDMDL records, the first model is kept in memory until the
+second model starts (or the file ends). The -ensemble option always writes
+MODEL/ENDMDL records and writes every atom as soon as it is read.
+
+The -nproc option converts large files in several processes (by default, one
+per CPU), each converting a chunk of the atoms. The output is the same as that
+of a single process. It requires an uncompressed file with one atom per line,
+as written by the PDB; other files are converted in a single process.
+
+BinaryCIF files (e.g. .bcif) are detected from their contents and converted
+in the same way.
+
+The -outdir option converts several files, or all mmCIF files in directories,
+and writes the results to a directory. Files are converted in parallel with
+-nproc, one file per process. Files already converted, i.e. with an output
+file newer than the input file, are skipped. Progress is written to stderr.
 
 Usage:
-    python pdb_fromcif.py <pdb file>
+    python pdb_fromcif.py [-ensemble] [-nproc[:<number>]] <mmcif file>
+    python pdb_fromcif.py [-ensemble] [-nproc[:<number>]] -outdir:<directory>
+        <mmcif file or directory> [...]
 
 Example:
-    python pdb_fromcif.py 1CTF.pdb
+    python pdb_fromcif.py 1CTF.cif
+    python pdb_fromcif.py 1CTF.bcif
+    python pdb_fromcif.py -ensemble 2K9Q.cif  # e.g. large NMR/MD ensembles
+    python pdb_fromcif.py -nproc:8 4V6X.cif  # uses 8 processes
+    python pdb_fromcif.py -nproc -outdir:pdb/ mmCIF/  # whole directory
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -34,13 +60,37 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
+from collections import deque
+from contextlib import closing
+import mmap
 import os
 import re
 import sys
 
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # Python 2
+    ProcessPoolExecutor = None
+
+from pdbtools import _batch
+from pdbtools import _bcif
+from pdbtools import _cif
+from pdbtools import _records
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+# Parallel conversion (-nproc): the _atom_site rows are split in chunks of at
+# least CHUNK_SIZE_MIN bytes, about CHUNKS_PER_PROCESS chunks per process.
+CHUNK_SIZE_MIN = 1024 * 1024
+CHUNKS_PER_PROCESS = 4
+
+# Extensions of the files to convert in directories (-outdir).
+EXTENSIONS = ('.cif', '.mmcif', '.bcif')
+
+_END_OF_LOOP = re.compile(br'^(?:_|loop_|data_|save_|#)', re.M)
+
 
 def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
@@ -48,6 +98,40 @@ def check_input(args):
 
     # Defaults
     fh = sys.stdin  # file handle
+    ensemble = False
+    nproc = 1
+    outdir = None
+
+    options = []
+    while args and (args[0].partition(':')[0] in
+                    ('-ensemble', '-nproc', '-outdir')):
+        options.append(args[0])
+        args = args[1:]
+
+    for option in options:
+        if option == '-ensemble':
+            ensemble = True
+        elif option.startswith('-outdir'):
+            outdir = _batch.parse_outdir(option)
+        else:
+            nproc = _batch.parse_nproc(option)
+
+    if outdir is not None:
+        if not args:
+            emsg = 'ERROR!! You must provide files or directories to convert\n'
+            sys.stderr.write(emsg)
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        # Batch mode: list of (input, output) paths instead of a file handle
+        jobs = _batch.list_jobs(args, outdir, EXTENSIONS, '.pdb')
+        return (jobs, ensemble, nproc)
+
+    if options and not args and sys.stdin.isatty():  # no data streamed in
+        emsg = 'ERROR!! No data to process!\n'
+        sys.stderr.write(emsg)
+        sys.stderr.write(__doc__)
+        sys.exit(1)
 
     if not len(args):
         # Reading from pipe with default option
@@ -62,7 +146,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -70,156 +154,438 @@ def check_input(args):
         sys.stderr.write(__doc__)
         sys.exit(1)
 
-    return fh
+    return (fh, ensemble, nproc)
+
 
+def _get_column(tags, *names):
+    """Returns the index of the first tag found, or -1 if none is."""
+    for name in names:
+        try:
+            return tags.index('_atom_site.' + name)
+        except ValueError:
+            continue
+    return -1
+
+
+def _get_columns(tags):
+    """
+    Resolves the column of each PDB field in the _atom_site category.
 
-def run(fhandle):
+    Exits if any required column is missing. Missing optional columns are
+    given as -1, which points to a '?' added to the end of each row.
+    """
+    # Giving preference to auth to match PDBs
+    # http://mmcif.wwpdb.org/docs/pdb_to_pdbx_correspondences.html
+    columns = {
+        'record': _get_column(tags, 'group_PDB'),
+        'atname': _get_column(tags, 'auth_atom_id', 'label_atom_id'),
+        'resname': _get_column(tags, 'auth_comp_id', 'label_comp_id'),
+        'chainid': _get_column(tags, 'auth_asym_id', 'label_asym_id'),
+        'resnum': _get_column(tags, 'auth_seq_id', 'label_seq_id'),
+        'x': _get_column(tags, 'Cartn_x'),
+        'y': _get_column(tags, 'Cartn_y'),
+        'z': _get_column(tags, 'Cartn_z'),
+        'model': _get_column(tags, 'pdbx_PDB_model_num'),
+        'element': _get_column(tags, 'type_symbol'),
+        'altloc': _get_column(tags, 'label_alt_id'),
+        'icode': _get_column(tags, 'pdbx_PDB_ins_code'),
+        'occ': _get_column(tags, 'occupancy'),
+        'bfactor': _get_column(tags, 'B_iso_or_equiv'),
+        'charge': _get_column(tags, 'pdbx_formal_charge'),
+    }
+
+    required = ('record', 'atname', 'resname', 'chainid', 'resnum',
+                'x', 'y', 'z')
+    if tags and any(columns[name] == -1 for name in required):
+        emsg = 'ERROR!! mmCIF file is missing required _atom_site fields\n'
+        sys.stderr.write(emsg)
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    return columns
+
+
+def _used_tags(tags):
+    """Returns the tags of the columns that are converted to PDB fields."""
+    return [tags[i] for i in _get_columns(tags).values() if i != -1]
+
+
+def _make_converter(columns):
+    """
+    Returns a function that writes an _atom_site row as an ATOM/HETATM line.
+
+    The function takes the row, with a '?' appended for missing columns,
+    and the serial number of the atom.
+    """
+    write = _records.PDBAtomWriter(columns).write
+
+    def convert(fields, serial):
+        """Writes one row as a PDB line."""
+        try:
+            return write(fields, serial)
+        except _records.FormatLimitError as error:
+            sys.stderr.write('ERROR!! {}\n'.format(error))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+    return convert
+
+
+def _locate_rows(path):
+    """
+    Finds the tags and the byte range of the rows of the _atom_site loop.
+
+    Returns
+    -------
+    tuple
+        The list of tags and the offsets of the first byte of the rows and
+        of the first byte after them, or None if the category is missing or
+        not written as a loop.
+    """
+    tags = []
+    previous = b''
+    in_text = False
+    with open(path, 'rb') as handle:
+        offset = 0
+        for line in handle:
+            offset += len(line)
+            if line.startswith(b';'):
+                in_text = not in_text
+            elif in_text:
+                continue
+            elif line.startswith(b'_atom_site.'):
+                if not tags and not previous.startswith(b'loop_'):
+                    return None
+                tags.append(line.strip().decode('utf-8'))
+                start = offset
+            elif tags:
+                break
+            elif line.strip():
+                previous = line
+
+        if not tags:
+            return None
+
+        # Same rules as _cif: the loop ends at the next tag, loop, or comment.
+        size = os.fstat(handle.fileno()).st_size
+        if start == size:
+            return tags, start, start
+        with closing(mmap.mmap(handle.fileno(), 0,
+                               access=mmap.ACCESS_READ)) as data:
+            match = _END_OF_LOOP.search(data, start)
+            end = match.start() if match else size
+
+    return tags, start, end
+
+
+def _split_rows(path, start, end, n_chunks):
+    """Splits a byte range of a file in chunks that end at line breaks."""
+    bounds = []
+    chunk_size = max(CHUNK_SIZE_MIN, (end - start) // n_chunks + 1)
+    with open(path, 'rb') as handle:
+        with closing(mmap.mmap(handle.fileno(), 0,
+                               access=mmap.ACCESS_READ)) as data:
+            while start < end:
+                stop = data.find(b'\n', min(start + chunk_size, end) - 1)
+                stop = end if stop == -1 or stop >= end else stop + 1
+                bounds.append((start, stop))
+                start = stop
+    return bounds
+
+
+def _read_rows(path, start, end):
+    """Reads the (non-empty) lines of a chunk of a file."""
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        data = handle.read(end - start).decode('utf-8')
+    return [line for line in data.splitlines() if line.strip()]
+
+
+def _count_chunk(path, start, end, tags):
+    """
+    Counts the atoms of each model in a chunk of _atom_site rows.
+
+    Returns
+    -------
+    list
+        [model number, number of atoms] pairs, in the order of the file, or
+        None if a row of the chunk does not fit in a single line.
+    """
+    columns = _get_columns(tags)
+    i_record, i_model = columns['record'], columns['model']
+    n_columns = len(tags)
+
+    counts = []
+    prev_model = None
+    _split_line = _cif.split_line
+    for line in _read_rows(path, start, end):
+        try:
+            fields = _split_line(line)
+        except _cif.CIFError:
+            return None  # reported by the sequential reader
+        if len(fields) != n_columns:
+            return None
+        if fields[i_record] not in ('ATOM', 'HETATM'):
+            continue
+
+        model_no = fields[i_model] if i_model != -1 else '?'
+        if model_no != prev_model:
+            prev_model = model_no
+            counts.append([model_no, 0])
+        counts[-1][1] += 1
+
+    return counts
+
+
+def _convert_chunk(path, start, end, tags, state, write_models):
+    """
+    Converts a chunk of _atom_site rows to PDB lines.
+
+    Parameters
+    ----------
+    state : tuple
+        Model number of the last atom before the chunk, number of models
+        written before the chunk, and serial number of the last atom.
+
+    write_models : bool
+        Whether to write MODEL/ENDMDL records.
+
+    Returns
+    -------
+    str
+        The PDB lines of the chunk.
+    """
+    columns = _get_columns(tags)
+    i_record, i_model = columns['record'], columns['model']
+    convert = _make_converter(columns)
+
+    _model = "MODEL {:>5d}\n"
+    prev_model, n_models, serial = state
+
+    lines = []
+    _split_line = _cif.split_line
+    for line in _read_rows(path, start, end):
+        fields = _split_line(line)
+        if fields[i_record] not in ('ATOM', 'HETATM'):
+            continue
+
+        fields.append('?')  # for missing columns
+
+        model_no = fields[i_model]
+        if model_no != prev_model:
+            prev_model = model_no
+            serial = 0
+            n_models += 1
+            if write_models:
+                if n_models > 1:
+                    lines.append('ENDMDL\n')
+                lines.append(_model.format(n_models))
+
+        serial += 1
+        lines.append(convert(fields, serial))
+
+    return ''.join(lines)
+
+
+def _run_parallel(path, ensemble, nproc):
+    """
+    Converts the _atom_site loop of a file in chunks, in several processes.
+
+    Each chunk is first read to count its atoms per model. A running sum of
+    these counts gives the serial number and model number that each chunk
+    starts from, so that the chunks can then be converted independently.
+
+    Returns
+    -------
+    generator or None
+        The PDB lines, or None if the file cannot be split in chunks, e.g.
+        if some rows span more than one line.
+    """
+    layout = _locate_rows(path)
+    if layout is None:
+        return None
+
+    tags, start, end = layout
+    _get_columns(tags)  # exits if required columns are missing
+    bounds = _split_rows(path, start, end, nproc * CHUNKS_PER_PROCESS)
+
+    executor = ProcessPoolExecutor(nproc)
+    jobs = [(path, s, e, tags) for s, e in bounds]
+    counts = list(executor.map(_count_chunk, *zip(*jobs))) if jobs else []
+    if None in counts:
+        executor.shutdown()
+        return None
+
+    # Running sum over chunks: state of the conversion at each chunk start.
+    states = []
+    prev_model, n_models, serial = None, 0, 0
+    for chunk_counts in counts:
+        states.append((prev_model, n_models, serial))
+        for model_no, n_atoms in chunk_counts:
+            if model_no != prev_model:
+                prev_model = model_no
+                n_models += 1
+                serial = 0
+            serial += n_atoms
+
+    write_models = ensemble or n_models > 1
+    return _collect(executor, nproc * 2, jobs, states, write_models, n_models)
+
+
+def _collect(executor, window, jobs, states, write_models, n_models):
+    """
+    Yields the lines of the converted chunks, in order.
+
+    At most `window` chunks are converted ahead of the one being yielded,
+    to bound memory usage when the output is consumed slowly.
+    """
+    pending = deque()
+    try:
+        for (path, start, end, tags), state in zip(jobs, states):
+            pending.append(executor.submit(_convert_chunk, path, start, end,
+                                           tags, state, write_models))
+            if len(pending) < window:
+                continue
+
+            for line in pending.popleft().result().splitlines(True):
+                yield line
+
+        while pending:
+            for line in pending.popleft().result().splitlines(True):
+                yield line
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+    if write_models and n_models:
+        yield 'ENDMDL\n'
+
+    yield "{:<80s}\n".format("END")
+
+
+def _bcif_stream(fhandle):
+    """
+    Returns the binary stream of a file handle if it holds BinaryCIF data.
+
+    Peeks at the first byte without consuming it, so that text mmCIF files
+    are read as usual. Returns None for text files, and for iterables that
+    do not expose a peekable binary stream (e.g. lists of lines).
+    """
+    stream = getattr(fhandle, 'buffer', None)
+    peek = getattr(stream, 'peek', None)
+    if peek is not None and _bcif.is_bcif(peek(1)[:1]):
+        return stream
+    return None
+
+
+def run(fhandle, ensemble=False, nproc=1):
     """
     Convert a structure in mmCIF format to PDB format.
 
+    Models are yielded as soon as they are converted. The first model is
+    kept in memory until the second starts, to decide whether to write
+    MODEL/ENDMDL records, unless `ensemble` is True.
+
     This function is a generator.
 
     Parameters
     ----------
-    fhandle : a line-by-line iterator of the original PDB file.
+    fhandle : a line-by-line iterator of the original PDB file, or a file
+        handle of a BinaryCIF file.
+
+    ensemble : bool, optional
+        If True, always write MODEL/ENDMDL records, even for a single
+        model, and yield every line as soon as it is converted.
+
+    nproc : int, optional
+        Number of processes to convert the atoms with. Only used if
+        `fhandle` is an uncompressed file (with a `name`) and if every
+        _atom_site row fits in one line. Otherwise, the file is converted
+        in a single process.
 
     Yields
     ------
     str (line-by-line)
         New PDB lines.
     """
-    _a = "{:6s}{:5d} {:<4s}{:1s}{:3s} {:1s}{:4d}{:1s}   {:8.3f}{:8.3f}{:8.3f}"
-    _a += "{:6.2f}{:6.2f}      {:<4s}{:<2s}{:2s}\n"
+    bcif = _bcif_stream(fhandle)
+    if bcif is None and nproc > 1 and ProcessPoolExecutor is not None:
+        path = getattr(fhandle, 'name', None)
+        is_file = isinstance(path, str) and os.path.isfile(path)
+        if is_file and not isinstance(fhandle, _stream.CompressedFile):
+            lines = _run_parallel(path, ensemble, nproc)
+            if lines is not None:
+                for line in lines:
+                    yield line
+                return
 
-    in_section, read_atom = False, False
+    try:
+        if bcif is not None:
+            tags, rows = _bcif.read_category(bcif.read(), '_atom_site',
+                                             select=_used_tags)
+        else:
+            tags, rows = _cif.read_category(fhandle, '_atom_site')
+    except _cif.CIFError as error:
+        sys.stderr.write('ERROR!! Could not parse mmCIF file: {}\n'.format(error))
+        sys.exit(1)
 
-    label_pos = 0
-    labels = {}
-    empty = set(('.', '?'))
+    columns = _get_columns(tags)
+    i_record, i_model = columns['record'], columns['model']
+    convert = _make_converter(columns)
 
     prev_model = None
-    atom_num = 0
     serial = 0  # do not read serial numbers from mmCIF. Wrong in multi-models.
 
-    model_data = []  # store atom data to account for multi-model files
-    for line in fhandle:
-        if line.startswith('loop_'):  # start of section
-            in_section = True
-
-        elif line.startswith('#'):  # end of section
-            in_section = False
-            read_atom = False
+    _model = "MODEL {:>5d}\n"
 
-        elif in_section and line.startswith('_atom_site.'):  # ATOM/HETATM
-            read_atom = True
-            labels[line.strip()] = label_pos
-            label_pos += 1
+    # Keep the first model until we know if there are more.
+    n_models = 0
+    first_model = None if ensemble else []
+    try:
+        for fields in rows:
+            if fields[i_record] not in ('ATOM', 'HETATM'):
+                continue
 
-        elif read_atom and line.startswith(('ATOM', 'HETATM')):  # convert
-            fields = re.findall(r'[^"\s]\S*|".+?"', line)  # find enclosed ''
+            fields.append('?')  # for missing columns
 
-            # Pick fields, giving preference to auth to match PDBs
-            # http://mmcif.wwpdb.org/docs/pdb_to_pdbx_correspondences.html
-            model_no = fields[labels.get('_atom_site.pdbx_PDB_model_num')]
+            model_no = fields[i_model]
             if prev_model != model_no:  # first line will trigger
                 prev_model = model_no
-                model_data.append([])
                 serial = 0
+                n_models += 1
+
+                if n_models == 1:
+                    if ensemble:
+                        yield _model.format(n_models)
+                elif first_model is not None:  # second model: flush first
+                    yield _model.format(1)
+                    for line in first_model:
+                        yield line
+                    yield 'ENDMDL\n'
+                    yield _model.format(n_models)
+                    first_model = None
+                else:
+                    yield 'ENDMDL\n'
+                    yield _model.format(n_models)
 
-            record = fields[labels.get('_atom_site.group_PDB')]
-
-            # serial = int(fields[labels.get('_atom_site.id')])
             serial += 1
+            atom_line = convert(fields, serial)
 
-            fid = labels.get('_atom_site.auth_atom_id')
-            if fid is None:
-                fid = labels.get('_atom_site.label_atom_id')
-            atname = fields[fid]
-
-            element = fields[labels.get('_atom_site.type_symbol')]
-            if element in empty:
-                element = ' '
-
-            # handle atom name
-            if atname[0] == '"' and atname[-1] == '"':
-                atname = atname[1:-1]
-
-            if len(atname) < 4 and atname[0].isalpha() and len(element) < 2:
-                atname = ' ' + atname  # pad
-
-            altloc = fields[labels.get('_atom_site.label_alt_id')]
-            if altloc in empty:
-                altloc = ' '
-
-            fid = labels.get('_atom_site.auth_comp_id')
-            if fid is None:
-                fid = labels.get('_atom_site.label_comp_id')
-            resname = fields[fid]
-
-            fid = labels.get('_atom_site.auth_asym_id')
-            if fid is None:
-                fid = labels.get('_atom_site.label_asym_id')
-            chainid = fields[fid]
-
-            fid = labels.get('_atom_site.auth_seq_id')
-            if fid is None:
-                fid = labels.get('_atom_site.label_seq_id')
-            resnum = int(fields[fid])
-
-            icode = fields[labels.get('_atom_site.pdbx_PDB_ins_code')]
-            if icode in empty:
-                icode = ' '
-
-            x = float(fields[labels.get('_atom_site.Cartn_x')])
-            y = float(fields[labels.get('_atom_site.Cartn_y')])
-            z = float(fields[labels.get('_atom_site.Cartn_z')])
-            occ = float(fields[labels.get('_atom_site.occupancy')])
-            bfactor = float(fields[labels.get('_atom_site.B_iso_or_equiv')])
-
-            charge = fields[labels.get('_atom_site.pdbx_formal_charge')]
-            try:
-                charge = charge
-            except ValueError:
-                charge = '  '
-
-            segid = chainid
-
-            atom_line = _a.format(record, serial, atname, altloc, resname,
-                                  chainid, resnum, icode, x, y, z, occ, bfactor,
-                                  segid, element, charge)
-
-            atom_num += 1
-
-            # Check if structure is too large
-            if atom_num > 99999:
-                emsg = 'ERROR!! Number of atoms exceeds PDB format limit: \'{}\'\n'
-                sys.stderr.write(emsg.format(atom_num))
-                sys.stderr.write(__doc__)
-                sys.exit(1)
-            elif len(chainid) > 1:
-                emsg = 'ERROR!! Chain IDs is too large: \'{}\'\n'
-                sys.stderr.write(emsg.format(chainid))
-                sys.stderr.write(__doc__)
-                sys.exit(1)
-            elif resnum > 9999:
-                emsg = 'ERROR!! Too many residues (\'{}\') in chain \'{}\' \n'
-                sys.stderr.write(emsg.format(resnum, chainid))
-                sys.stderr.write(__doc__)
-                sys.exit(1)
-
-            model_data[-1].append(atom_line)
-
-    # Check if multi-model
-    is_ensemble = len(model_data) > 1
-    if is_ensemble:
-        for model_no, model in enumerate(model_data, start=1):
-            yield "MODEL {:>5d}\n".format(model_no)
-            for line in model:
-                yield line
-            yield 'ENDMDL\n'
-    else:
-        for line in model_data[0]:
+            if first_model is None:
+                yield atom_line
+            else:
+                first_model.append(atom_line)
+
+    except _cif.CIFError as error:
+        sys.stderr.write('ERROR!! Could not parse mmCIF file: {}\n'.format(error))
+        sys.exit(1)
+
+    if first_model is not None:  # single model
+        for line in first_model:
             yield line
+    elif n_models:
+        yield 'ENDMDL\n'
 
     yield "{:<80s}\n".format("END")
 
@@ -229,10 +595,16 @@ convert_to_pdb = run
 
 def main():
     # Check Input
-    pdbfh = check_input(sys.argv[1:])
+    pdbfh, ensemble, nproc = check_input(sys.argv[1:])
+
+    # Convert files to a directory (-outdir)
+    if isinstance(pdbfh, list):
+        counts = _batch.run('pdb_fromcif', pdbfh, (ensemble,), nproc,
+                            progress=sys.stderr)
+        sys.exit(1 if counts['failed'] else 0)
 
     # Do the job
-    new_pdb = run(pdbfh)
+    new_pdb = run(pdbfh, ensemble, nproc)
 
     try:
         _buffer = []
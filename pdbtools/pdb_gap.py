@@ -19,13 +19,28 @@
 Finds gaps between consecutive protein residues in the PDB.
 
 Detects gaps both by a distance criterion or discontinuous residue numbering.
-Only applies to protein residues.
+By default, only applies to protein residues.
+
+The atoms used to trace the chain, and the distance above which consecutive
+residues are considered disconnected, can be selected with options:
+
+    -trace:CA   distance between consecutive CA atoms (default, 4.0A)
+    -trace:P    distance between consecutive P atoms, for nucleic acids (7.5A)
+    -trace:CN   length of the peptide bond, between the C atom of a residue
+                and the N atom of the next (2.0A)
+    -cutoff:<distance>  overrides the default distance of the trace.
+
+The -table option writes the gaps as a table of tab-separated values, with the
+model, chain, residues, distance, and type of each gap.
 
 Usage:
-    python pdb_gap.py <pdb file>
+    python pdb_gap.py [-trace:<CA|P|CN>] [-cutoff:<distance>] [-table]
+        <pdb file>
 
 Example:
     python pdb_gap.py 1CTF.pdb
+    python pdb_gap.py -trace:CN -cutoff:1.8 1CTF.pdb
+    python pdb_gap.py -trace:P -table 1D66.pdb
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -34,12 +49,37 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
+from functools import partial
+from itertools import chain, groupby, islice
+from operator import itemgetter
 import os
+import re
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+from pdbtools._atomtable import AtomTable
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+# name: (atom names, default cutoff). With two atoms, the gap is measured
+# from the first atom of a residue to the second atom of the next residue.
+TRACES = {
+    'CA': ((' CA ',), 4.0),  # respect spacing. 'CA  ' != ' CA '
+    'P': ((' P  ',), 7.5),
+    'CN': ((' C  ', ' N  '), 2.0),
+}
+
+TABLE_HEADER = ('model', 'chain', 'resname_1', 'resnum_1', 'resname_2',
+                'resnum_2', 'distance', 'type')
+
+_BLOCK_SIZE = 65536  # lines searched at a time
+_CHUNK_SIZE = 4194304  # or characters, when reading from a file
+
+# Columns of ATOM and MODEL lines
+_get_segment_key = itemgetter(0, slice(21, 22))  # 'M' for MODEL, and chain
+
 
 def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
@@ -47,6 +87,32 @@ def check_input(args):
 
     # Defaults
     fh = sys.stdin  # file handle
+    trace = 'CA'
+    cutoff = None
+    table = False
+
+    options = ('-trace', '-cutoff', '-table')
+    while args and args[0].partition(':')[0] in options:
+        option, args = args[0], args[1:]
+        name, _, value = option.partition(':')
+        if name == '-trace':
+            trace = value.upper()
+            if trace not in TRACES:
+                emsg = 'ERROR!! Trace must be one of {}: \'{}\'\n'
+                sys.stderr.write(emsg.format(', '.join(sorted(TRACES)),
+                                             value))
+                sys.exit(1)
+        elif name == '-cutoff':
+            try:
+                cutoff = float(value)
+                if cutoff <= 0:
+                    raise ValueError
+            except ValueError:
+                emsg = 'ERROR!! Cutoff must be a positive number: \'{}\'\n'
+                sys.stderr.write(emsg.format(value))
+                sys.exit(1)
+        else:
+            table = True
 
     if not len(args):
         # Reading from pipe with default option
@@ -61,7 +127,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -69,68 +135,214 @@ def check_input(args):
         sys.stderr.write(__doc__)
         sys.exit(1)
 
-    return fh
+    if cutoff is None:
+        cutoff = TRACES[trace][1]
+    return (fh, trace, cutoff, table)
+
+
+def _read_blocks(fhandle):
+    """
+    Yields the contents of a file in blocks of whole lines.
 
+    File handles are read in chunks, which avoids splitting the file in
+    lines first. Other line iterators (e.g. lists) are joined in blocks.
+    """
+    read = getattr(fhandle, 'read', None)
+    if read is None:
+        fhandle = iter(fhandle)
+        while True:
+            block = ''.join(islice(fhandle, _BLOCK_SIZE))
+            if not block:
+                return
+            yield block
+
+    rest = ''
+    for chunk in iter(partial(read, _CHUNK_SIZE), ''):
+        block = rest + chunk
+        end = block.rfind('\n') + 1
+        if end:
+            yield block[:end]
+        rest = block[end:]
+    if rest:
+        yield rest
+
+
+def _read_trace(fhandle, atom_names):
+    """
+    Yields lists of the MODEL lines and the ATOM lines of the trace atoms.
+
+    Lines are searched in blocks, with a single regular expression, so that
+    the other lines are skipped without being handled one by one.
+    """
+    # Starting the pattern with a newline, rather than '^' in multiline
+    # mode, lets the regex engine jump from one line to the next.
+    names = '|'.join(re.escape(name) for name in atom_names)
+    pattern = re.compile(r'\n((?:MODEL|ATOM.{8}(?:' + names + r'))[^\n]*)')
+
+    for block in _read_blocks(fhandle):
+        yield pattern.findall('\n' + block)
+
+
+def _segments(lines):
+    """
+    Groups trace atoms into segments of consecutive atoms of the same model
+    and chain, in the order of the file.
+
+    Yields the model number and the ATOM lines of each segment.
+    """
+    model = 0
+    # MODEL lines form groups of their own, which split the segments.
+    for key, group in groupby(lines, _get_segment_key):
+        if key[0] == 'M':
+            for line in group:
+                model = int(line[10:14])
+        else:
+            yield model, list(group)
+
+
+def _pair_residues(segment, atom_names):
+    """
+    Returns the atoms of a segment of the C-N trace, in two lists: the first
+    atom of each residue (C), and the second atom of the next residue (N).
 
-def run(fhandle):
+    Residues without both atoms are skipped.
+    """
+    first_name, _ = atom_names
+    residues = []  # [first atom, second atom]
+    resid = None
+    for line in segment:
+        if line[17:27] != resid:
+            resid = line[17:27]
+            residues.append([None, None])
+        if line[12:16] == first_name:
+            residues[-1][0] = line
+        else:
+            residues[-1][1] = line
+
+    residues = [r for r in residues if r[0] is not None and r[1] is not None]
+    return ([r[0] for r in residues[:-1]],
+            [r[1] for r in residues[1:]])
+
+
+def _read_columns(atoms):
+    """Returns the arrays of x, y, z coordinates and residue numbers."""
+    table = AtomTable.from_lines(atoms)
+    return [table.column(name) for name in ('x', 'y', 'z', 'resseq')]
+
+
+def find_gaps(fhandle, trace='CA', cutoff=None):
     """
     Detect gaps between residues in the PDB file.
 
+    The coordinates and residue numbers of the trace atoms are read into
+    an AtomTable one segment (model and chain) at a time, so that each
+    column is parsed in bulk rather than one atom at a time.
+
+    This function is a generator.
+
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
 
-    Returns
-    -------
-    None
-        Writes to the sys.stdout.
+    trace : str
+        The atoms to measure the distances between, one of TRACES.
+
+    cutoff : float, optional
+        Distance above which consecutive residues are not connected. By
+        default, the cutoff of the trace in TRACES.
+
+    Yields
+    ------
+    tuple
+        The model number, the ATOM lines of the two atoms on each side of
+        the gap, their distance, and the type of gap: 'distance' if the
+        atoms are too far apart, or 'sequence' if the residue numbers are
+        not consecutive.
     """
+    atom_names, default_cutoff = TRACES[trace]
+    if cutoff is None:
+        cutoff = default_cutoff
+    sq_cutoff = float(cutoff) ** 2
+
+    lines = chain.from_iterable(_read_trace(fhandle, atom_names))
+    for model, segment in _segments(lines):
+        if len(atom_names) == 1:
+            # Consecutive atoms: read each atom once, and shift the lists.
+            atoms_1, atoms_2 = segment[:-1], segment[1:]
+            columns = _read_columns(segment)
+            columns_1 = [c[:-1] for c in columns]
+            columns_2 = [c[1:] for c in columns]
+        else:
+            atoms_1, atoms_2 = _pair_residues(segment, atom_names)
+            columns_1 = _read_columns(atoms_1)
+            columns_2 = _read_columns(atoms_2)
+
+        if not atoms_1:
+            continue
+
+        pairs = zip(atoms_1, atoms_2, *(columns_1 + columns_2))
+        for atom_1, atom_2, x1, y1, z1, r1, x2, y2, z2, r2 in pairs:
+            dx, dy, dz = x2 - x1, y2 - y1, z2 - z1
+            sq_dist = dx * dx + dy * dy + dz * dz
+            if sq_dist > sq_cutoff:
+                gap_type = 'distance'
+            elif r1 + 1 != r2:
+                gap_type = 'sequence'
+            else:
+                continue
+            yield model, atom_1, atom_2, sq_dist ** 0.5, gap_type
 
-    fmt_GAPd = "{0[1]}:{0[3]}{0[2]} < {2:7.2f}A > {1[1]}:{1[3]}{1[2]}\n"
-    fmt_GAPs = "{0[1]}:{0[3]}{0[2]} < Seq. Gap > {1[1]}:{1[3]}{1[2]}\n"
 
-    centroid = ' CA '  # respect spacing. 'CA  ' != ' CA '
-    distance_threshold = 4.0 * 4.0
+def run(fhandle, trace='CA', cutoff=None, table=False):
+    """
+    Detect gaps between residues in the PDB file.
 
-    def calculate_sq_atom_distance(i, j):
-        """Squared euclidean distance between two 3d points"""
-        return (i[0] - j[0]) * (i[0] - j[0]) + \
-               (i[1] - j[1]) * (i[1] - j[1]) + \
-               (i[2] - j[2]) * (i[2] - j[2])
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
 
-    prev_at = (None, None, None, None, (None, None, None))
-    model = 0
-    n_gaps = 0
-    for line in fhandle:
+    trace : str
+        The atoms to measure the distances between, one of TRACES.
 
-        if line.startswith('MODEL'):
-            model = int(line[10:14])
+    cutoff : float, optional
+        Distance above which consecutive residues are not connected. By
+        default, the cutoff of the trace in TRACES.
 
-        elif line.startswith('ATOM'):
-            atom_name = line[12:16]
-            if atom_name != centroid:
-                continue
+    table : bool
+        Write the gaps as a table of tab-separated values.
 
-            resn = line[17:20]
-            resi = int(line[22:26])
-            chain = line[21]
-            x = float(line[30:38])
-            y = float(line[38:46])
-            z = float(line[46:54])
+    Returns
+    -------
+    None
+        Writes to the sys.stdout.
+    """
 
-            at_uid = (model, chain, resi, resn, atom_name, (x, y, z))
-            if prev_at[0] == at_uid[0] and prev_at[1] == at_uid[1]:
-                d = calculate_sq_atom_distance(at_uid[5], prev_at[5])
-                if d > distance_threshold:
-                    sys.stdout.write(fmt_GAPd.format(prev_at, at_uid, d**0.5))
-                    n_gaps += 1
-                elif prev_at[2] + 1 != at_uid[2]:
-                    sys.stdout.write(fmt_GAPs.format(prev_at, at_uid))
-                    n_gaps += 1
+    fmt_GAPd = "{0}:{1}{2} < {6:7.2f}A > {3}:{4}{5}\n"
+    fmt_GAPs = "{0}:{1}{2} < Seq. Gap > {3}:{4}{5}\n"
+    fmt_table = "{}\t{}\t{}\t{}\t{}\t{}\t{:.2f}\t{}\n"
+    decode = _hybrid36.decode_resid
 
-            prev_at = at_uid
+    if table:
+        sys.stdout.write('\t'.join(TABLE_HEADER) + '\n')
 
-    sys.stdout.write('Found {} gap(s) in the structure\n'.format(n_gaps))
+    n_gaps = 0
+    _buffer = []
+    for model, atom_1, atom_2, dist, gap_type in find_gaps(fhandle, trace,
+                                                           cutoff):
+        n_gaps += 1
+        if table:
+            _buffer.append(fmt_table.format(
+                model, atom_1[21], atom_1[17:20], decode(atom_1[22:26]),
+                atom_2[17:20], decode(atom_2[22:26]), dist, gap_type))
+        else:
+            fmt = fmt_GAPd if gap_type == 'distance' else fmt_GAPs
+            _buffer.append(fmt.format(
+                atom_1[21], atom_1[17:20], decode(atom_1[22:26]),
+                atom_2[21], atom_2[17:20], decode(atom_2[22:26]), dist))
+
+    sys.stdout.write(''.join(_buffer))
+    if not table:
+        sys.stdout.write('Found {} gap(s) in the structure\n'.format(n_gaps))
 
 
 detect_gaps = run
@@ -138,10 +350,10 @@ detect_gaps = run
 
 def main():
     # Check Input
-    pdbfh = check_input(sys.argv[1:])
+    pdbfh, trace, cutoff, table = check_input(sys.argv[1:])
 
     # Do the job
-    run(pdbfh)
+    run(pdbfh, trace, cutoff, table)
 
     # last line of the script
     # We can close it even if it is sys.stdin
@@ -39,6 +39,8 @@ import collections
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -58,7 +60,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(fn, 'r')
+            fh = _stream.open_file(fn)
             fl.append(fh)
 
     else:  # no arguments
@@ -36,6 +36,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -60,7 +62,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -80,6 +82,7 @@ def run(fhandle):
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
 
     Yields
     ------
@@ -87,9 +90,12 @@ def run(fhandle):
         Only the coordinate records in the PDB file.
     """
 
+    fhandle, as_bytes = _stream.sniff(fhandle)
     records = ('MODEL ', 'ATOM  ', 'HETATM',
                'ENDMDL', 'END   ',
                'TER   ', 'CONECT')
+    if as_bytes:
+        records = _stream.to_bytes(records)
     for line in fhandle:
         if line.startswith(records):
             yield line
@@ -102,20 +108,23 @@ def main():
     # Check Input
     pdbfh = check_input(sys.argv[1:])
 
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
+
     # Do the job
-    new_pdb = run(pdbfh)
+    new_pdb = run(pdbin)
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_pdb):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                pdbout.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
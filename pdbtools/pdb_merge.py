@@ -37,6 +37,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao M.C. Teixeira"
 __email__ = "joaomcteixeira@gmail.com"
 
@@ -56,7 +58,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(fn, 'r')
+            fh = _stream.open_file(fn)
             fl.append(fh)
 
     else:  # Whatever ...
@@ -37,6 +37,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -104,7 +106,7 @@ def run(f_name_list):
 
         yield fmt_MODEL.format(fileno)
 
-        with open(file_name, 'r') as fhandle:
+        with _stream.open_file(file_name) as fhandle:
 
             for line in fhandle:
                 if line.startswith(records):
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs several pdb-tools in a single process, as if they were piped together.
+
+The pipeline is a list of tools separated by '|'. Each tool is named without
+the 'pdb_' prefix and its option, if any, is given after a colon, exactly as it
+would be given on the command line but without the leading dash. The file is
+read once, the tools are chained in memory, and the result is written once.
+
+With the -stats option, throughput statistics (lines and time spent in each
+tool) are written to stderr at the end of the run.
+
+Tools that do not stream PDB data line-by-line (e.g. pdb_wc, pdb_splitmodel,
+pdb_fetch, pdb_merge) cannot be used in a pipeline. BinaryCIF output (tocif:bcif)
+can only be written by the last tool of the pipeline, and BinaryCIF files can
+only be read by fromcif, as the first tool.
+
+Usage:
+    python pdb_pipe.py [-stats] -<tool[:option]|tool[:option]|...> <pdb file>
+
+Example:
+    python pdb_pipe.py -'selchain:A,B|delhetatm|reres:1|tidy' 1CTF.pdb
+    python pdb_pipe.py -'selaltloc|keepcoord|sort:C' 1CTF.pdb
+    python pdb_pipe.py -stats -'selchain:A|tidy' 1CTF.pdb
+
+This program is part of the `pdb-tools` suite of utilities and should not be
+distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
+files using the terminal, and can be used sequentially, with one tool streaming
+data to another. They are based on old FORTRAN77 code that was taking too much
+effort to maintain and compile. RIP.
+"""
+
+import importlib
+import os
+import sys
+import time
+
+from pdbtools import _stream
+from pdbtools import pdb_fromcif
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+# Tools that do not yield PDB lines from a line iterator.
+NOT_PIPEABLE = set([
+    'pdb_chkensemble',
+    'pdb_delinsertion',
+    'pdb_fetch',
+    'pdb_gap',
+    'pdb_intersect',
+    'pdb_merge',
+    'pdb_mkensemble',
+    'pdb_pipe',
+    'pdb_splitchain',
+    'pdb_splitmodel',
+    'pdb_splitseg',
+    'pdb_validate',
+    'pdb_wc',
+])
+
+# Tools, and their option, that yield bytes instead of lines.
+BINARY_OUTPUT = {
+    'pdb_tocif': 'bcif',
+}
+
+
+def check_input(args):
+    """Checks whether to read from stdin/file and validates user input/options.
+    """
+
+    # Defaults
+    option = ''
+    fh = sys.stdin  # file handle
+    fpath = None  # passed on to each tool's check_input
+    stats = False
+
+    if args and args[0] == '-stats':
+        stats = True
+        args = args[1:]
+
+    if not len(args):
+        # Reading from pipe with default option
+        if sys.stdin.isatty():
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+    elif len(args) == 1:
+        # One of two options: option & Pipe OR file & default option
+        if args[0].startswith('-'):
+            option = args[0][1:]
+            if sys.stdin.isatty():  # ensure the PDB data is streamed in
+                emsg = 'ERROR!! No data to process!\n'
+                sys.stderr.write(emsg)
+                sys.stderr.write(__doc__)
+                sys.exit(1)
+
+        else:
+            if not os.path.isfile(args[0]):
+                emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
+                sys.stderr.write(emsg.format(args[0]))
+                sys.stderr.write(__doc__)
+                sys.exit(1)
+
+            fpath = args[0]
+            fh = _stream.open_file(args[0])
+
+    elif len(args) == 2:
+        # Two options: option & File
+        if not args[0].startswith('-'):
+            emsg = 'ERROR! First argument is not an option: \'{}\'\n'
+            sys.stderr.write(emsg.format(args[0]))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        if not os.path.isfile(args[1]):
+            emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
+            sys.stderr.write(emsg.format(args[1]))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        option = args[0][1:]
+        fpath = args[1]
+        fh = _stream.open_file(args[1])
+
+    else:  # Whatever ...
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    # Validate option
+    steps = [s.strip() for s in option.split('|')]
+    if not option.strip() or not all(steps):
+        emsg = 'ERROR!! You must provide a pipeline of one or more tools\n'
+        sys.stderr.write(emsg)
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    pipeline = []
+    for stepno, step in enumerate(steps, 1):
+        name, _, tool_opt = step.partition(':')
+        name = name.strip()
+        if not name.startswith('pdb_'):
+            name = 'pdb_' + name
+
+        if name in NOT_PIPEABLE:
+            emsg = 'ERROR!! Tool cannot be used in a pipeline: \'{}\'\n'
+            sys.stderr.write(emsg.format(name))
+            sys.exit(1)
+
+        # BinaryCIF is yielded as a single bytes object, not as lines.
+        if name in BINARY_OUTPUT and tool_opt.strip() == BINARY_OUTPUT[name]:
+            if stepno != len(steps):
+                emsg = 'ERROR!! BinaryCIF output must be the last step: '
+                emsg += '\'{}\'\n'
+                sys.stderr.write(emsg.format(step))
+                sys.exit(1)
+
+        try:
+            module = importlib.import_module('pdbtools.' + name)
+        except ImportError:
+            emsg = 'ERROR!! Tool not found: \'{}\'\n'
+            sys.stderr.write(emsg.format(name))
+            sys.exit(1)
+
+        # Let the tool validate its own options, as if called on its own.
+        tool_args = []
+        if tool_opt:
+            tool_args.append('-' + tool_opt)
+        if fpath is not None:
+            tool_args.append(fpath)
+
+        params = module.check_input(tool_args)
+        if not isinstance(params, tuple):
+            params = (params,)
+
+        tool_fh, tool_params = params[0], params[1:]
+        if tool_fh is not sys.stdin:
+            tool_fh.close()
+
+        pipeline.append((name, module.run, tool_params))
+
+    # BinaryCIF is read from the binary stream of the file, not as lines.
+    is_bcif = pdb_fromcif._bcif_stream(fh) is not None
+    if is_bcif and pipeline[0][0] != 'pdb_fromcif':
+        emsg = 'ERROR!! BinaryCIF files must be read with fromcif, '
+        emsg += 'as the first step\n'
+        sys.stderr.write(emsg)
+        sys.exit(1)
+
+    return (fh, pipeline, stats)
+
+
+def _timed(iterable, counter):
+    """Yields from iterable while counting lines and time spent upstream."""
+    _clock = time.time
+    iterable = iter(iterable)
+    while True:
+        t0 = _clock()
+        try:
+            line = next(iterable)
+        except StopIteration:
+            counter[2] += _clock() - t0
+            return
+        counter[2] += _clock() - t0
+        counter[1] += 1
+        yield line
+
+
+def run(fhandle, pipeline, stats=None):
+    """
+    Chain several pdb-tools `run` functions in a single pass.
+
+    This function is a generator.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    pipeline : list of tuples
+        Each tuple contains the tool name, its `run` function, and the
+        extra arguments to pass to `run` after the line iterator, e.g.
+        ('pdb_selchain', pdb_selchain.run, (set(['A']),)). This is the
+        list returned by `check_input`.
+
+    stats : list, optional
+        If given, one [name, n_lines, seconds] entry is appended per
+        tool, and filled as the data flows through the pipeline. The
+        time of each tool excludes the time spent in the tools before
+        it, so that the entries add up to the total run time.
+
+    Yields
+    ------
+    str (line-by-line)
+        The PDB lines produced by the last tool in the pipeline.
+    """
+    if stats is None:
+        for _, tool, params in pipeline:
+            fhandle = tool(fhandle, *params)
+
+        for line in fhandle:
+            yield line
+        return
+
+    counters = [['input', 0, 0.0]]
+    if pdb_fromcif._bcif_stream(fhandle) is not None:
+        stream = fhandle  # BinaryCIF, read as bytes by the first tool
+    else:
+        stream = _timed(fhandle, counters[0])
+    for name, tool, params in pipeline:
+        counter = [name, 0, 0.0]
+        counters.append(counter)
+        stream = _timed(tool(stream, *params), counter)
+
+    for line in stream:
+        yield line
+
+    # Each counter includes the time spent by all upstream tools.
+    upstream = 0.0
+    for counter in counters:
+        counter[2], upstream = counter[2] - upstream, counter[2]
+        stats.append(counter)
+
+
+pipe_tools = run
+
+
+def main():
+    # Check Input
+    pdbfh, pipeline, report_stats = check_input(sys.argv[1:])
+
+    # Do the job
+    stats = [] if report_stats else None
+    new_pdb = run(pdbfh, pipeline, stats)
+
+    # Binary output (e.g. BinaryCIF) is written as bytes
+    new_pdb, as_bytes = _stream.sniff(new_pdb)
+    outstream, empty = sys.stdout, ''
+    if as_bytes:
+        outstream, empty = getattr(sys.stdout, 'buffer', sys.stdout), b''
+
+    try:
+        _buffer = []
+        _buffer_size = 5000  # write N lines at a time
+        for lineno, line in enumerate(new_pdb):
+            if not (lineno % _buffer_size):
+                outstream.write(empty.join(_buffer))
+                _buffer = []
+            _buffer.append(line)
+
+        outstream.write(empty.join(_buffer))
+        outstream.flush()
+    except IOError:
+        # This is here to catch Broken Pipes
+        # for example to use 'head' or 'tail' without
+        # the error message showing up
+        pass
+
+    # Report throughput per tool
+    for name, n_lines, seconds in stats or ():
+        rate = n_lines / seconds if seconds > 0 else float('inf')
+        msg = '{:<16s} {:>10d} lines {:>10.3f} s {:>12.0f} lines/s\n'
+        sys.stderr.write(msg.format(name, n_lines, seconds, rate))
+
+    # last line of the script
+    # We can close it even if it is sys.stdin
+    pdbfh.close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
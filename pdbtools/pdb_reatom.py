@@ -18,6 +18,8 @@
 """
 Renumbers atom serials in the PDB file starting from a given value (default 1).
 
+Serials above 99999 are written in hybrid-36 notation (A0000, A0001, ...).
+
 Usage:
     python pdb_reatom.py -<number> <pdb file>
 
@@ -35,6 +37,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -70,7 +75,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -87,7 +92,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -96,6 +101,7 @@ def check_input(args):
     # Validate option
     try:
         option = int(option)
+        _hybrid36.encode_serial(option)  # must fit in the field
     except ValueError:
         emsg = 'ERROR!! You provided an invalid atom serial number: \'{}\''
         sys.stderr.write(emsg.format(option))
@@ -126,29 +132,32 @@ def run(fhandle, starting_value):
                    slice(16, 21), slice(21, 26), slice(26, 31))
 
     serial_equiv = {'': ''}  # store for conect statements
+    _encode = _hybrid36.encode_serial
+    max_serial = _hybrid36.MAX_SERIAL
 
     serial = starting_value
     records = ('ATOM', 'HETATM')
     for line in fhandle:
         if line.startswith(records):
-            serial_equiv[line[6:11].strip()] = serial
-            yield line[:6] + str(serial).rjust(5) + line[11:]
+            new_serial = _encode(serial)
+            serial_equiv[line[6:11].strip()] = new_serial
+            yield line[:6] + new_serial + line[11:]
             serial += 1
-            if serial > 99999:
-                emsg = 'Cannot set atom serial number above 99999.\n'
-                sys.stderr.write(emsg)
+            if serial > max_serial:
+                emsg = 'Cannot set atom serial number above {}.\n'
+                sys.stderr.write(emsg.format(max_serial))
                 sys.exit(1)
 
         elif line.startswith('ANISOU'):
             # Keep atom id as previous atom
-            yield line[:6] + str(serial - 1).rjust(5) + line[11:]
+            yield line[:6] + _encode(serial - 1) + line[11:]
 
         elif line.startswith('CONECT'):
             # 6:11, 11:16, 16:21, 21:26, 26:31
             serials = [line[cr].strip() for cr in char_ranges]
 
             # If not found, return default
-            new_serials = [str(serial_equiv.get(s, s)) for s in serials]
+            new_serials = [serial_equiv.get(s, s) for s in serials]
             conect_line = fmt_CONECT.format(*new_serials)
 
             yield conect_line
@@ -159,7 +168,7 @@ def run(fhandle, starting_value):
             yield line
 
         elif line.startswith('TER'):
-            yield line[:6] + str(serial).rjust(5) + line[11:]
+            yield line[:6] + _encode(serial) + line[11:]
             serial += 1
 
         else:
@@ -18,6 +18,8 @@
 """
 Renumbers the residues of the PDB file starting from a given number (default 1).
 
+Residue numbers above 9999 are written in hybrid-36 notation (A000, A001, ...).
+
 Usage:
     python pdb_reres.py -<number> <pdb file>
 
@@ -35,6 +37,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -70,7 +75,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -87,7 +92,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -96,6 +101,7 @@ def check_input(args):
     # Validate option
     try:
         option = int(option)
+        _hybrid36.encode_resid(option)  # must fit in the field
     except ValueError:
         emsg = 'ERROR!! You provided an invalid residue number: \'{}\''
         sys.stderr.write(emsg.format(option))
@@ -132,6 +138,8 @@ def run(fhandle, starting_resid):
         The modified (or not) PDB line.
     """
     _pad_line = pad_line
+    _encode = _hybrid36.encode_resid
+    max_resid = _hybrid36.MAX_RESID
     prev_resid = None  # tracks chain and resid
     resid = starting_resid - 1  # account for first residue
     records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
@@ -147,12 +155,13 @@ def run(fhandle, starting_resid):
             if line_resuid != prev_resid:
                 prev_resid = line_resuid
                 resid += 1
-                if resid > 9999:
-                    emsg = 'Cannot set residue number above 9999.\n'
-                    sys.stderr.write(emsg)
+                if resid > max_resid:
+                    emsg = 'Cannot set residue number above {}.\n'
+                    sys.stderr.write(emsg.format(max_resid))
                     sys.exit(1)
+                new_resid = _encode(resid)
 
-            yield line[:22] + str(resid).rjust(4) + line[26:]
+            yield line[:22] + new_resid + line[26:]
 
         else:
             yield line
@@ -43,6 +43,9 @@ import operator
 import os
 import sys
 
+from pdbtools import _stream
+from pdbtools._atomtable import AtomTable
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -78,7 +81,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -95,7 +98,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -384,16 +387,18 @@ def _get_sort_atoms(altloc_lines):
     for altloc, lines in altloc_lines.items():
         all_lines.extend(lines)
 
+    # the fields of all lines are read column-wise
+    table = AtomTable.from_lines(all_lines)
+    keys = zip(table.column('resseq'),
+               map(str.strip, table.column('resname')),
+               table.column('name'),
+               table.column('chain'))
+
     # organize by atoms
     atoms = {}
     # key in the dictionary are unique identifiers of the same residue
-    for line in all_lines:
-        res_number = int(line[22:26])
-        res_name = line[17:20].strip()
-        atom_name = line[12:16]
-        atom_number = int(line[6:11])
-        chain_id = line[21]
-        key = (res_number, res_name, atom_name, chain_id)
+    for key, atom_number, line in zip(keys, table.column('serial'),
+                                      all_lines):
         # the atom number is saved so that the original order can be kept
         alist = atoms.setdefault(key, (atom_number, []))
         alist[1].append(line)
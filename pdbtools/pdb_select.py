@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Selects atoms matching a boolean expression, in a single pass.
+
+The expression combines selectors with 'and', 'or', 'not', and parentheses.
+Each selector is a keyword followed by a comma-separated list of values:
+
+    chain <ids>        chain identifier
+    resname <names>    residue name
+    name <names>       atom name
+    element <symbols>  element symbol
+    segid <ids>        segment identifier
+    resid <ranges>     residue numbers or ranges, as in pdb_selres (no step)
+    hetatm             HETATM records (no values)
+
+TER records are kept if they match the chain, resname, and resid selectors of
+the expression, and any other selector is ignored for them. Records other than
+ATOM, HETATM, ANISOU, and TER are always kept.
+
+Usage:
+    python pdb_select.py -<expression> <pdb file>
+
+Example:
+    python pdb_select.py -'chain A,B and resname ALA,GLY' 1CTF.pdb
+    python pdb_select.py -'chain A and not element H' 1CTF.pdb
+    python pdb_select.py -'(resid 1:10 or hetatm) and not resname HOH' 1CTF.pdb
+
+This program is part of the `pdb-tools` suite of utilities and should not be
+distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
+files using the terminal, and can be used sequentially, with one tool streaming
+data to another. They are based on old FORTRAN77 code that was taking too much
+effort to maintain and compile. RIP.
+"""
+
+import os
+import sys
+
+from pdbtools import _select
+from pdbtools import _stream
+
+__author__ = "Joao Rodrigues"
+__email__ = "j.p.g.l.m.rodrigues@gmail.com"
+
+
+def check_input(args):
+    """Checks whether to read from stdin/file and validates user input/options.
+    """
+
+    # Defaults
+    option = ''
+    fh = sys.stdin  # file handle
+
+    if not len(args):
+        # Reading from pipe with default option
+        if sys.stdin.isatty():
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+    elif len(args) == 1:
+        # One of two options: option & Pipe OR file & default option
+        if args[0].startswith('-'):
+            option = args[0][1:]
+            if sys.stdin.isatty():  # ensure the PDB data is streamed in
+                emsg = 'ERROR!! No data to process!\n'
+                sys.stderr.write(emsg)
+                sys.stderr.write(__doc__)
+                sys.exit(1)
+
+        else:
+            if not os.path.isfile(args[0]):
+                emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
+                sys.stderr.write(emsg.format(args[0]))
+                sys.stderr.write(__doc__)
+                sys.exit(1)
+
+            fh = _stream.open_file(args[0])
+
+    elif len(args) == 2:
+        # Two options: option & File
+        if not args[0].startswith('-'):
+            emsg = 'ERROR! First argument is not an option: \'{}\'\n'
+            sys.stderr.write(emsg.format(args[0]))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        if not os.path.isfile(args[1]):
+            emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
+            sys.stderr.write(emsg.format(args[1]))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        option = args[0][1:]
+        fh = _stream.open_file(args[1])
+
+    else:  # Whatever ...
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    # Validate option
+    try:
+        selection = _select.Selection.parse(option)
+    except _select.SelectionError as error:
+        emsg = 'ERROR!! {}\n'
+        sys.stderr.write(emsg.format(error))
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    return (fh, selection)
+
+
+def run(fhandle, selection):
+    """
+    Filter the PDB file with a selection expression.
+
+    This function is a generator.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+        Lines can be `str` or `bytes`, and are yielded as such.
+
+    selection : str or Selection
+        The selection expression, or the Selection object returned by
+        `check_input`.
+
+    Yields
+    ------
+    str (line-by-line)
+        The selected ATOM/HETATM/ANISOU/TER records and all other lines.
+    """
+    if not isinstance(selection, _select.Selection):
+        selection = _select.Selection.parse(selection)
+
+    for line in selection.filter(fhandle):
+        yield line
+
+
+select_atoms = run
+
+
+def main():
+    # Check Input
+    pdbfh, selection = check_input(sys.argv[1:])
+
+    # Read and write bytes, if possible, to skip decoding the data
+    pdbin, pdbout, empty = _stream.binary_streams(pdbfh, sys.stdout)
+
+    # Do the job
+    new_pdb = run(pdbin, selection)
+
+    try:
+        _buffer = []
+        _buffer_size = 5000  # write N lines at a time
+        for lineno, line in enumerate(new_pdb):
+            if not (lineno % _buffer_size):
+                pdbout.write(empty.join(_buffer))
+                _buffer = []
+            _buffer.append(line)
+
+        pdbout.write(empty.join(_buffer))
+        pdbout.flush()
+    except IOError:
+        # This is here to catch Broken Pipes
+        # for example to use 'head' or 'tail' without
+        # the error message showing up
+        pass
+
+    # last line of the script
+    # We can close it even if it is sys.stdin
+    pdbfh.close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -20,10 +20,13 @@ Selects residues by their index, piecewise or in a range.
 
 The range option has three components: start, end, and step. Start and end
 are optional and if ommitted the range will start at the first residue or
-end at the last, respectively.
+end at the last, respectively. The step selects every N-th residue in the
+range, in the order they appear in the file, and then all residues with the
+same number (use chain identifiers to restrict this). Ranges can be restricted
+to a single chain by prefixing them with its identifier.
 
 Usage:
-    python pdb_selres.py -[resid]:[resid]:[step] <pdb file>
+    python pdb_selres.py -[chain:][resid]:[resid]:[step] <pdb file>
 
 Example:
     python pdb_selres.py -1,2,4,6 1CTF.pdb # Extracts residues 1, 2, 4 and 6
@@ -33,6 +36,8 @@ Example:
     python pdb_selres.py -:5 1CTF.pdb # Extracts residues from START to 5.
     python pdb_selres.py -::5 1CTF.pdb # Extracts every 5th residue
     python pdb_selres.py -1:10:5 1CTF.pdb # Extracts every 5th residue from 1 to 10
+    python pdb_selres.py -A:10:200:2,B:5: 1CTF.pdb # Every 2nd residue from 10 to 200 in
+                                                   # chain A, and 5 to END in chain B
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -41,85 +46,76 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
-from itertools import chain as iter_chain
 import os
 import sys
+import tempfile
+
+from pdbtools import _hybrid36
+from pdbtools import _ranges
+from pdbtools import _stream
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+# Data read from stdin is kept in memory up to this size (in characters),
+# and spooled to a temporary file beyond it.
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
 
-def check_input(args):
-    """Checks whether to read from stdin/file and validates user input/options.
+
+def _scan_residues(fhandle):
     """
+    Reads the residues of a file and rewinds it.
+
+    Files are read twice: once here, and again when selecting residues.
+    Data that cannot be read twice (e.g. stdin, or the output of another
+    tool) is copied to a temporary file while reading, which is returned
+    instead.
+
+    Returns
+    -------
+    tuple
+        The (rewound) file handle and the list of residues, as (chain,
+        resid) tuples in the order they appear in the file.
+    """
+    try:
+        seekable = fhandle is not sys.stdin and fhandle.seekable()
+        start = fhandle.tell() if seekable else None
+    except (AttributeError, IOError, ValueError):
+        seekable = False
 
-    # Options can be single numbers or ranges.
-    def _validate_opt_numeric(value):
-        """Returns a valid numerical option or dies trying"""
-        try:
-            num = int(value)
-        except ValueError:
-            emsg = "ERROR!! Not a valid number: '{}'\n"
-            sys.stderr.write(emsg.format(value))
-            sys.exit(1)
-        else:
-            # resid 4-char limit
-            if (-999 <= num < 10000):
-                return num
-            else:
-                emsg = "ERROR!! Residue numbers must be between -999 and 9999: '{}'\n"
-                sys.stderr.write(emsg.format(value))
-                sys.exit(1)
+    spool = None
+    if not seekable:
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE,
+                                              mode='w+')
 
-    def _validate_opt_range(value, resid_list):
-        """Returns a numerical range or dies trying"""
+    resid_list = []
+    records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+    prev_res = None
+    for line in fhandle:
+        if line.startswith(records):
+            res_id = line[21:26]  # include chain ID
+            if res_id != prev_res:
+                prev_res = res_id
+                try:
+                    resid = _hybrid36.decode_resid(line[22:26])
+                except ValueError:  # e.g. bare TER
+                    pass
+                else:
+                    resid_list.append((line[21], resid))
+        if spool is not None:
+            spool.write(line)
 
-        # Validate formatting
-        if not (1 <= value.count(':') <= 2):
-            emsg = "ERROR!! Residue range must be in 'a:z:s' where a and z are "
-            emsg += 'optional (default to first residue and last respectively), and'
-            emsg += 's is an optional step value (to return every s-th residue).\n'
-            sys.stderr.write(emsg)
-            sys.exit(1)
+    if spool is None:
+        fhandle.seek(start)
+        return fhandle, resid_list
 
-        start, end, step = None, None, 1
-        slices = [_validate_opt_numeric(num)
-                  if num.strip() else None for num in value.split(':')]
-
-        if len(slices) == 3:
-            start, end, step = slices
-        elif len(slices) == 2:
-            start, end = slices
-        elif len(slices) == 1:
-            if value.startswith(':'):
-                end = slices[0]
-            else:
-                start = slices[0]
-
-        # Upper/Lower limits, resid max 4 char
-        if start is None:
-            start = -1000
-        if end is None:
-            end = 10000
-
-        # extra validation for step
-        if step is None:
-            step = 1
-        else:
-            if step < 1:
-                emsg = "ERROR!! Step value must be a positive number: '{}'\n"
-                sys.stderr.write(emsg.format(step))
-                sys.exit(1)
+    spool.seek(0)
+    return spool, resid_list
 
-        # validate proper order in range
-        if start > end:
-            emsg = 'ERROR!! Start ({}) cannot be larger than end ({})\n'
-            sys.stderr.write(emsg.format(start, end))
-            sys.exit(1)
 
-        # Build range
-        bounded_resid = [r for r in resid_list if start <= r <= end]
-        return bounded_resid[::step]
+def check_input(args):
+    """Checks whether to read from stdin/file and validates user input/options.
+    """
 
     # Defaults
     option = '::'
@@ -148,7 +144,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -165,43 +161,18 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
         sys.exit(1)
 
-    # Read file handle to extract residue numbers
-    # Because sys.stdin is not seekable we store the
-    # lines again in an iterator.
-    buffer = iter([])
-    resid_list = []
-
-    records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
-    prev_res = None
-    for line in fh:
-        if line.startswith(records):
-            res_id = line[21:26]  # include chain ID
-            if res_id != prev_res:
-                prev_res = res_id
-                resid_list.append(int(line[22:26]))
-        buffer = iter_chain(buffer, [line])
-
+    # Validate option
     try:
-        fh.close()  # in case we opened a file. Just to be clean.
-    except AttributeError:
-        pass
-
-    fh = buffer
-
-    residue_range = set()  # stores all the residues to write.
-    for entry in option.split(','):
-        if ':' in entry:
-            resrange = _validate_opt_range(entry, resid_list)
-            residue_range.update(resrange)
-        else:
-            singleres = _validate_opt_numeric(entry)
-            residue_range.add(singleres)
+        residue_range = _ranges.ResidueRanges.parse(option)
+    except _ranges.RangeError as error:
+        sys.stderr.write('ERROR!! {}\n'.format(error))
+        sys.exit(1)
 
     return (fh, residue_range)
 
@@ -210,34 +181,43 @@ def run(fhandle, residue_range):
     """
     Filter residues within a certain numbering range.
 
+    Ranges with a step need the residues of the whole file, so the data is
+    read twice when there are any: seekable files are rewound, and other
+    line iterators are spooled to a temporary file (see `_scan_residues`).
+
     This function is a generator.
 
     Parameters
     ----------
     fhandle : a line-by-line iterator of the original PDB file..
 
-    residue_range : list of ints
-        The residues to consider. Residues outside this range are
-        not yield.
+    residue_range : ResidueRanges, or list/set of ints
+        The residues to consider, as returned by `check_input`. Residues
+        outside this range are not yield.
 
     Yields
     ------
     str (line-by-line)
         All non-RECORDS lines plus RECORDS within the residue range.
     """
-    prev_res = None
-    records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
-    for line in fhandle:
-        if line.startswith(records):
+    residue_range = _ranges.as_ranges(residue_range)
+    source = fhandle
+    if residue_range.has_steps():
+        fhandle, residues = _scan_residues(fhandle)
+        residue_range = residue_range.resolve_steps(residues)
 
-            res_id = line[21:26]  # include chain ID
-            if res_id != prev_res:
-                prev_res = res_id
-
-            if int(line[22:26]) not in residue_range:
-                continue
+    is_selected = residue_range.matcher()
+    records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+    try:
+        for line in fhandle:
+            if line.startswith(records):
+                if not is_selected(line[21:26]):  # include chain ID
+                    continue
 
-        yield line
+            yield line
+    finally:
+        if fhandle is not source:  # spooled copy
+            fhandle.close()
 
 
 select_residuese = run
@@ -268,8 +248,8 @@ def main():
         pass
 
     # last line of the script
-    # No need to close the file handle since we
-    # build an iterator in the check_input functions
+    # We can close it even if it is sys.stdin
+    pdbfh.close()
     sys.exit(0)
 
 
@@ -18,6 +18,9 @@
 """
 Shifts the residue numbers in the PDB file by a constant value.
 
+Residue numbers above 9999 are read and written in hybrid-36 notation (A000,
+A001, ...).
+
 Usage:
     python pdb_shiftres.py -<number> <pdb file>
 
@@ -35,6 +38,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -70,7 +76,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -87,7 +93,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -124,15 +130,24 @@ def run(fhandle, shifting_factor):
     str (line-by-line)
         The modified (or not) PDB line.
     """
+    _decode = _hybrid36.decode_resid
+    _encode = _hybrid36.encode_resid
+    min_resid = _hybrid36.MIN_RESID
+    max_resid = _hybrid36.MAX_RESID
+
     records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
     for line in fhandle:
         if line.startswith(records):
-            shifted_resid = int(line[22:26]) + shifting_factor
-            if shifted_resid > 9999:
-                emsg = 'Cannot set residue number above 9999.\n'
-                sys.stderr.write(emsg)
+            shifted_resid = _decode(line[22:26]) + shifting_factor
+            if shifted_resid > max_resid:
+                emsg = 'Cannot set residue number above {}.\n'
+                sys.stderr.write(emsg.format(max_resid))
+                sys.exit(1)
+            elif shifted_resid < min_resid:
+                emsg = 'Cannot set residue number below {}.\n'
+                sys.stderr.write(emsg.format(min_resid))
                 sys.exit(1)
-            yield line[:22] + str(shifted_resid).rjust(4) + line[26:]
+            yield line[:22] + _encode(shifted_resid) + line[26:]
 
         else:
             yield line
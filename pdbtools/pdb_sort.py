@@ -34,16 +34,21 @@ following order:
     - CONECT, sorted by the serial number of the central (first) atom
 
 MASTER, TER, END statements are removed. Headers (HEADER, REMARK, etc) are kept
-and placed first. Does NOT support multi-model files. Use pdb_splitmodel, then
-pdb_sort on each model, and then pdb_mkensemble.
+and placed first. In multi-model files, each model is sorted independently and
+CONECT records are placed after the last model.
+
+For very large files, a maximum number of lines to sort in memory can be given
+after the sorting keys. Each model is then sorted in chunks of that size, saved
+to temporary files, and merged at the end.
 
 Usage:
-    python pdb_sort.py -<option> <pdb file>
+    python pdb_sort.py -<option>[:<max. lines in memory>] <pdb file>
 
 Example:
     python pdb_sort.py 1CTF.pdb  # sorts by chain and residues
     python pdb_sort.py -C 1CTF.pdb  # sorts by chain (A, B, C ...) only
     python pdb_sort.py -R 1CTF.pdb  # sorts by residue number/icode only
+    python pdb_sort.py -CR:1000000 big.pdb  # sorts 1M lines at a time
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -52,8 +57,14 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
+import heapq
 import os
 import sys
+import tempfile
+
+from pdbtools import _hybrid36
+from pdbtools import _stream
+from pdbtools._atomtable import AtomTable
 
 __author__ = ["Joao Rodrigues", "Joao M.C. Teixeira"]
 __email__ = ["j.p.g.l.m.rodrigues@gmail.com", "joaomcteixeira@gmail.com"]
@@ -90,7 +101,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -107,13 +118,14 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
         sys.exit(1)
 
     # Validate option
+    option, _, max_lines = option.partition(':')
     option = [o.upper() for o in option]
     valid = set('CR')
     for item in option:
@@ -123,110 +135,281 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-    return (fh, option)
+    if max_lines:
+        try:
+            max_lines = int(max_lines)
+            if max_lines < 1:
+                raise ValueError
+        except ValueError:
+            emsg = 'ERROR!! Maximum number of lines must be a positive integer: \'{}\'\n'
+            sys.stderr.write(emsg.format(max_lines))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+    else:
+        max_lines = None
+
+    return (fh, option, max_lines)
 
 
-def run(fhandle, sorting_keys):
+def _make_key(sorting_keys, chain_order):
     """
-    Sort the contents of the PDB file.
+    Returns the composite sort key of ATOM/HETATM/ANISOU lines.
 
-    This function is a generator.
+    Sorting by the key is equivalent to sorting by atom serial number, then
+    altloc, then residue number and insertion code, then chain, in this order
+    and keeping the order of previous sorts (stable sort).
 
     Parameters
     ----------
-    fhandle : a line-by-line iterator of the original PDB file.
+    sorting_keys : str, list, or tuple
+        'C' to sort by chain, 'R' to sort by residue number, or both.
 
-    Yields
-    ------
-    str (line-by-line)
-        The sorted PDB lines.
+    chain_order : dict
+        Position of each chain identifier in the original file. Used to
+        keep the original order of the chains when not sorting by chain.
+    """
+    by_chain = 'C' in sorting_keys
+    by_resid = 'R' in sorting_keys
+    serial = _hybrid36.decode_serial
+    resid = _hybrid36.decode_resid
+
+    if by_chain and by_resid:
+        def _key(line):
+            return (line[21], resid(line[22:26]), line[26], line[16],
+                    serial(line[6:11]))
+    elif by_chain:
+        def _key(line):
+            return (line[21], line[16], serial(line[6:11]))
+    elif by_resid:
+        def _key(line):
+            return (chain_order[line[21]], resid(line[22:26]), line[26],
+                    line[16], serial(line[6:11]))
+    else:
+        def _key(line):
+            return (chain_order[line[21]], line[16], serial(line[6:11]))
+
+    return _key
+
+
+def _sort_table(lines, sorting_keys, chain_order):
     """
-    # Sort keys
-    chain_key = lambda x: x[21]  # chain id
-    resid_key = lambda x: (int(x[22:26]), x[26])  # resid, icode
-    atoms_key = lambda x: int(x[6:11])  # atom serial
-    altloc_key = lambda x: x[16]
-    icode_key = lambda x: x[26]
+    Sorts ATOM/HETATM lines by keys computed column-wise, with an AtomTable.
 
-    # ignored fields
-    ignored = (('END', 'MASTER', 'TER'))
+    The lines are sorted in the same order as with the keys of `_make_key`.
+    """
+    table = AtomTable.from_lines(lines, records=('ATOM', 'HETATM'))
+    chains = table.column('chain')
+    if 'C' not in sorting_keys:
+        chains = [chain_order[chain] for chain in chains]
 
-    # First, separate records
-    header_data = []
+    columns = [chains]
+    if 'R' in sorting_keys:
+        columns += [table.column('resseq'), table.column('icode')]
+    columns += [table.column('altloc'), table.column('serial')]
+
+    keys = list(zip(*columns))
+    return [lines[i] for i in sorted(range(len(lines)), key=keys.__getitem__)]
+
+
+def _sort_in_memory(lines, sorting_keys, chain_order):
+    """
+    Sorts the atoms of one model in memory.
+
+    Returns a list with the ATOM records, intercalated with their ANISOU
+    records, followed by the HETATM records.
+    """
     atomic_data = []
     hetatm_data = []
     anisou_data = {}  # Matches a unique atom uid
-    conect_data = []
-    chains_list = []  # list of chain identifiers in order they were read
-    for line in fhandle:
+    for line in lines:
         if line.startswith('ATOM'):
             atomic_data.append(line)
-            chains_list.append(line[21])
         elif line.startswith('HETATM'):
             hetatm_data.append(line)
-            chains_list.append(line[21])
-        elif line.startswith('ANISOU'):
+        else:  # ANISOU
             atom_uid = line[12:27]  # aname, chain, resid, resname, & alt/icode
             anisou_data[atom_uid] = line
-        elif line.startswith('CONECT'):
-            conect_data.append(line)
-        elif line.startswith(ignored):
-            continue
-        elif line.startswith(('MODEL', 'ENDMDL')):
-            emsg = 'ERROR!! Sorting does not support multi-model files\n'
-            sys.stderr.write(emsg)
-            sys.stderr.write(__doc__)
-            sys.exit(1)
-        elif line.strip():  # remove empty lines
-            header_data.append(line)
-
-    # Map original chain orders to integers
-    # To circumvent mixed chains when sorting by residue number
-    chain_order = {}
-    ordinal = 0
-    for chain in chains_list:
-        if chain not in chain_order:
-            chain_order[chain] = ordinal
-            ordinal += 1
-    del chains_list
-
-    # Always sort by altloc
-    atomic_data.sort(key=atoms_key)
-    atomic_data.sort(key=altloc_key)
-    hetatm_data.sort(key=atoms_key)
-    hetatm_data.sort(key=altloc_key)
 
-    if 'R' in sorting_keys:
-        atomic_data.sort(key=icode_key)
-        atomic_data.sort(key=resid_key)
-        hetatm_data.sort(key=icode_key)
-        hetatm_data.sort(key=resid_key)
-
-    if 'C' in sorting_keys:
-        atomic_data.sort(key=chain_key)
-        hetatm_data.sort(key=chain_key)
-    else:  # restore original order
-        chain_key = lambda x: chain_order.get(x[21])
-        atomic_data.sort(key=chain_key)
-        hetatm_data.sort(key=chain_key)
+    atomic_data = _sort_table(atomic_data, sorting_keys, chain_order)
+    hetatm_data = _sort_table(hetatm_data, sorting_keys, chain_order)
 
-    # Sort conect statements by the central atom
-    # Share the same format at ATOM serial number
-    conect_data.sort(key=atoms_key)
+    if not anisou_data:
+        return atomic_data + hetatm_data
+
+    sorted_data = []
+    for line in atomic_data + hetatm_data:
+        sorted_data.append(line)
+        anisou_record = anisou_data.get(line[12:27])
+        if anisou_record:
+            sorted_data.append(anisou_record)
+    return sorted_data
 
-    # Now return everything in order:
-    #  - ATOMs intercalated with ANISOU
-    #  - HETATM
-    #  - CONECT
-    sorted_data = header_data + atomic_data + hetatm_data + conect_data
-    for line in sorted_data:
 
+def _read_chunk(fhandle):
+    """Yields the records of a sorted chunk, with ANISOU lines attached."""
+    for line in fhandle:
+        if line[1] == '1':  # atom has an ANISOU record
+            line += next(fhandle)
         yield line
 
-        atom_uid = line[12:27]
-        anisou_record = anisou_data.get(atom_uid)
-        if anisou_record:
-            yield anisou_record
+
+def _merge_chunks(chunk_files, chunk, key, anisou_data):
+    """
+    Merges sorted chunks and removes their tags. Closes the files.
+
+    Atoms without an attached ANISOU line are followed by the one with the
+    same atom uid in `anisou_data`, if any.
+    """
+    try:
+        chunks = [_read_chunk(tmp) for tmp in chunk_files] + [chunk]
+        for record in heapq.merge(*chunks, key=key):
+            if record[1] == '1':  # split ATOM/HETATM and ANISOU
+                eol = record.index('\n') + 1
+                yield record[2:eol]
+                yield record[eol:]
+            else:
+                yield record[2:]
+                if anisou_data:
+                    anisou_record = anisou_data.get(record[14:29])
+                    if anisou_record:
+                        yield anisou_record
+    finally:
+        for tmp in chunk_files:
+            tmp.close()
+
+
+def _sort_external(lines, key, max_lines):
+    """
+    Sorts the atoms of one model using temporary files.
+
+    Lines are read in chunks of `max_lines` records, sorted, and written to
+    temporary files, which are merged when the output is read. Each record
+    is tagged with its group (0: ATOM, 1: HETATM) and whether it carries an
+    ANISOU line, which is kept attached to its atom throughout. ANISOU lines
+    that do not follow their atom are kept in memory, and matched to their
+    atom by its uid when merging, as in `_sort_in_memory`.
+    """
+    def _tagged_key(record):
+        return (record[0], key(record[2:]))
+
+    chunk = []
+    chunk_files = []
+    anisou_data = {}  # ANISOU lines not next to their atom, by atom uid
+    for line in lines:
+        if line.startswith('ANISOU'):
+            # Attach to the atom it follows, if it matches.
+            last = chunk[-1] if chunk else ''
+            if last[1:2] == '0' and last[14:29] == line[12:27]:
+                chunk[-1] = last[0] + '1' + last[2:] + line
+            else:
+                anisou_data[line[12:27]] = line
+            continue
+
+        if len(chunk) == max_lines:
+            chunk.sort(key=_tagged_key)
+            tmp = tempfile.TemporaryFile(mode='w+')
+            tmp.writelines(chunk)
+            tmp.seek(0)
+            chunk_files.append(tmp)
+            chunk = []
+
+        if line.startswith('ATOM'):
+            chunk.append('00' + line)
+        else:
+            chunk.append('10' + line)
+
+    chunk.sort(key=_tagged_key)
+    return _merge_chunks(chunk_files, chunk, _tagged_key, anisou_data)
+
+
+def run(fhandle, sorting_keys, max_lines=None):
+    """
+    Sort the contents of the PDB file.
+
+    Models are sorted one at a time, and each is yielded as soon as it has
+    been read and sorted.
+
+    This function is a generator.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    sorting_keys : str, list, or tuple
+        'C' to sort by chain, 'R' to sort by residue number, or both.
+
+    max_lines : int, optional
+        Maximum number of lines to sort in memory. If given, each model
+        is sorted in chunks of this size, saved to temporary files, and
+        merged. By default, each model is sorted in memory.
+
+    Yields
+    ------
+    str (line-by-line)
+        The sorted PDB lines.
+    """
+    # ignored fields
+    ignored = (('END', 'MASTER', 'TER'))
+    records = ('ATOM', 'HETATM', 'ANISOU')
+
+    header_data = []
+    conect_data = []
+    chain_order = {}  # chain identifiers in the order they were read
+    model_lines = {}  # MODEL and ENDMDL lines of the current model
+
+    key = _make_key(sorting_keys, chain_order)
+
+    def _read_model(fhandle):
+        """Yields the coordinate lines of the model, up to ENDMDL."""
+        for line in fhandle:
+            if line.startswith(records):
+                chain_order.setdefault(line[21], len(chain_order))
+                yield line
+            elif line.startswith('CONECT'):
+                conect_data.append(line)
+            elif line.startswith('MODEL'):
+                if 'MODEL' in model_lines:  # would merge the two models
+                    emsg = 'ERROR!! MODEL record found before ENDMDL: \'{}\'\n'
+                    sys.stderr.write(emsg.format(line.rstrip()))
+                    sys.exit(1)
+                model_lines['MODEL'] = line
+            elif line.startswith('ENDMDL'):
+                model_lines['ENDMDL'] = line
+                return
+            elif line.startswith(ignored):
+                continue
+            elif line.strip():  # remove empty lines
+                header_data.append(line)
+
+    fhandle = iter(fhandle)
+    while True:
+        model_lines.clear()
+        if max_lines is None:
+            sorted_data = _sort_in_memory(_read_model(fhandle), sorting_keys,
+                                          chain_order)
+        else:
+            sorted_data = _sort_external(_read_model(fhandle), key, max_lines)
+
+        # Headers go first, or in place if between models.
+        for line in header_data:
+            yield line
+        del header_data[:]
+
+        if 'MODEL' in model_lines:
+            yield model_lines['MODEL']
+
+        for line in sorted_data:
+            yield line
+
+        if 'ENDMDL' not in model_lines:
+            break  # end of file
+        yield model_lines['ENDMDL']
+
+    # Sort conect statements by the central atom
+    # Share the same format at ATOM serial number
+    conect_data.sort(key=lambda x: _hybrid36.decode_serial(x[6:11]))
+    for line in conect_data:
+        yield line
 
 
 sort_file = run
@@ -234,10 +417,10 @@ sort_file = run
 
 def main():
     # Check Input
-    pdbfh, chain = check_input(sys.argv[1:])
+    pdbfh, sorting_keys, max_lines = check_input(sys.argv[1:])
 
     # Do the job
-    new_pdb = sort_file(pdbfh, chain)
+    new_pdb = sort_file(pdbfh, sorting_keys, max_lines)
 
     try:
         _buffer = []
@@ -18,6 +18,9 @@
 """
 Splits a PDB file into several, each containing one chain.
 
+If the input file is compressed (e.g. 1CTF.pdb.gz), the output files are
+compressed in the same format.
+
 Usage:
     python pdb_splitchain.py <pdb file>
 
@@ -34,6 +37,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
@@ -61,7 +66,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -86,13 +91,18 @@ def run(fhandle, outname=None):
     outname : str
         The base name of the output files. If None is given, tries to
         extract a name from the `.name` attribute of `fhandler`. If
-        `fhandler` has no attribute name, assigns `splitchains`.
+        `fhandler` has no attribute name, assigns `splitchains`. If the name
+        of `fhandler` ends in .gz, .bz2, .xz, or .zst, the output files
+        are compressed in the same format.
     """
     _defname = 'splitchains'
+    outext = '.pdb'
     if outname is None:
         try:
-            fn = fhandle.name
+            # Compressed input gives compressed output, e.g. 1abc.pdb.gz
+            fn, compression = _stream.split_compression_ext(fhandle.name)
             outname = fn[:-4] if fn != '<stdin>' else _defname
+            outext += compression
         except AttributeError:
             outname = _defname
 
@@ -113,7 +123,7 @@ def run(fhandle, outname=None):
 
     for chain_id in sorted(chain_data.keys()):
         lines = chain_data[chain_id]
-        with open(basename + '_' + chain_id + '.pdb', 'w') as fh:
+        with _stream.open_output(basename + '_' + chain_id + outext) as fh:
             fh.write(''.join(lines))
 
 
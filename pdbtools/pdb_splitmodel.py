@@ -18,6 +18,9 @@
 """
 Splits a PDB file into several, each containing one MODEL.
 
+If the input file is compressed (e.g. 1CTF.pdb.gz), the output files are
+compressed in the same format.
+
 Usage:
     python pdb_splitmodel.py <pdb file>
 
@@ -34,6 +37,8 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _stream
+
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
@@ -61,7 +66,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -86,13 +91,18 @@ def run(fhandle, outname=None):
     outname : str
         The base name of the output files. If None is given, tries to
         extract a name from the `.name` attribute of `fhandler`. If
-        `fhandler` has no attribute name, assigns `splitmodels`.
+        `fhandler` has no attribute name, assigns `splitmodels`. If the name
+        of `fhandler` ends in .gz, .bz2, .xz, or .zst, the output files
+        are compressed in the same format.
     """
     _defname = 'splitmodels'
+    outext = '.pdb'
     if outname is None:
         try:
-            fn = fhandle.name
+            # Compressed input gives compressed output, e.g. 1abc.pdb.gz
+            fn, compression = _stream.split_compression_ext(fhandle.name)
             outname = fn[:-4] if fn != '<stdin>' else _defname
+            outext += compression
         except AttributeError:
             outname = _defname
 
@@ -103,7 +113,7 @@ def run(fhandle, outname=None):
     for line in fhandle:
         if line.startswith('MODEL'):
             model_no = line[10:14].strip()
-            fh = open(basename + '_' + model_no + '.pdb', 'w')
+            fh = _stream.open_output(basename + '_' + model_no + outext)
             model_lines = []
 
         elif line.startswith('ENDMDL'):
@@ -25,6 +25,7 @@ This includes:
     - Adding TER statements after chain breaks/changes
     - Truncating/Padding all lines to 80 characters
     - Adds END statement at the end of the file
+    - Writing atom serials above 99999 in hybrid-36 notation (A0000, ...)
 
 Will remove all original TER/END statements from the file.
 
@@ -45,6 +46,9 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _hybrid36
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -80,7 +84,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -97,7 +101,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -125,13 +129,27 @@ def run(fhandle, strict=False):
         The modified (or not) PDB line.
     """
     not_strict = not strict
+    _decode = _hybrid36.decode_serial
+    _encode = _hybrid36.encode_serial
+    _decode_resid = _hybrid36.decode_resid
+
+    def fmt_serial(serial):
+        """Writes an atom serial number in hybrid-36 notation, if needed.
+        """
+        try:
+            return _encode(serial)
+        except ValueError:
+            emsg = 'ERROR!! Structure contains more than {} atoms.\n'
+            sys.stderr.write(emsg.format(_hybrid36.MAX_SERIAL))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
 
     def make_TER(prev_line):
         """Creates a TER statement based on the last ATOM/HETATM line.
         """
 
         # Add last TER statement
-        serial = int(prev_line[6:11]) + 1
+        serial = fmt_serial(_decode(prev_line[6:11]) + 1)
         rname = prev_line[17:20]
         chain = prev_line[21]
         resid = prev_line[22:26]
@@ -140,7 +158,7 @@ def run(fhandle, strict=False):
         return fmt_TER.format(serial, rname, chain, resid, icode)
 
     # TER     606      LEU A  75
-    fmt_TER = "TER   {:>5d}      {:3s} {:1s}{:>4s}{:1s}" + " " * 53 + "\n"
+    fmt_TER = "TER   {:>5s}      {:3s} {:1s}{:>4s}{:1s}" + " " * 53 + "\n"
 
     records = ('ATOM', 'HETATM')
     ignored = ('TER', 'END', 'CONECT', 'MASTER', 'ENDMDL')
@@ -183,13 +201,14 @@ def run(fhandle, strict=False):
         #   - no TER in HETATM
         if line.startswith('ATOM'):
 
-            is_gap = (int(line[22:26]) - int(prev_line[22:26])) > 1
+            resid = _decode_resid(line[22:26])
+            is_gap = (resid - _decode_resid(prev_line[22:26])) > 1
             if atom_section and (line[21] != prev_line[21] or (not_strict and is_gap)):
                 serial_offset += 1  # account for TER statement
                 yield make_TER(prev_line)
 
-            serial = int(line[6:11]) + serial_offset
-            line = line[:6] + str(serial).rjust(5) + line[11:]
+            serial = _decode(line[6:11]) + serial_offset
+            line = line[:6] + fmt_serial(serial) + line[11:]
             prev_line = line
             atom_section = True
 
@@ -199,15 +218,14 @@ def run(fhandle, strict=False):
                 serial_offset += 1  # account for TER statement
                 yield make_TER(prev_line)
 
-            serial = int(line[6:11]) + serial_offset
-            line = line[:6] + str(serial).rjust(5) + line[11:]
+            serial = _decode(line[6:11]) + serial_offset
+            line = line[:6] + fmt_serial(serial) + line[11:]
             prev_line = line
 
         elif line.startswith('ANISOU'):
             # Fix serial based on previous atom
             # Avoids doing the offset again
-            serial = int(prev_line[6:11])
-            line = line[:6] + str(serial).rjust(5) + line[11:]
+            line = line[:6] + prev_line[6:11] + line[11:]
 
         else:
             if atom_section:
@@ -223,13 +241,6 @@ def run(fhandle, strict=False):
                 in_model = True
                 serial_offset = 0
 
-
-        if serial > 99999:
-            emsg = 'ERROR!! Structure contains more than 99.999 atoms.\n'
-            sys.stderr.write(emsg)
-            sys.stderr.write(__doc__)
-            sys.exit(1)
-
         # Check line length
         line = "{:<80}\n".format(line)
 
@@ -20,11 +20,24 @@ Rudimentarily converts the PDB file to mmCIF format.
 
 Will convert only the coordinate section.
 
+The -outdir option converts several files, or all PDB files (.pdb, .ent) in
+directories, and writes the results to a directory. Files are converted in
+parallel with -nproc (by default, one process per CPU). Files already
+converted, i.e. with an output file newer than the input file, are skipped.
+Progress is written to stderr.
+
+The -bcif option writes BinaryCIF, a compressed binary version of mmCIF,
+instead of text mmCIF.
+
 Usage:
-    python pdb_tocif.py <pdb file>
+    python pdb_tocif.py [-bcif] <pdb file>
+    python pdb_tocif.py [-bcif] [-nproc[:<number>]] -outdir:<directory>
+        <pdb file or directory> [...]
 
 Example:
     python pdb_tocif.py 1CTF.pdb
+    python pdb_tocif.py -bcif 1CTF.pdb > 1CTF.bcif
+    python pdb_tocif.py -nproc:4 -outdir:mmCIF/ pdb/  # whole directory
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -36,10 +49,19 @@ effort to maintain and compile. RIP.
 import os
 import sys
 
+from pdbtools import _batch
+from pdbtools import _bcif
+from pdbtools import _hybrid36
+from pdbtools import _records
+from pdbtools import _stream
+
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+# Extensions of the files to convert in directories (-outdir).
+EXTENSIONS = ('.pdb', '.ent')
+
 
 def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
@@ -47,6 +69,37 @@ def check_input(args):
 
     # Defaults
     fh = sys.stdin  # file handle
+    binary = False
+    nproc = None
+    outdir = None
+
+    while args and args[0].partition(':')[0] in ('-bcif', '-nproc', '-outdir'):
+        option = args[0]
+        args = args[1:]
+        if option == '-bcif':
+            binary = True
+        elif option.startswith('-outdir'):
+            outdir = _batch.parse_outdir(option)
+        else:
+            nproc = _batch.parse_nproc(option)
+
+    if nproc is not None and outdir is None:
+        emsg = 'ERROR!! The -nproc option requires -outdir\n'
+        sys.stderr.write(emsg)
+        sys.stderr.write(__doc__)
+        sys.exit(1)
+
+    elif outdir is not None:
+        if not args:
+            emsg = 'ERROR!! You must provide files or directories to convert\n'
+            sys.stderr.write(emsg)
+            sys.stderr.write(__doc__)
+            sys.exit(1)
+
+        # Batch mode: list of (input, output) paths instead of a file handle
+        new_ext = '.bcif' if binary else '.cif'
+        jobs = _batch.list_jobs(args, outdir, EXTENSIONS, new_ext)
+        return (jobs, nproc or 1, binary)
 
     if not len(args):
         # Reading from pipe with default option
@@ -61,7 +114,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
@@ -69,19 +122,128 @@ def check_input(args):
         sys.stderr.write(__doc__)
         sys.exit(1)
 
-    return fh
+    # nproc is only used with -outdir, and is None here
+    return (fh, nproc, binary)
+
+
+def _block_name(fhandle, outname=None):
+    """Returns the name of the data block, from `outname` or the file name."""
+    _defname = 'cell'
+    if outname is None:
+        try:
+            fn, _ = _stream.split_compression_ext(fhandle.name)
+            outname = fn[:-4] if fn != '<stdin>' else _defname
+        except AttributeError:
+            outname = _defname
+
+    return os.path.basename(outname)
+
+
+def _pdb_charge(charge):
+    """Converts a PDB charge (e.g. 1-) to an integer, or None if blank."""
+    charge = charge.strip()
+    if len(charge) == 2 and charge[0].isdigit() and charge[1] in '+-':
+        return int(charge[0]) if charge[1] == '+' else -int(charge[0])
+    return None
+
+
+def to_bcif(fhandle, outname=None):
+    """
+    Convert a structure in PDB format to BinaryCIF format.
+
+    Parameters
+    ----------
+    fhandle : an iterable giving the PDB file line-by-line.
+
+    outname : str
+        The name of the data block, as in `run`.
+
+    Returns
+    -------
+    bytes
+        The _atom_site category, in BinaryCIF format.
+    """
+    _decode_resid = _hybrid36.decode_resid
+    _charge = _pdb_charge
+
+    groups, serials, elements, atnames, altlocs = [], [], [], [], []
+    resnames, chainids, resnums, icodes, charges, models = [], [], [], [], [], []
+    xs, ys, zs, occs, bfacs = [], [], [], [], []
 
+    model_no = 1
+    serial = 0
 
-def pad_line(line):
-    """Helper function to pad line to 80 characters in case it is shorter"""
-    size_of_line = len(line)
-    if size_of_line < 80:
-        padding = 80 - size_of_line + 1
-        line = line.strip('\n') + ' ' * padding + '\n'
-    return line[:81]  # 80 + newline character
+    records = (('ATOM', 'HETATM'))
+    for line in fhandle:
+        if line.startswith(records):
+            serial += 1
+            groups.append(line[0:6].strip())
+            serials.append(serial)
+            elements.append(line[76:78].strip())
+            atnames.append(line[12:16].strip())
+            altlocs.append(line[16].strip())
+            resnames.append(line[17:20].strip())
+            chainids.append(line[21].strip())
+            resnums.append(_decode_resid(line[22:26]))
+            icodes.append(line[26].strip())
+            xs.append(float(line[30:38]))
+            ys.append(float(line[38:46]))
+            zs.append(float(line[46:54]))
+            occs.append(float(line[54:60]))
+            bfacs.append(float(line[60:66]))
+            charges.append(_charge(line[78:80]))
+            models.append(model_no)
 
+        elif line.startswith('ENDMDL'):
+            model_no += 1
 
-def run(fhandle, outname=None):
+    def mask(values):
+        """Flags blank values as unknown ('?')."""
+        return [_bcif.UNKNOWN if not v else _bcif.PRESENT for v in values]
+
+    def strings(name, values):
+        """String column, with blank values flagged as unknown."""
+        return _bcif.column(name, _bcif.encode_strings(values), mask(values))
+
+    charge_mask = [_bcif.UNKNOWN if c is None else _bcif.PRESENT
+                   for c in charges]
+    charges = [c or 0 for c in charges]
+
+    resnums = _bcif.encode_ints(resnums, use_delta=True)
+    resnames = strings('label_comp_id', resnames)
+    chainids = strings('label_asym_id', chainids)
+    atnames = strings('label_atom_id', atnames)
+
+    columns = [
+        strings('group_PDB', groups),
+        _bcif.column('id', _bcif.encode_ints(serials, use_delta=True)),
+        strings('type_symbol', elements),
+        atnames,
+        strings('label_alt_id', altlocs),
+        resnames,
+        chainids,
+        strings('label_entity_id', [''] * serial),
+        _bcif.column('label_seq_id', resnums),
+        strings('pdbx_PDB_ins_code', icodes),
+        _bcif.column('Cartn_x', _bcif.encode_floats(xs, 1000, True)),
+        _bcif.column('Cartn_y', _bcif.encode_floats(ys, 1000, True)),
+        _bcif.column('Cartn_z', _bcif.encode_floats(zs, 1000, True)),
+        _bcif.column('occupancy', _bcif.encode_floats(occs, 100)),
+        _bcif.column('B_iso_or_equiv', _bcif.encode_floats(bfacs, 100, True)),
+        _bcif.column('pdbx_formal_charge', _bcif.encode_ints(charges),
+                     charge_mask),
+        _bcif.column('auth_seq_id', resnums),
+        dict(resnames, name='auth_comp_id'),
+        dict(chainids, name='auth_asym_id'),
+        dict(atnames, name='auth_atom_id'),
+        _bcif.column('pdbx_PDB_model_num', _bcif.encode_ints(models)),
+    ]
+
+    return _bcif.write_file(_block_name(fhandle, outname),
+                            [('_atom_site', serial, columns)])
+
+
+def run(fhandle, outname=None, binary=False):
     """
     Convert a structure in PDB format to mmCIF format.
 
@@ -96,33 +258,26 @@ def run(fhandle, outname=None):
         extract a name from the `.name` attribute of `fhandler`. If
         `fhandler` has no attribute name, assigns `cell`.
 
+    binary : bool
+        Write BinaryCIF instead of text mmCIF (see `to_bcif`).
+
     Yields
     ------
     str (line-by-line)
-        The structure in mmCIF format.
+        The structure in mmCIF format, or a single `bytes` object with the
+        whole structure in BinaryCIF format if `binary` is True.
     """
-    _pad_line = pad_line
+    if binary:
+        yield to_bcif(fhandle, outname)
+        return
 
-    # The spacing here is just aesthetic purposes when printing the file
-    _a = '{:<6s} {:5d} {:2s} {:6s} {:1s} {:3s} {:3s} {:1s} {:5s} {:1s} '
-    _a += '{:10.3f} {:10.3f} {:10.3f} {:10.3f} {:10.3f} {:1s} '
-    _a += '{:5s} {:3s} {:1s} {:4s} {:1d}\n'
+    _write = _records.CIFAtomWriter().write
 
     yield '# Converted to mmCIF by pdb-tools\n'
     yield '#\n'
 
     # Headers
-    _defname = 'cell'
-    if outname is None:
-        try:
-            fn = fhandle.name
-            outname = fn[:-4] if fn != '<stdin>' else _defname
-        except AttributeError:
-            outname = _defname
-
-    fname_root = os.path.basename(outname)
-
-    yield 'data_{}\n'.format(fname_root)
+    yield 'data_{}\n'.format(_block_name(fhandle, outname))
 
     yield '#\n'
     yield 'loop_\n'
@@ -155,49 +310,8 @@ def run(fhandle, outname=None):
     records = (('ATOM', 'HETATM'))
     for line in fhandle:
         if line.startswith(records):
-            line = _pad_line(line)
-
-            record = line[0:6].strip()
             serial += 1
-
-            element = line[76:78].strip()
-            if not element:
-                element = '?'
-
-            atname = line[12:16].strip()
-            atname = atname.replace('"', "'")
-            if "'" in atname:
-                atname = '"{}"'.format(atname)
-
-            altloc = line[16]
-            if altloc == ' ':
-                altloc = '?'
-
-            resname = line[17:20]
-            chainid = line[21]
-            if chainid == ' ':
-                chainid = '?'
-
-            resnum = line[22:26].strip()
-            icode = line[26]
-            if icode == ' ':
-                icode = '?'
-
-            x = float(line[30:38])
-            y = float(line[38:46])
-            z = float(line[46:54])
-
-            occ = float(line[54:60])
-            bfac = float(line[60:66])
-
-            charge = line[78:80].strip()
-            if charge == '':
-                charge = '?'
-
-            yield _a.format(record, serial, element, atname, altloc,
-                            resname, chainid, '?', resnum, icode, x, y, z, occ,
-                            bfac, charge, resnum, resname, chainid, atname,
-                            model_no)
+            yield _write(line, serial, model_no)
 
         elif line.startswith('ENDMDL'):
             model_no += 1
@@ -212,22 +326,33 @@ convert_to_mmcif = run
 
 def main():
     # Check Input
-    pdbfh = check_input(sys.argv[1:])
+    pdbfh, nproc, binary = check_input(sys.argv[1:])
+
+    # Convert files to a directory (-outdir)
+    if isinstance(pdbfh, list):
+        counts = _batch.run('pdb_tocif', pdbfh, (None, binary), nproc,
+                            progress=sys.stderr)
+        sys.exit(1 if counts['failed'] else 0)
 
     # Do the job
-    new_cif = run(pdbfh)
+    new_cif = run(pdbfh, binary=binary)
+
+    # BinaryCIF is written as bytes
+    outstream, empty = sys.stdout, ''
+    if binary:
+        outstream, empty = getattr(sys.stdout, 'buffer', sys.stdout), b''
 
     try:
         _buffer = []
         _buffer_size = 5000  # write N lines at a time
         for lineno, line in enumerate(new_cif):
             if not (lineno % _buffer_size):
-                sys.stdout.write(''.join(_buffer))
+                outstream.write(empty.join(_buffer))
                 _buffer = []
             _buffer.append(line)
 
-        sys.stdout.write(''.join(_buffer))
-        sys.stdout.flush()
+        outstream.write(empty.join(_buffer))
+        outstream.flush()
     except IOError:
         # This is here to catch Broken Pipes
         # for example to use 'head' or 'tail' without
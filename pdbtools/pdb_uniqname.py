@@ -37,6 +37,8 @@ import collections
 import os
 import sys
 
+from pdbtools import _stream
+
 __author__ = ["Joao Rodrigues"]
 __email__ = ["j.p.g.l.m.rodrigues@gmail.com"]
 
@@ -62,7 +64,7 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-        fh = open(args[0], 'r')
+        fh = _stream.open_file(args[0])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -20,11 +20,27 @@ Validates the PDB file ATOM/HETATM lines according to the format specifications.
 
 Does not catch all the errors though... people are creative!
 
+The -report option writes a machine-readable report instead of the list of
+errors: a JSON object with the number of errors of each kind and the line
+numbers of all errors, or a table (TSV) with the number of errors of each kind.
+
+Several files, or directories with PDB files (.pdb, .ent), can be validated at
+once, in several processes with the -nproc option (by default, one per CPU).
+For each file, a status line (OK, INVALID, or ERROR if the file cannot be read)
+with the time taken is written before its errors. The -summary option writes
+only the status lines. The -firsterror option stops validating each file at
+its first error. A summary of all files is written to stderr, and the exit code
+is 1 if any file is not valid.
+
 Usage:
-    python pdb_validate.py <pdb file>
+    python pdb_validate.py [-report:<json|tsv>] [-firsterror] <pdb file>
+    python pdb_validate.py [-report:<json|tsv>] [-firsterror] [-summary]
+        [-nproc[:<number>]] <pdb file or directory> [...]
 
 Example:
     python pdb_validate.py 1CTF.pdb
+    python pdb_validate.py -report:json 1CTF.pdb
+    python pdb_validate.py -summary -nproc:8 uploads/
 
 This program is part of the `pdb-tools` suite of utilities and should not be
 distributed isolatedly. The `pdb-tools` were created to quickly manipulate PDB
@@ -33,13 +49,91 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
+from collections import OrderedDict
+from functools import partial
+import json
 import os
 import re
 import sys
+import time
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # Python 2
+    ProcessPoolExecutor = None
+
+from pdbtools import _batch
+from pdbtools import _stream
 
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
+REPORT_FORMATS = ('json', 'tsv')
+EXTENSIONS = ('.pdb', '.ent')  # searched for in directories
+
+# Fields of ATOM/HETATM lines: (name, columns, pattern). A field is valid if
+# its first characters match the pattern.
+FIELDS = (
+    ('Atm. Num.', slice(6, 11), r'[\d\s]+'),
+    ('Alt. Loc.', slice(11, 12), r'\s'),
+    ('Atm. Nam.', slice(12, 16), r'\s*[A-Z0-9]+\s*'),
+    ('Spacer #1', slice(16, 17), r'[A-Z0-9 ]{1}'),
+    ('Res. Nam.', slice(17, 20), r'\s*[A-Z0-9]+\s*'),
+    ('Spacer #2', slice(20, 21), r'\s'),
+    ('Chain Id.', slice(21, 22), r'[A-Za-z0-9 ]{1}'),
+    ('Res. Num.', slice(22, 26), r'\s*[\d\-]+\s*'),
+    ('Ins. Code', slice(26, 27), r'[A-Z0-9 ]{1}'),
+    ('Spacer #3', slice(27, 30), r'\s+'),
+    ('Coordn. X', slice(30, 38), r'\s*[\d\.\-]+\s*'),
+    ('Coordn. Y', slice(38, 46), r'\s*[\d\.\-]+\s*'),
+    ('Coordn. Z', slice(46, 54), r'\s*[\d\.\-]+\s*'),
+    ('Occupancy', slice(54, 60), r'\s*[\d\.\-]+\s*'),
+    ('Tmp. Fac.', slice(60, 66), r'\s*[\d\.\-]+\s*'),
+    ('Spacer #4', slice(66, 72), r'\s+'),
+    ('Segm. Id.', slice(72, 76), r'[\sA-Z0-9\-\+]+'),
+    ('At. Elemt', slice(76, 78), r'[\sA-Z0-9\-\+]+'),
+    ('At. Charg', slice(78, 80), r'[\sA-Z0-9\-\+]+'),
+)
+
+SHORT_LINE = 'Short line'
+LONG_LINE = 'Long line'
+ERROR_CLASSES = (SHORT_LINE, LONG_LINE) + tuple(f[0] for f in FIELDS)
+
+# Valid ATOM/HETATM lines, checked in one go. Equivalent to checking the
+# length of the line and each field in FIELDS: since the field patterns only
+# need to match the start of the field, it is enough to check the first
+# non-blank character of the field (in a lookahead that does not go past the
+# end of the field).
+_VALID_ATOM = re.compile(
+    r'(?:ATOM  |HETATM)'
+    r'[\d\s].{4}'  # Atm. Num.
+    r'\s'  # Alt. Loc.
+    r'(?=\s{0,3}[A-Z0-9]).{4}'  # Atm. Nam.
+    r'[A-Z0-9 ]'  # Spacer #1
+    r'(?=\s{0,2}[A-Z0-9]).{3}'  # Res. Nam.
+    r'\s'  # Spacer #2
+    r'[A-Za-z0-9 ]'  # Chain Id.
+    r'(?=\s{0,3}[\d\-]).{4}'  # Res. Num.
+    r'[A-Z0-9 ]'  # Ins. Code
+    r'\s.{2}'  # Spacer #3
+    r'(?=\s{0,7}[\d\.\-]).{8}'  # Coordn. X
+    r'(?=\s{0,7}[\d\.\-]).{8}'  # Coordn. Y
+    r'(?=\s{0,7}[\d\.\-]).{8}'  # Coordn. Z
+    r'(?=\s{0,5}[\d\.\-]).{6}'  # Occupancy
+    r'(?=\s{0,5}[\d\.\-]).{6}'  # Tmp. Fac.
+    r'\s.{5}'  # Spacer #4
+    r'[\sA-Z0-9\-\+].{3}'  # Segm. Id.
+    r'[\sA-Z0-9\-\+].'  # At. Elemt
+    r'[\sA-Z0-9\-\+].'  # At. Charg
+    r'\Z', re.DOTALL).match
+
+# (name, columns, compiled pattern, pointer to the columns)
+_FIELD_CHECKS = tuple(
+    (name, cols, re.compile(pattern).match,
+     ' ' * cols.start + '^' * (cols.stop - cols.start) + ' ' * (80 - cols.stop))
+    for name, cols, pattern in FIELDS
+)
+
 
 def check_input(args):
     """Checks whether to read from stdin/file and validates user input/options.
@@ -47,6 +141,32 @@ def check_input(args):
 
     # Defaults
     fh = sys.stdin  # file handle
+    report = None
+    first_error = False
+    summary = False
+    nproc = 1
+
+    while args and args[0].startswith('-'):
+        option, args = args[0], args[1:]
+        name, _, value = option.partition(':')
+        if name == '-report':
+            report = value
+            if report not in REPORT_FORMATS:
+                emsg = 'ERROR!! Report format must be one of {}: \'{}\'\n'
+                sys.stderr.write(emsg.format(', '.join(REPORT_FORMATS),
+                                             report))
+                sys.exit(1)
+        elif option == '-firsterror':
+            first_error = True
+        elif option == '-summary':
+            summary = True
+        elif name == '-nproc':
+            nproc = _batch.parse_nproc(option)
+        else:
+            emsg = 'ERROR!! Invalid option: \'{}\'\n'
+            sys.stderr.write(emsg.format(option))
+            sys.stderr.write(__doc__)
+            sys.exit(1)
 
     if not len(args):
         # Reading from pipe with default option
@@ -54,25 +174,249 @@ def check_input(args):
             sys.stderr.write(__doc__)
             sys.exit(1)
 
-    elif len(args) == 1:
-        if not os.path.isfile(args[0]):
-            emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
-            sys.stderr.write(emsg.format(args[0]))
-            sys.stderr.write(__doc__)
-            sys.exit(1)
+    else:
+        for path in args:
+            if not os.path.exists(path):
+                emsg = 'ERROR!! File not found or not readable: \'{}\'\n'
+                sys.stderr.write(emsg.format(path))
+                sys.stderr.write(__doc__)
+                sys.exit(1)
+
+        if len(args) == 1 and os.path.isfile(args[0]) and not summary:
+            fh = _stream.open_file(args[0])
+        else:  # several files: list of paths
+            fh = [path for path, _ in _batch.find_inputs(args, EXTENSIONS)]
+
+    return (fh, report, first_error, summary, nproc)
+
+
+def _diagnose(line, iline):
+    """
+    Finds the errors of a line that is not valid.
+
+    Yields (error class, message) tuples: length errors, and the first
+    offending field of ATOM/HETATM lines.
+    """
+    linelen = len(line)
+    if linelen < 80:
+        emsg = '[!] Line {0} is short: {1} < 80\n'
+        yield SHORT_LINE, emsg.format(iline, linelen)
+    elif linelen > 80:
+        emsg = '[!] Line {0} is long: {1} > 80\n'
+        yield LONG_LINE, emsg.format(iline, linelen)
+
+    if line[0:6] in ('ATOM  ', 'HETATM'):
+        for fname, fcol, fcheck, pointer in _FIELD_CHECKS:
+            if not fcheck(line[fcol]):
+                emsg = '[!] Offending field ({0}) at line {1}\n'
+                emsg = emsg.format(fname, iline)
+                yield fname, emsg + repr(line) + '\n' + pointer + '\n'
+                break
+
+
+def find_errors(fhandle, first_error=False):
+    """
+    Compare each line with the format defined on the official PDB website.
+
+    ATOM/HETATM lines are checked with a single regular expression, and
+    only the lines that fail are checked field by field to find the error.
+    Other lines are only checked for their length.
+
+    This function is a generator.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    first_error : bool, optional
+        Stop reading the file at the first invalid line.
+
+    Yields
+    ------
+    tuple
+        The line number, error class (one of ERROR_CLASSES), and message
+        of each error.
+    """
+    _valid_atom = _VALID_ATOM
+    records = ('ATOM  ', 'HETATM')
+
+    for iline, line in enumerate(fhandle, start=1):
+        line = line.rstrip('\n').rstrip('\r')  # CR/LF
+        if not line:
+            continue
+
+        if line[0:6] in records:
+            if _valid_atom(line):
+                continue
+        elif len(line) == 80:
+            continue
+
+        for error_class, message in _diagnose(line, iline):
+            yield iline, error_class, message
+        if first_error:
+            return
+
+
+def validate(fhandle, first_error=False, messages=True):
+    """
+    Validates a file and returns the results.
+
+    Parameters
+    ----------
+    fhandle : a line-by-line iterator of the original PDB file.
+
+    first_error : bool, optional
+        Stop reading the file at the first invalid line.
+
+    messages : bool, optional
+        Keep the error messages. If False, messages are empty strings.
+
+    Returns
+    -------
+    dict
+        'file': the name of the file, 'errors': the (line number, error
+        class, message) of each error, 'failure': None, and 'seconds':
+        the time spent validating the file.
+    """
+    start = time.time()
+    errors = find_errors(fhandle, first_error)
+    if messages:
+        errors = list(errors)
+    else:
+        errors = [(iline, error_class, '') for iline, error_class, _ in errors]
 
-        fh = open(args[0], 'r')
+    return {
+        'file': getattr(fhandle, 'name', '<stdin>'),
+        'errors': errors,
+        'failure': None,
+        'seconds': time.time() - start,
+    }
 
-    else:  # Whatever ...
-        emsg = 'ERROR!! Script takes 1 argument, not \'{}\'\n'
-        sys.stderr.write(emsg.format(len(args)))
-        sys.stderr.write(__doc__)
-        sys.exit(1)
 
-    return fh
+def validate_file(path, first_error=False, messages=True):
+    """
+    Opens and validates a file. See `validate`.
 
+    Errors reading the file (e.g. a corrupt compressed file) are caught,
+    so that they do not stop the validation of other files, and returned
+    as the 'failure' message.
+    """
+    start = time.time()
+    try:
+        fhandle = _stream.open_file(path)
+        try:
+            result = validate(fhandle, first_error, messages)
+        finally:
+            fhandle.close()
+    except Exception as error:
+        failure = '{}: {}'.format(type(error).__name__, error)
+        result = {'errors': [], 'failure': failure}
+
+    result['file'] = path
+    result['seconds'] = time.time() - start
+    return result
+
+
+def validate_files(paths, first_error=False, messages=True, nproc=1):
+    """
+    Validates several files, in parallel if nproc is larger than one.
 
-def run(fhandle):
+    This function is a generator. Results (see `validate`) are yielded in
+    the same order as `paths`.
+    """
+    worker = partial(validate_file, first_error=first_error,
+                     messages=messages)
+
+    if nproc > 1 and len(paths) > 1 and ProcessPoolExecutor is not None:
+        nproc = min(nproc, len(paths))
+        chunksize = max(1, min(64, len(paths) // (nproc * 8)))
+        with ProcessPoolExecutor(nproc) as executor:
+            for result in executor.map(worker, paths, chunksize=chunksize):
+                yield result
+    else:
+        for path in paths:
+            yield worker(path)
+
+
+def _status(result):
+    """Returns the status of a validated file: OK, INVALID, or ERROR."""
+    if result['failure'] is not None:
+        return 'ERROR'
+    return 'INVALID' if result['errors'] else 'OK'
+
+
+def status_line(result):
+    """Returns the status line of a validated file, with the time taken."""
+    status = _status(result)
+    if status == 'ERROR':
+        detail = ': ' + result['failure']
+    elif status == 'INVALID':
+        detail = ': {} errors'.format(len(result['errors']))
+    else:
+        detail = ''
+    return '{:<7s} {:8.3f}s {}{}\n'.format(status, result['seconds'],
+                                           result['file'], detail)
+
+
+def make_report(result, fmt='json', header=True):
+    """
+    Summarizes the errors of a file in JSON or TSV format.
+
+    Parameters
+    ----------
+    result : dict
+        The results of `validate`.
+
+    fmt : str
+        'json' for a JSON object, with the number of errors of each class
+        and the errors themselves. 'tsv' for a row of tab-separated values,
+        with the number of errors of each class.
+
+    header : bool
+        Write the header of the TSV table before the row.
+
+    Returns
+    -------
+    str
+        The report, ending in a newline.
+    """
+    errors = result['errors']
+    counts = OrderedDict((error_class, 0) for error_class in ERROR_CLASSES)
+    for error in errors:
+        counts[error[1]] += 1
+
+    if fmt == 'tsv':
+        row = [result['file'], _status(result),
+               '{:.3f}'.format(result['seconds']), str(len(errors))]
+        row += [str(count) for count in counts.values()]
+        row = '\t'.join(row) + '\n'
+        if header:
+            columns = ['file', 'status', 'seconds', 'errors']
+            return '\t'.join(columns + list(ERROR_CLASSES)) + '\n' + row
+        return row
+
+    report = OrderedDict((
+        ('file', result['file']),
+        ('status', _status(result)),
+        ('valid', not errors and result['failure'] is None),
+        ('seconds', round(result['seconds'], 3)),
+        ('errors', len(errors)),
+        ('counts', OrderedDict((k, v) for k, v in counts.items() if v)),
+        ('details', [OrderedDict((('line', error[0]), ('error', error[1])))
+                     for error in errors]),
+    ))
+    if result['failure'] is not None:
+        report['failure'] = result['failure']
+    return json.dumps(report) + '\n'
+
+
+_FOOTER = (
+    '\nTo understand your errors, read the format specification:\n'
+    '  http://www.wwpdb.org/documentation/file-format-content/format33/sect9.html#ATOM\n'
+)
+
+
+def run(fhandle, report=None, first_error=False, summary=False):
     """
     Compare each ATOM/HETATM line with the format defined on the
     official PDB website.
@@ -83,85 +427,42 @@ def run(fhandle):
     ----------
     fhandle : a line-by-line iterator of the original PDB file.
 
+    report : str, optional
+        Write a report in this format ('json' or 'tsv', see `make_report`)
+        instead of the list of errors.
+
+    first_error : bool, optional
+        Stop at the first invalid line.
+
+    summary : bool, optional
+        Write only the status line of the file (see `status_line`).
+
     Returns
     -------
     int
         1 if error was found. 0 if no errors were found.
     """
-    has_error = False
-    _fmt_check = (
-        ('Atm. Num.', (slice(6, 11), re.compile(r'[\d\s]+'))),
-        ('Alt. Loc.', (slice(11, 12), re.compile(r'\s'))),
-        ('Atm. Nam.', (slice(12, 16), re.compile(r'\s*[A-Z0-9]+\s*'))),
-        ('Spacer #1', (slice(16, 17), re.compile(r'[A-Z0-9 ]{1}'))),
-        ('Res. Nam.', (slice(17, 20), re.compile(r'\s*[A-Z0-9]+\s*'))),
-        ('Spacer #2', (slice(20, 21), re.compile(r'\s'))),
-        ('Chain Id.', (slice(21, 22), re.compile(r'[A-Za-z0-9 ]{1}'))),
-        ('Res. Num.', (slice(22, 26), re.compile(r'\s*[\d\-]+\s*'))),
-        ('Ins. Code', (slice(26, 27), re.compile(r'[A-Z0-9 ]{1}'))),
-        ('Spacer #3', (slice(27, 30), re.compile(r'\s+'))),
-        ('Coordn. X', (slice(30, 38), re.compile(r'\s*[\d\.\-]+\s*'))),
-        ('Coordn. Y', (slice(38, 46), re.compile(r'\s*[\d\.\-]+\s*'))),
-        ('Coordn. Z', (slice(46, 54), re.compile(r'\s*[\d\.\-]+\s*'))),
-        ('Occupancy', (slice(54, 60), re.compile(r'\s*[\d\.\-]+\s*'))),
-        ('Tmp. Fac.', (slice(60, 66), re.compile(r'\s*[\d\.\-]+\s*'))),
-        ('Spacer #4', (slice(66, 72), re.compile(r'\s+'))),
-        ('Segm. Id.', (slice(72, 76), re.compile(r'[\sA-Z0-9\-\+]+'))),
-        ('At. Elemt', (slice(76, 78), re.compile(r'[\sA-Z0-9\-\+]+'))),
-        ('At. Charg', (slice(78, 80), re.compile(r'[\sA-Z0-9\-\+]+'))),
-    )
-
-    def _make_pointer(column):
-        col_bg, col_en = column.start, column.stop
-        pt = ['^' if c in range(col_bg, col_en) else ' ' for c in range(80)]
-        return ''.join(pt)
-
-    for iline, line in enumerate(fhandle, start=1):
-        line = line.rstrip('\n').rstrip('\r')  # CR/LF
-        if not line:
-            continue
-
-        # Type check for ATOM/HETATM lines
-        if line[0:6] in ('ATOM  ', 'HETATM'):
-            linelen = len(line)
-            if linelen < 80:
-                emsg = '[!] Line {0} is short: {1} < 80\n'
-                sys.stdout.write(emsg.format(iline, linelen))
-                has_error = True
-
-            elif linelen > 80:
-                emsg = '[!] Line {0} is long: {1} > 80\n'
-                sys.stdout.write(emsg.format(iline, linelen))
-                has_error = True
-
-            for fname, (fcol, fcheck) in _fmt_check:
-                field = line[fcol]
-                if not fcheck.match(field):
-                    pointer = _make_pointer(fcol)
-                    emsg = '[!] Offending field ({0}) at line {1}\n'
-                    sys.stdout.write(emsg.format(fname, iline))
-
-                    sys.stdout.write(repr(line) + '\n')
-                    sys.stdout.write(pointer + '\n')
-
-                    has_error = True
-                    break
+    if report is not None or summary:
+        result = validate(fhandle, first_error, messages=False)
+        if summary:
+            sys.stdout.write(status_line(result))
         else:
-            # Do basic line length check
-            linelen = len(line)
-            if linelen < 80:
-                emsg = '[!] Line {0} is short: {1} < 80\n'
-                sys.stdout.write(emsg.format(iline, linelen))
-                has_error = True
-            elif linelen > 80:
-                emsg = '[!] Line {0} is long: {1} > 80\n'
-                sys.stdout.write(emsg.format(iline, linelen))
-                has_error = True
+            sys.stdout.write(make_report(result, report))
+        return 1 if result['errors'] else 0
+
+    has_error = False
+    _buffer = []
+    _buffer_size = 5000  # write N messages at a time
+    for _, _, message in find_errors(fhandle, first_error):
+        has_error = True
+        _buffer.append(message)
+        if len(_buffer) == _buffer_size:
+            sys.stdout.write(''.join(_buffer))
+            _buffer = []
+    sys.stdout.write(''.join(_buffer))
 
     if has_error:
-        msg = '\nTo understand your errors, read the format specification:\n'
-        msg += '  http://www.wwpdb.org/documentation/file-format-content/format33/sect9.html#ATOM\n'
-        sys.stdout.write(msg)
+        sys.stdout.write(_FOOTER)
         return 1
     else:
         msg = 'It *seems* everything is OK.'
@@ -169,15 +470,70 @@ def run(fhandle):
         return 0
 
 
+def run_files(paths, report=None, first_error=False, summary=False, nproc=1):
+    """
+    Validates several files, in parallel if nproc is larger than one.
+
+    For each file, writes its status line (see `status_line`) and errors,
+    only its status line if `summary` is True, or its report (see
+    `make_report`) if `report` is given. Then writes the number of files of
+    each status, and the slowest file, to stderr.
+
+    Returns
+    -------
+    int
+        1 if any file is not valid (or could not be read). 0 otherwise.
+    """
+    start = time.time()
+    counts = OrderedDict((('OK', 0), ('INVALID', 0), ('ERROR', 0)))
+    slowest = None
+
+    messages = report is None and not summary
+    results = validate_files(paths, first_error, messages, nproc)
+    for i_file, result in enumerate(results):
+        status = _status(result)
+        counts[status] += 1
+        if slowest is None or result['seconds'] > slowest['seconds']:
+            slowest = result
+
+        if report is not None:
+            output = make_report(result, report, header=not i_file)
+        elif summary:
+            output = status_line(result)
+        else:
+            output = status_line(result)
+            output += ''.join(error[2] for error in result['errors'])
+        sys.stdout.write(output)
+
+    if messages and counts['INVALID']:
+        sys.stdout.write(_FOOTER)
+    sys.stdout.flush()
+
+    msg = 'Validated {} files in {:.1f}s: {} OK, {} invalid, {} unreadable'
+    msg = msg.format(sum(counts.values()), time.time() - start,
+                     *counts.values())
+    if slowest is not None:
+        msg += ' (slowest: {} in {:.3f}s)'.format(slowest['file'],
+                                                  slowest['seconds'])
+    sys.stderr.write(msg + '\n')
+
+    return 1 if (counts['INVALID'] or counts['ERROR']) else 0
+
+
 check_pdb_format = run
 
 
 def main():
     # Check Input
-    pdbfh = check_input(sys.argv[1:])
+    pdbfh, report, first_error, summary, nproc = check_input(sys.argv[1:])
+
+    # Validate several files
+    if isinstance(pdbfh, list):
+        retcode = run_files(pdbfh, report, first_error, summary, nproc)
+        sys.exit(retcode)
 
     # Do the job
-    retcode = run(pdbfh)
+    retcode = run(pdbfh, report, first_error, summary)
 
     # last line of the script
     # We can close it even if it is sys.stdin
@@ -41,9 +41,14 @@ data to another. They are based on old FORTRAN77 code that was taking too much
 effort to maintain and compile. RIP.
 """
 
+from itertools import compress
+from operator import not_
 import os
 import sys
 
+from pdbtools import _atomtable
+from pdbtools import _stream
+
 __author__ = "Joao Rodrigues"
 __email__ = "j.p.g.l.m.rodrigues@gmail.com"
 
@@ -81,7 +86,7 @@ def check_input(args):
                 sys.stderr.write(__doc__)
                 sys.exit(1)
 
-            fh = open(args[0], 'r')
+            fh = _stream.open_file(args[0])
 
     elif len(args) == 2:
         # Two options: option & File
@@ -98,7 +103,7 @@ def check_input(args):
             sys.exit(1)
 
         option = args[0][1:]
-        fh = open(args[1], 'r')
+        fh = _stream.open_file(args[1])
 
     else:  # Whatever ...
         sys.stderr.write(__doc__)
@@ -146,27 +151,26 @@ def run(fhandle, option):
     chains, resids, atoms, hetatm = set(), set(), set(), set()
     has_altloc, has_icode = False, False  # flags only
 
-    model_id = "X   "
-    for line in fhandle:
-        if line.startswith('MODEL'):
-            model_id = line[10:14]
-            models.add(model_id.strip())
-
-        elif line.startswith('ATOM'):
-
-            chains.add(model_id + line[21])
-            resids.add(model_id + line[17:26])
-            atoms.add(model_id + line[12:27])
+    # Rows are counted column-wise, a table (chunk of the file) at a time.
+    for table in _atomtable.read_tables(fhandle, records=('ATOM', 'HETATM')):
+        models.update(table.models)
 
-            if line[16] != ' ':
-                has_altloc = True
+        model = table.model
+        chain = table.column('chain')
+        is_atom = [r.startswith('ATOM') for r in table.column('record')]
+        uids = list(zip(model, table.column('name'), table.column('altloc'),
+                        table.column('resname'), chain,
+                        table.column('resseq'), table.column('icode')))
 
-            if line[26] != ' ':
-                has_icode = True
+        chains.update(zip(model, chain))
+        atom_uids = list(compress(uids, is_atom))
+        atoms.update(atom_uids)
+        hetatm.update(compress(uids, map(not_, is_atom)))
+        resids.update((m, resname, ch, resseq)
+                      for m, _, _, resname, ch, resseq, _ in atom_uids)
 
-        elif line.startswith('HETATM'):
-            chains.add(model_id + line[21])
-            hetatm.add(model_id + line[12:27])
+        has_altloc = has_altloc or any(u[2] != ' ' for u in atom_uids)
+        has_icode = has_icode or any(u[6] != ' ' for u in atom_uids)
 
     if not models:
         models = {None}
@@ -213,7 +217,7 @@ def run(fhandle, option):
             'No. models:\t{0}\n'.format(n_models)
         )
         if models != {None}:
-            models_str = ','.join(sorted(models, key=int))
+            models_str = ','.join(map(str, sorted(models)))
             sys.stdout.write(
                 '\t->\t{0}\n'.format(models_str)
             )
@@ -222,7 +226,7 @@ def run(fhandle, option):
         sys.stdout.write(
             'No. chains:\t{0}\t({1}/model)\n'.format(n_chains, n_chains_pm)
         )
-        chains_str = ','.join(sorted((c[4:] for c in chains)))
+        chains_str = ','.join(sorted((c[1] for c in chains)))
         sys.stdout.write(
             '\t->\t{0}\n'.format(chains_str)
         )
@@ -231,7 +235,7 @@ def run(fhandle, option):
         sys.stdout.write(
             'No. residues:\t{0}\t({1}/model)\n'.format(n_resids, n_resids_pm)
         )
-        resnames = ','.join(sorted({f[4:7].strip() for f in resids}))
+        resnames = ','.join(sorted({r[1].strip() for r in resids}))
         sys.stdout.write(
             '\t->\t{0}\n'.format(resnames)
         )
@@ -240,7 +244,7 @@ def run(fhandle, option):
         sys.stdout.write(
             'No. atoms:\t{0}\t({1}/model)\n'.format(n_atoms, n_atoms_pm)
         )
-        atnames = ','.join(sorted({repr(f[4:8]) for f in atoms}))
+        atnames = ','.join(sorted({repr(a[1]) for a in atoms}))
         sys.stdout.write(
             '\t->\t{0}\n'.format(atnames)
         )
@@ -249,7 +253,7 @@ def run(fhandle, option):
         sys.stdout.write(
             'No. HETATM:\t{0}\n'.format(n_hetatm)
         )
-        hetnames = ','.join(sorted({repr(f[4:7]) for f in hetatm}))
+        hetnames = ','.join(sorted({repr(h[1][:3]) for h in hetatm}))
         sys.stdout.write(
             '\t->\t{0}\n'.format(hetnames)
         )
@@ -23,8 +23,9 @@ with open(path.join(here, 'README.md'), encoding='utf-8') as f:
 # Collect names of bin/*py scripts
 # e.g. 'pdb_intersect=bin.pdb_intersect:main',
 binfiles = listdir(path.join(here, 'pdbtools'))
+# Modules starting with an underscore are not tools (e.g. __init__.py).
 bin_py = [f[:-3] + '=pdbtools.' + f[:-3] + ':main' for f in binfiles
-          if f.endswith('.py')]
+          if f.endswith('.py') and not f.startswith('_')]
 
 setup(
     name='pdb-tools',  # Required
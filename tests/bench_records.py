@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Micro-benchmarks of the atom record writers in `_records`.
+
+Compares the time per atom of the writers with that of the single `str.format`
+templates that pdb_fromcif and pdb_tocif used before. Not run by the test
+suite, run it by hand:
+
+    python tests/bench_records.py [number of atoms]
+"""
+
+import os
+import sys
+import timeit
+
+from config import test_dir
+
+sys.path.insert(0, os.path.abspath(os.path.join(test_dir, '..')))
+
+from pdbtools import _hybrid36  # noqa: E402
+from pdbtools import _records  # noqa: E402
+
+COLUMNS = {
+    'record': 0, 'atname': 1, 'altloc': 2, 'resname': 3, 'chainid': 4,
+    'resnum': 5, 'icode': 6, 'x': 7, 'y': 8, 'z': 9, 'occ': 10,
+    'bfactor': 11, 'element': 12, 'charge': 13,
+}
+
+
+def make_rows(n_atoms):
+    """Builds _atom_site rows of a protein-like structure."""
+    names = (('N', 'N'), ('CA', 'C'), ('C', 'C'), ('O', 'O'), ('CB', 'C'))
+    rows = []
+    for i in range(n_atoms):
+        atname, element = names[i % 5]
+        rows.append(['ATOM', atname, '.', 'ALA', 'A', str(i // 5 % 9999 + 1),
+                     '?', '%.3f' % (i * 0.013), '%.3f' % (i * -0.007),
+                     '%.3f' % (i * 0.011 % 100), '1.00', '%.2f' % (i % 50),
+                     element, '?'])
+    return rows
+
+
+def template_pdb(rows):
+    """Writes PDB lines with the former pdb_fromcif template."""
+    _a = "{:6s}{:>5s} {:<4s}{:1s}{:3s} {:1s}{:>4s}{:1s}   {:8.3f}{:8.3f}{:8.3f}"
+    _a += "{:6.2f}{:6.2f}      {:<4s}{:<2s}{:2s}\n"
+    for serial, f in enumerate(rows, 1):
+        atname = f[1]
+        if len(atname) < 4 and atname[0].isalpha() and len(f[12]) < 2:
+            atname = ' ' + atname
+        _a.format(f[0], _hybrid36.encode_serial(serial), atname, ' ', f[3],
+                  f[4], _hybrid36.encode_resid(int(f[5])), ' ', float(f[7]),
+                  float(f[8]), float(f[9]), float(f[10]), float(f[11]), f[4],
+                  f[12], '  ')
+
+
+def writer_pdb(rows):
+    """Writes PDB lines with PDBAtomWriter."""
+    write = _records.PDBAtomWriter(COLUMNS).write
+    for serial, fields in enumerate(rows, 1):
+        write(fields, serial)
+
+
+def template_cif(lines):
+    """Writes mmCIF rows with the former pdb_tocif template."""
+    _a = '{:<6s} {:5d} {:2s} {:6s} {:1s} {:3s} {:3s} {:1s} {:5s} {:1s} '
+    _a += '{:10.3f} {:10.3f} {:10.3f} {:10.3f} {:10.3f} {:1s} '
+    _a += '{:5s} {:3s} {:1s} {:4s} {:1d}\n'
+    for serial, line in enumerate(lines, 1):
+        atname = line[12:16].strip()
+        resnum = line[22:26].strip()
+        _a.format(line[0:6].strip(), serial, line[76:78].strip() or '?',
+                  atname, '?', line[17:20], line[21], '?', resnum, '?',
+                  float(line[30:38]), float(line[38:46]), float(line[46:54]),
+                  float(line[54:60]), float(line[60:66]), '?', resnum,
+                  line[17:20], line[21], atname, 1)
+
+
+def writer_cif(lines):
+    """Writes mmCIF rows with CIFAtomWriter."""
+    write = _records.CIFAtomWriter().write
+    for serial, line in enumerate(lines, 1):
+        write(line, serial, 1)
+
+
+def main(n_atoms=100000):
+    rows = make_rows(n_atoms)
+    lines = []
+    _write = _records.PDBAtomWriter(COLUMNS).write
+    for serial, fields in enumerate(rows, 1):
+        lines.append(_write(fields, serial))
+
+    benchmarks = (
+        ('mmCIF -> PDB, template', template_pdb, rows),
+        ('mmCIF -> PDB, writer', writer_pdb, rows),
+        ('PDB -> mmCIF, template', template_cif, lines),
+        ('PDB -> mmCIF, writer', writer_cif, lines),
+    )
+    for name, func, data in benchmarks:
+        seconds = min(timeit.repeat(lambda: func(data), number=1, repeat=3))
+        usec = seconds / n_atoms * 1e6
+        print('{:<24s} {:>8.2f} us/atom'.format(name, usec))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
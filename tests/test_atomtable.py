@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Tests for `_atomtable`.
+"""
+
+import glob
+import os
+import sys
+import unittest
+
+from config import data_dir
+from pdbtools._hybrid36 import MAX_RESID, MAX_SERIAL, decode_resid
+
+
+class TestAtomTable(unittest.TestCase):
+    """
+    Tests for the columnar AtomTable.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._atomtable'
+        self.module = __import__(name, fromlist=[''])
+
+    def read(self, fname):
+        with open(os.path.join(data_dir, fname)) as fh:
+            return self.module.AtomTable.from_lines(fh)
+
+    def test_roundtrip(self):
+        """Unmodified tables are written back as the original text"""
+
+        for fpath in glob.glob(os.path.join(data_dir, '*.pdb')):
+            with open(fpath) as fh:
+                original = fh.read()
+
+            table = self.module.AtomTable.from_lines(original.splitlines(True))
+            self.assertEqual(''.join(table.lines()), original)
+
+    def test_columns(self):
+        """Columns hold the parsed fields of each record"""
+
+        table = self.read('dummy.pdb')
+        records = ('ATOM', 'HETATM', 'ANISOU', 'TER')
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            expected = [line for line in fh if line.startswith(records)]
+
+        self.assertEqual(len(table), len(expected))
+        self.assertEqual(table.column('record')[0], 'ATOM  ')
+        self.assertEqual(list(table.column('serial'))[:3], [1, 2, 3])
+        self.assertEqual(table.column('name')[0], ' N  ')
+        self.assertEqual(table.column('resname')[0], 'ARG')
+        self.assertEqual(table.column('chain')[0], 'B')
+        self.assertEqual(table.column('resseq')[0], 4)
+        self.assertEqual(table.column('element')[0], ' N')
+        self.assertAlmostEqual(table.column('x')[0], float(expected[0][30:38]))
+        self.assertAlmostEqual(table.column('b')[0], float(expected[0][60:66]))
+
+    def test_missing_fields(self):
+        """TER records have no coordinates"""
+
+        table = self.module.AtomTable.from_lines(['TER\n'])
+        self.assertEqual(table.column('serial')[0], self.module.MISSING_INT)
+        x = table.column('x')[0]
+        self.assertNotEqual(x, x)  # NaN
+
+        table.set_column('x', table.column('x'))
+        self.assertEqual(list(table.lines()), ['TER\n'])
+
+    def test_models(self):
+        """Rows keep the number of their model"""
+
+        table = self.read('ensemble_OK.pdb')
+        self.assertEqual(sorted(set(table.model)), [1, 2])
+        self.assertEqual(table.models, [1, 2])
+
+        table = self.module.AtomTable.from_lines(['ATOM\n'], model=3)
+        self.assertEqual(list(table.model), [3])
+        self.assertEqual(table.models, [])
+
+    def test_records(self):
+        """Only the given records are read as rows"""
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            lines = fh.readlines()
+
+        table = self.module.AtomTable.from_lines(lines, records=('HETATM',))
+        n_hetatm = sum(1 for line in lines if line.startswith('HETATM'))
+        self.assertEqual(len(table), n_hetatm)
+        self.assertEqual(set(table.column('record')), {'HETATM'})
+        self.assertEqual(''.join(table.lines()), ''.join(lines))
+
+    def test_hybrid36(self):
+        """Serial and residue numbers are read and written in hybrid-36"""
+
+        line = 'ATOM  A0000  N   ARG BA000      0.000   0.000   0.000\n'
+        table = self.module.AtomTable.from_lines([line])
+        self.assertEqual(list(table.column('serial')), [100000])
+        self.assertEqual(list(table.column('resseq')), [10000])
+
+        table.set_column('serial', [99999])
+        table.set_column('resseq', [10001])
+        new_line, = table.lines()
+        self.assertEqual(new_line[6:11], '99999')
+        self.assertEqual(new_line[22:26], 'A001')
+        self.assertEqual(new_line[:6] + new_line[11:22], line[:6] + line[11:22])
+        self.assertEqual(new_line[26:], line[26:])
+
+    def test_set_column(self):
+        """Only modified columns are written again"""
+
+        table = self.read('dummy.pdb')
+        resseq = [r + 10000 for r in table.column('resseq')]
+        table.set_column('resseq', resseq)
+        table.set_column('chain', ['Z'] * len(table))
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            original = fh.readlines()
+
+        new_lines = list(table.lines())
+        self.assertEqual(len(new_lines), len(original))
+        for old, new in zip(original, new_lines):
+            if old.startswith(('ATOM', 'HETATM')):
+                self.assertEqual(new[21], 'Z')
+                self.assertEqual(decode_resid(new[22:26]),
+                                 int(old[22:26]) + 10000)
+                self.assertEqual(new[:21], old[:21])
+                self.assertEqual(new[26:], old[26:])
+            elif not old.startswith(('ANISOU', 'TER')):
+                self.assertEqual(new, old)
+
+    def test_set_column_errors(self):
+        """Invalid columns and sizes are rejected"""
+
+        table = self.read('dummy.pdb')
+        self.assertRaises(KeyError, table.column, 'foo')
+        self.assertRaises(KeyError, table.set_column, 'foo', [])
+        self.assertRaises(ValueError, table.set_column, 'x', [1.0])
+
+    def test_set_column_width(self):
+        """Values must fit in the width of their field"""
+
+        table = self.read('dummy.pdb')
+        n_rows = len(table)
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            original = fh.read()
+
+        invalid = [
+            ('resseq', MAX_RESID + 1),
+            ('serial', MAX_SERIAL + 1),
+            ('x', 10000000.0),
+            ('occ', 1000.0),
+            ('resname', 'ARGN'),
+            ('chain', 'AB'),
+        ]
+        for name, value in invalid:
+            with self.assertRaises(ValueError):
+                table.set_column(name, [value] * n_rows)
+
+        # Nothing was changed
+        self.assertEqual(''.join(table.lines()), original)
+
+        table.set_column('resseq', [MAX_RESID] * n_rows)
+        table.set_column('x', [-999.999] * n_rows)
+        table.set_column('resname', ['GL'] * n_rows)
+        for line in table.lines():
+            if line.startswith('ATOM'):
+                self.assertEqual(line[17:21], 'GL  ')
+                self.assertEqual(line[22:38], 'zzzz    -999.999')
+
+    def test_read_tables(self):
+        """Files are read in tables of up to a number of rows"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.pdb')
+        with open(fpath) as fh:
+            original = fh.read()
+        whole = self.read('ensemble_OK.pdb')
+
+        for size in (1, 2, 3, 100):
+            tables = list(self.module.read_tables(
+                original.splitlines(True), size))
+            self.assertEqual(''.join(''.join(t.lines()) for t in tables),
+                             original)
+            self.assertTrue(all(len(t) <= size for t in tables))
+            self.assertEqual(sum(len(t) for t in tables), len(whole))
+
+            models = [m for t in tables for m in t.model]
+            self.assertEqual(models, list(whole.model))
+
+        self.assertEqual(list(self.module.read_tables([])), [])
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
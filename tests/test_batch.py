@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_batch`.
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Tests for the conversion of many files to a directory.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._batch'
+        self.module = __import__(name, fromlist=[''])
+
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def touch(self, *path):
+        """Creates an empty file in the temporary directory."""
+        fpath = os.path.join(self.tempdir, *path)
+        if not os.path.isdir(os.path.dirname(fpath)):
+            os.makedirs(os.path.dirname(fpath))
+        open(fpath, 'w').close()
+        return fpath
+
+    def test_find_inputs(self):
+        """Directories are searched recursively by extension"""
+
+        self.touch('1abc.cif')
+        self.touch('ab', '2abc.cif.gz')
+        self.touch('ab', 'notes.txt')
+        other = self.touch('other.txt')
+
+        inputs = self.module.find_inputs([self.tempdir, other], ('.cif',))
+        relpaths = [relpath for _, relpath in inputs]
+        expected = ['1abc.cif', os.path.join('ab', '2abc.cif.gz'), 'other.txt']
+        self.assertEqual(relpaths, expected)
+
+    def test_output_path(self):
+        """Output paths keep the directory structure"""
+
+        relpath = os.path.join('ab', '1abc.cif.gz')
+        outpath = self.module.output_path('out', relpath, ('.cif',), '.pdb')
+        self.assertEqual(outpath, os.path.join('out', 'ab', '1abc.pdb'))
+
+        outpath = self.module.output_path('out', '1abc.txt', ('.cif',), '.pdb')
+        self.assertEqual(outpath, os.path.join('out', '1abc.txt.pdb'))
+
+    def test_is_up_to_date(self):
+        """Output files must be newer than the input and not empty"""
+
+        inpath = self.touch('1abc.cif')
+        outpath = os.path.join(self.tempdir, '1abc.pdb')
+        self.assertFalse(self.module.is_up_to_date(inpath, outpath))
+
+        self.touch('1abc.pdb')
+        self.assertFalse(self.module.is_up_to_date(inpath, outpath))  # empty
+
+        with open(outpath, 'w') as handle:
+            handle.write('END\n')
+        self.assertTrue(self.module.is_up_to_date(inpath, outpath))
+
+        newer = time.time() + 10
+        os.utime(inpath, (newer, newer))
+        self.assertFalse(self.module.is_up_to_date(inpath, outpath))
+
+    def test_run_function(self):
+        """Jobs can be run by a function, with custom names in the report"""
+
+        def work(inpath, outpath, suffix):
+            if inpath == '2abc':
+                return 'ERROR!! ' + suffix
+            return ''
+
+        jobs = [('1abc', 'x'), ('2abc', 'y'), ('3abc', 'z')]
+        progress = io.StringIO()
+        counts = self.module.run(work, jobs, ('no',), progress=progress,
+                                 is_done=lambda inpath, _: inpath == '3abc',
+                                 status='fetched', noun='structures')
+
+        self.assertEqual(counts, {'fetched': 1, 'skipped': 1, 'failed': 1})
+        self.assertEqual(progress.getvalue().splitlines(), [
+            '[1/3] skipped 3abc',
+            '[2/3] fetched 1abc',
+            '[3/3] failed  2abc: ERROR!! no',
+            'Fetched 1 structures, skipped 1, failed 1',
+        ])
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
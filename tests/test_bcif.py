@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_bcif`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestEncodings(unittest.TestCase):
+    """
+    Tests for the BinaryCIF column encodings.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._bcif'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_delta(self):
+        """Integers are replaced by their differences"""
+
+        encoding, values = self.module.delta([5, 6, 8, 8])
+        self.assertEqual(encoding['origin'], 5)
+        self.assertEqual(values, [0, 1, 2, 0])
+
+    def test_run_length(self):
+        """Runs of integers are replaced by (value, count) pairs"""
+
+        encoding, values = self.module.run_length([1, 1, 1, 2, 1])
+        self.assertEqual(encoding['srcSize'], 5)
+        self.assertEqual(values, [1, 3, 2, 1, 1, 1])
+
+    def test_integer_packing(self):
+        """Large integers are split in values of the packed type"""
+
+        packing = self.module.integer_packing
+        encoding, values, dtype = packing([0, 255, 3])
+        self.assertEqual((encoding['byteCount'], encoding['isUnsigned']),
+                         (1, True))
+        self.assertEqual(values, [0, 255, 0, 3])
+        self.assertEqual(dtype, self.module.UINT8)
+
+        encoding, values, dtype = packing([-300, 1])
+        self.assertEqual(values, [-128, -128, -44, 1])
+        self.assertEqual(dtype, self.module.INT8)
+
+        encoding, values, dtype = packing([30000, -30000, 1])
+        self.assertEqual(encoding['byteCount'], 2)
+        self.assertEqual(values, [30000, -30000, 1])
+
+    def test_encode_floats(self):
+        """Floats are stored as fixed-point integers"""
+
+        encoded = self.module.encode_floats([1.5, 1.501, 1.502], 1000, True)
+        kinds = [e['kind'] for e in encoded['encoding']]
+        self.assertEqual(kinds, ['FixedPoint', 'Delta', 'IntegerPacking',
+                                 'ByteArray'])
+        self.assertEqual(encoded['encoding'][1]['origin'], 1500)
+        self.assertEqual(encoded['data'], b'\x00\x01\x01')
+
+    def test_encode_strings(self):
+        """Strings are stored once, and referenced by index"""
+
+        encoded = self.module.encode_strings(['CA', 'CA', 'N', 'CA'])
+        encoding = encoded['encoding'][0]
+        self.assertEqual(encoding['kind'], 'StringArray')
+        self.assertEqual(encoding['stringData'], 'CAN')
+        self.assertEqual(encoded['data'], b'\x00\x00\x01\x00')
+
+    def test_mask(self):
+        """Columns without missing values have no mask"""
+
+        self.assertIsNone(self.module.column('x', {}, [0, 0])['mask'])
+        self.assertIsNotNone(self.module.column('x', {}, [0, 2])['mask'])
+
+
+class TestDecoding(unittest.TestCase):
+    """
+    Tests for the BinaryCIF column decoder.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._bcif'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_ints(self):
+        """Encoded integers are decoded"""
+
+        values = [1, 2, 3, 3, 3, 3, 3, 3, 400, -400, 0, 65535, 65536]
+        for use_delta in (False, True):
+            encoded = self.module.encode_ints(values, use_delta)
+            self.assertEqual(list(self.module.decode(encoded)), values)
+
+    def test_floats(self):
+        """Fixed-point floats are decoded to the stored precision"""
+
+        values = [1.5, -2.25, 100.125, 0.001]
+        encoded = self.module.encode_floats(values, 1000, use_delta=True)
+        self.assertEqual(self.module.decode(encoded), values)
+
+    def test_strings(self):
+        """String arrays are decoded"""
+
+        values = ['CA', 'N', 'CA', '', "O5'"]
+        encoded = self.module.encode_strings(values)
+        self.assertEqual(self.module.decode(encoded), values)
+
+    def test_interval_quantization(self):
+        """Quantized values are mapped between min and max"""
+
+        encoded = {
+            'data': b'\x00\x01\x04',
+            'encoding': [
+                {'kind': 'IntervalQuantization', 'min': 1.0, 'max': 2.0,
+                 'numSteps': 5, 'srcType': self.module.FLOAT64},
+                {'kind': 'ByteArray', 'type': self.module.UINT8},
+            ],
+        }
+        self.assertEqual(self.module.decode(encoded), [1.0, 1.25, 2.0])
+
+    def test_mask(self):
+        """Masked values are read as '.' or '?'"""
+
+        column = self.module.column('x', self.module.encode_ints([1, 0, 0]),
+                                    [0, 1, 2])
+        self.assertEqual(self.module.decode_column(column), [1, '.', '?'])
+
+        column = self.module.column('x', self.module.encode_ints([0, 0]),
+                                    [2, 2])
+        self.assertEqual(self.module.decode_column(column), ['?', '?'])
+
+    def test_read_category(self):
+        """Rows are assembled from the columns"""
+
+        columns = [
+            self.module.column('id', self.module.encode_ints([1, 2])),
+            self.module.column('name',
+                               self.module.encode_strings(['CA', 'N'])),
+        ]
+        data = self.module.write_file('test', [('_atom_site', 2, columns)])
+        self.assertTrue(self.module.is_bcif(data))
+
+        tags, rows = self.module.read_category(data, '_atom_site')
+        self.assertEqual(tags, ['_atom_site.id', '_atom_site.name'])
+        self.assertEqual(list(rows), [[1, 'CA'], [2, 'N']])
+
+        tags, rows = self.module.read_category(
+            data, '_atom_site', select=lambda tags: tags[1:])
+        self.assertEqual(tags, ['_atom_site.name'])
+        self.assertEqual(list(rows), [['CA'], ['N']])
+
+        tags, rows = self.module.read_category(data, '_cell')
+        self.assertEqual((tags, list(rows)), ([], []))
+
+    def test_malformed(self):
+        """Malformed files raise BinaryCIFError"""
+
+        error = self.module.BinaryCIFError
+        self.assertFalse(self.module.is_bcif(b'data_1CTF'))
+        self.assertRaises(error, self.module.read_category, b'\x81\xa1a',
+                          '_atom_site')
+
+        encoded = {'data': b'', 'encoding': [{'kind': 'Unknown'}]}
+        self.assertRaises(error, self.module.decode, encoded)
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
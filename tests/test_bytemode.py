@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parity tests for tools that accept `bytes` lines.
+
+The output of `run` on the raw bytes of a file must be the same as the output
+on the decoded text, for every file in `data`.
+"""
+
+import glob
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from config import data_dir
+
+from pdbtools import _stream
+from pdbtools._ranges import ResidueRanges
+
+
+# tool: list of (positional) arguments to `run` after the file handle.
+TOOLS = {
+    'pdb_selchain': [set(['A']), set(['A', 'B', 'C'])],
+    'pdb_delchain': [set(['A']), set(['B', 'C'])],
+    'pdb_selatom': [set(['CA']), set(['N', 'CA', 'C', 'O'])],
+    'pdb_selelem': [set(['C']), set(['N', 'O'])],
+    'pdb_delelem': [set(['H']), set(['C', 'N'])],
+    'pdb_selresname': [set(['ALA']), set(['HOH', 'ARG'])],
+    'pdb_delresname': [set(['HOH']), set(['ALA', 'ARG'])],
+    'pdb_selseg': [set(['A']), set(['B', 'C'])],
+    'pdb_select': ['chain A,B and not element H',
+                   '(resid 1:5 or hetatm) and not resname HOH'],
+    'pdb_keepcoord': [],
+    'pdb_delres': [set(range(1, 5)), ResidueRanges.parse('A:1:10,::2')],
+    'pdb_selhetatm': [],
+    'pdb_delhetatm': [],
+}
+
+
+class TestByteMode(unittest.TestCase):
+    """
+    Compares text and bytes outputs of all byte-mode tools.
+    """
+
+    def setUp(self):
+        self.files = sorted(glob.glob(os.path.join(data_dir, '*.pdb')))
+
+    def compare(self, name, options):
+        """Runs a tool on text and bytes and compares the results."""
+        module = __import__('pdbtools.' + name, fromlist=[''])
+        for fpath in self.files:
+            with open(fpath, 'rb') as fh:
+                data = fh.read()
+            text = data.decode('utf-8').splitlines(True)
+            raw = data.splitlines(True)
+
+            for args in options:
+                if not isinstance(args, tuple):
+                    args = (args,)
+
+                expected = list(module.run(text, *args))
+                result = list(module.run(raw, *args))
+
+                self.assertTrue(all(isinstance(l, bytes) for l in result))
+                self.assertEqual(
+                    [l.decode('utf-8') for l in result], expected,
+                    '{} differs in byte mode for {}'.format(name, fpath)
+                )
+
+    def test_parity(self):
+        """Tools give the same results with str and bytes lines"""
+        for name, options in sorted(TOOLS.items()):
+            self.compare(name, options or [()])
+
+    def test_empty_input(self):
+        """Tools run on empty input"""
+        for name, options in sorted(TOOLS.items()):
+            module = __import__('pdbtools.' + name, fromlist=[''])
+            args = options[0] if options else ()
+            if not isinstance(args, tuple):
+                args = (args,)
+            self.assertEqual(list(module.run(iter([]), *args)), [])
+
+    def test_line_endings(self):
+        """Byte mode translates CRLF and CR line endings as text mode does"""
+        with open(os.path.join(data_dir, 'dummy.pdb'), 'rb') as fh:
+            data = fh.read()
+
+        read_size = _stream.READ_SIZE
+        for eol in (b'\r\n', b'\r'):
+            handle, path = tempfile.mkstemp(suffix='.pdb')
+            self.addCleanup(os.remove, path)
+            with os.fdopen(handle, 'wb') as outfile:
+                outfile.write(data.replace(b'\n', eol))
+
+            with _stream.open_file(path) as fh:
+                expected = list(fh)
+
+            # Small reads split line endings across blocks
+            for size in (read_size, 81, 80):
+                _stream.READ_SIZE = size
+                try:
+                    with _stream.open_file(path) as fh:
+                        out = io.TextIOWrapper(io.BytesIO())
+                        pdbin, _, empty = _stream.binary_streams(fh, out)
+                        result = list(pdbin)
+                finally:
+                    _stream.READ_SIZE = read_size
+
+                self.assertEqual(empty, b'')
+                self.assertEqual([line.decode('utf-8') for line in result],
+                                 expected)
+
+                for name, options in sorted(TOOLS.items()):
+                    module = __import__('pdbtools.' + name, fromlist=[''])
+                    args = options[0] if options else ()
+                    if not isinstance(args, tuple):
+                        args = (args,)
+                    output = module.run(result, *args)
+                    self.assertEqual(
+                        [line.decode('utf-8') for line in output],
+                        list(module.run(expected, *args)),
+                        '{} differs in byte mode for {!r}'.format(name, eol)
+                    )
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_cache`.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from utils import OutputCapture
+
+
+class TestCache(unittest.TestCase):
+    """
+    Tests for the on-disk cache of downloaded structures.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._cache'
+        self.module = __import__(name, fromlist=[''])
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = self.module.Cache(self.tmpdir, max_size=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def add(self, name, data, last_used=None):
+        """Adds a file to the cache, optionally setting its last use."""
+        handle = self.cache.open_writer(name)
+        handle.write(data)
+        self.cache.commit(handle, name)
+        path = self.cache.path(name)
+        if last_used is not None:
+            os.utime(path, (last_used, os.stat(path).st_mtime))
+        return path
+
+    def test_path(self):
+        """Files are stored by the middle characters of their code"""
+
+        path = self.cache.path('1ABC.pdb.gz')
+        self.assertEqual(path, os.path.join(self.tmpdir, 'ab', '1ABC.pdb.gz'))
+
+    def test_get(self):
+        """Cached files are found, missing files are not"""
+
+        path = self.add('1abc.pdb.gz', b'data')
+
+        self.assertEqual(self.cache.get('1abc.pdb.gz'), path)
+        self.assertIsNone(self.cache.get('2abc.pdb.gz'))
+
+    def test_commit(self):
+        """Files are only visible once committed"""
+
+        handle = self.cache.open_writer('1abc.pdb.gz')
+        handle.write(b'data')
+        self.assertIsNone(self.cache.get('1abc.pdb.gz'))
+        self.assertEqual(self.cache.files(), [])
+
+        self.cache.commit(handle, '1abc.pdb.gz')
+        with open(self.cache.get('1abc.pdb.gz'), 'rb') as cached:
+            self.assertEqual(cached.read(), b'data')
+
+    def test_discard(self):
+        """Discarded files leave nothing behind"""
+
+        handle = self.cache.open_writer('1abc.pdb.gz')
+        handle.write(b'data')
+        self.cache.discard(handle)
+
+        self.assertIsNone(self.cache.get('1abc.pdb.gz'))
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'ab')), [])
+
+    def test_evict_lru(self):
+        """The least recently used files are evicted first"""
+
+        now = time.time()
+        self.add('1abc.pdb.gz', b'x' * 40, last_used=now - 30)
+        self.add('2abc.pdb.gz', b'x' * 40, last_used=now - 10)
+        self.add('3abc.pdb.gz', b'x' * 40, last_used=now - 20)
+
+        self.assertIsNone(self.cache.get('1abc.pdb.gz'))
+        self.assertIsNotNone(self.cache.get('2abc.pdb.gz'))
+        self.assertIsNotNone(self.cache.get('3abc.pdb.gz'))
+
+    def test_get_marks_used(self):
+        """Reading a file protects it from eviction"""
+
+        now = time.time()
+        self.add('1abc.pdb.gz', b'x' * 40, last_used=now - 30)
+        self.add('2abc.pdb.gz', b'x' * 40, last_used=now - 10)
+        self.cache.get('1abc.pdb.gz')
+        self.add('3abc.pdb.gz', b'x' * 40)
+
+        self.assertIsNotNone(self.cache.get('1abc.pdb.gz'))
+        self.assertIsNone(self.cache.get('2abc.pdb.gz'))
+
+    def test_commit_walks_when_full(self):
+        """The cache is only walked on the first commit and when full"""
+
+        walks = []
+        files = self.cache.files
+
+        def count_walks():
+            walks.append(1)
+            return files()
+
+        self.cache.files = count_walks
+        for code in range(5):
+            self.add('{}abc.pdb.gz'.format(code), b'x' * 20)
+        self.assertEqual(len(walks), 1)
+
+        self.add('1abc.pdb.gz', b'x' * 10)  # replaces a file
+        self.assertEqual(len(walks), 1)
+
+        self.add('5abc.pdb.gz', b'x' * 20)
+        self.assertEqual(len(walks), 2)
+        self.assertIsNone(self.cache.get('0abc.pdb.gz'))
+        self.assertEqual(sum(size for _, size, _ in files()), 90)
+
+    def test_ttl(self):
+        """Files expire after the time-to-live, until validated"""
+
+        path = self.add('1abc.pdb.gz', b'data')
+        self.assertTrue(self.cache.is_fresh(path))
+
+        self.cache.ttl = 60
+        old = time.time() - 3600
+        os.utime(path, (old, old))
+        self.assertFalse(self.cache.is_fresh(path))
+
+        self.cache.validated(path)
+        self.assertTrue(self.cache.is_fresh(path))
+
+    def test_from_env(self):
+        """Cache settings are read from the environment"""
+
+        self.assertIsNone(self.module.Cache.from_env())
+
+        os.environ['PDBTOOLS_CACHE_SIZE'] = '2'
+        os.environ['PDBTOOLS_CACHE_TTL'] = '3600'
+        try:
+            cache = self.module.Cache.from_env(self.tmpdir)
+        finally:
+            del os.environ['PDBTOOLS_CACHE_SIZE']
+            del os.environ['PDBTOOLS_CACHE_TTL']
+
+        self.assertEqual(cache.root, self.tmpdir)
+        self.assertEqual(cache.max_size, 2 * 1024 * 1024)
+        self.assertEqual(cache.ttl, 3600)
+
+    def test_from_env_invalid(self):
+        """Invalid cache settings exit with an error"""
+
+        os.environ['PDBTOOLS_CACHE_SIZE'] = 'big'
+        try:
+            with OutputCapture() as output:
+                with self.assertRaises(SystemExit):
+                    self.module.Cache.from_env(self.tmpdir)
+        finally:
+            del os.environ['PDBTOOLS_CACHE_SIZE']
+
+        self.assertEqual(
+            output.stderr[0],
+            "ERROR!! PDBTOOLS_CACHE_SIZE must be a positive number: 'big'")
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_cif`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestCIFReader(unittest.TestCase):
+    """
+    Tests for the mmCIF tokenizer.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._cif'
+        self.module = __import__(name, fromlist=[''])
+
+    def read(self, text, category='_atom_site'):
+        tags, rows = self.module.read_category(text.splitlines(True),
+                                               category)
+        return tags, list(rows)
+
+    def test_split_plain(self):
+        """Lines without quotes are split on whitespace"""
+
+        line = 'ATOM   1   N N   . ASN A 1 ? 22.066 40.557  0.420\n'
+        self.assertEqual(self.module.split_line(line), line.split())
+
+    def test_split_quotes(self):
+        """Quoted values follow the CIF rules"""
+
+        split_line = self.module.split_line
+        self.assertEqual(split_line('1 "O5\'" \'N"1\' x\n'),
+                         ['1', "O5'", 'N"1', 'x'])
+        self.assertEqual(split_line("1 'a b' \"it's\" O5'\n"),
+                         ['1', 'a b', "it's", "O5'"])
+        self.assertEqual(split_line("1 'a'b' 2\n"), ['1', "a'b", '2'])
+        self.assertEqual(split_line("1 '' 2 # comment\n"), ['1', '', '2'])
+        self.assertEqual(split_line('1 2 # comment\n'), ['1', '2'])
+
+    def test_split_comments(self):
+        """Comments start with a '#' at the start of a value"""
+
+        split_line = self.module.split_line
+        self.assertEqual(split_line('1 C#1 2\n'), ['1', 'C#1', '2'])
+        self.assertEqual(split_line('1 C#1 #2 3\n'), ['1', 'C#1'])
+        self.assertEqual(split_line("'a' C#1 2#\n"), ['a', 'C#1', '2#'])
+        self.assertEqual(split_line('#1 2\n'), [])
+        self.assertEqual(split_line('1\t#2\n'), ['1'])
+        self.assertEqual(split_line('C#1#2 3 #4#5\n'), ['C#1#2', '3'])
+        self.assertEqual(split_line('1 2#\n'), ['1', '2#'])
+
+    def test_split_unterminated(self):
+        """Unterminated quotes raise CIFError"""
+
+        with self.assertRaises(self.module.CIFError):
+            self.module.split_line("1 'a b\n")
+
+    def test_loop(self):
+        """Rows can span lines and contain text fields"""
+
+        text = ('data_test\n'
+                'loop_\n'
+                '_entity.id\n'
+                '_entity.details\n'
+                '1\n'
+                ';_atom_site.id is not a tag here\n'
+                ';\n'
+                '#\n'
+                'loop_\n'
+                '_atom_site.a\n'
+                '_atom_site.b\n'
+                '_atom_site.c\n'
+                '1 2 3\n'
+                '4 "x y"\n'
+                ';first\n'
+                'second\n'
+                ';\n'
+                '7 8 9\n'
+                '#\n'
+                '_cell.a 1\n')
+
+        tags, rows = self.read(text)
+        self.assertEqual(tags, ['_atom_site.a', '_atom_site.b',
+                                '_atom_site.c'])
+        self.assertEqual(rows, [['1', '2', '3'],
+                                ['4', 'x y', 'first\nsecond'],
+                                ['7', '8', '9']])
+
+        tags, rows = self.read(text, '_entity')
+        self.assertEqual(rows, [['1', '_atom_site.id is not a tag here']])
+
+    def test_pairs(self):
+        """Categories without loops give a single row"""
+
+        text = ('data_test\n'
+                '_atom_site.a 1\n'
+                '_atom_site.b\n'
+                "'q r'\n"
+                '_atom_site.c\n'
+                ';multi\n'
+                ';\n'
+                '#\n')
+
+        tags, rows = self.read(text)
+        self.assertEqual(tags, ['_atom_site.a', '_atom_site.b',
+                                '_atom_site.c'])
+        self.assertEqual(rows, [['1', 'q r', 'multi']])
+
+    def test_missing_category(self):
+        """Missing categories give no tags and no rows"""
+
+        tags, rows = self.read('data_test\n_cell.a 1\n')
+        self.assertEqual(tags, [])
+        self.assertEqual(rows, [])
+
+    def test_incomplete_row(self):
+        """Incomplete rows raise CIFError"""
+
+        text = 'loop_\n_atom_site.a\n_atom_site.b\n1 2\n3\n'
+        with self.assertRaises(self.module.CIFError):
+            self.read(text)
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_hybrid36`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestHybrid36(unittest.TestCase):
+    """
+    Tests for the hybrid-36 number codec.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._hybrid36'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_decimal(self):
+        """Numbers within the decimal limits are written as usual"""
+
+        encode = self.module.encode
+        self.assertEqual(encode(1, 5), '    1')
+        self.assertEqual(encode(-9999, 5), '-9999')
+        self.assertEqual(encode(99999, 5), '99999')
+        self.assertEqual(encode(-999, 4), '-999')
+        self.assertEqual(encode(9999, 4), '9999')
+
+    def test_encode(self):
+        """Larger numbers are written in base-36"""
+
+        encode = self.module.encode
+        self.assertEqual(encode(100000, 5), 'A0000')
+        self.assertEqual(encode(100035, 5), 'A000Z')
+        self.assertEqual(encode(100036, 5), 'A0010')
+        self.assertEqual(encode(43770015, 5), 'ZZZZZ')
+        self.assertEqual(encode(43770016, 5), 'a0000')
+        self.assertEqual(encode(87440031, 5), 'zzzzz')
+        self.assertEqual(encode(10000, 4), 'A000')
+        self.assertEqual(encode(1223055, 4), 'ZZZZ')
+        self.assertEqual(encode(1223056, 4), 'a000')
+        self.assertEqual(encode(2436111, 4), 'zzzz')
+
+    def test_out_of_range(self):
+        """Numbers that do not fit raise ValueError"""
+
+        encode = self.module.encode
+        self.assertRaises(ValueError, encode, 87440032, 5)
+        self.assertRaises(ValueError, encode, -10000, 5)
+        self.assertRaises(ValueError, encode, 2436112, 4)
+        self.assertRaises(ValueError, encode, -1000, 4)
+
+    def test_decode(self):
+        """Decoding is the inverse of encoding"""
+
+        for width in (4, 5):
+            _, _, _, max_value = self.module._LIMITS[width]
+            for value in range(-999, max_value + 1, 997):
+                text = self.module.encode(value, width)
+                self.assertEqual(len(text), width)
+                self.assertEqual(self.module.decode(text, width), value)
+
+    def test_decode_invalid(self):
+        """Invalid fields raise ValueError"""
+
+        decode = self.module.decode
+        for text in ('     ', 'Aa000', 'aA000', '0A000', 'A000', 'A-000'):
+            self.assertRaises(ValueError, decode, text, 5)
+
+    def test_order(self):
+        """Encoded numbers keep their order when decoded"""
+
+        serials = [99998, 99999, 100000, 43770015, 43770016]
+        texts = [self.module.encode_serial(s) for s in serials]
+        decoded = sorted(texts, key=self.module.decode_serial)
+        self.assertEqual(decoded, texts)
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
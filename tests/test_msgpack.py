@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_msgpack`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestMessagePack(unittest.TestCase):
+    """
+    Tests for the MessagePack encoder.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._msgpack'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_scalars(self):
+        """Scalars are written in their smallest format"""
+
+        packb = self.module.packb
+        self.assertEqual(packb(None), b'\xc0')
+        self.assertEqual(packb(True), b'\xc3')
+        self.assertEqual(packb(False), b'\xc2')
+        self.assertEqual(packb(1), b'\x01')
+        self.assertEqual(packb(-1), b'\xff')
+        self.assertEqual(packb(-33), b'\xd0\xdf')
+        self.assertEqual(packb(200), b'\xcc\xc8')
+        self.assertEqual(packb(70000), b'\xce\x00\x01\x11\x70')
+        self.assertEqual(packb(-200), b'\xd1\xff\x38')
+        self.assertEqual(packb(1.5), b'\xcb\x3f\xf8' + b'\x00' * 6)
+
+    def test_strings(self):
+        """Text and bytes are written as str and bin"""
+
+        packb = self.module.packb
+        self.assertEqual(packb(u'abc'), b'\xa3abc')
+        self.assertEqual(packb(u'x' * 40), b'\xd9\x28' + b'x' * 40)
+        self.assertEqual(packb(b'ab'), b'\xc4\x02ab')
+
+    def test_containers(self):
+        """Lists and dictionaries are written recursively"""
+
+        packb = self.module.packb
+        self.assertEqual(packb([1, [2]]), b'\x92\x01\x91\x02')
+        self.assertEqual(packb((1,) * 16), b'\xdc\x00\x10' + b'\x01' * 16)
+        self.assertEqual(packb({u'a': None}), b'\x81\xa1a\xc0')
+
+    def test_unsupported(self):
+        """Unsupported types raise TypeError"""
+
+        self.assertRaises(TypeError, self.module.packb, set([1]))
+
+
+class TestUnpack(unittest.TestCase):
+    """
+    Tests for the MessagePack decoder.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._msgpack'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_roundtrip(self):
+        """Encoded objects are decoded to the same objects"""
+
+        obj = {
+            u'ints': [0, 1, -1, -33, 200, -200, 70000, -70000, 2 ** 40],
+            u'floats': [1.5, -0.25],
+            u'text': [u'', u'abc', u'x' * 300],
+            u'bytes': b'\x00\x01' * 200,
+            u'other': [None, True, False, {u'a': [1, [2]]}],
+        }
+        self.assertEqual(self.module.unpackb(self.module.packb(obj)), obj)
+
+    def test_float32(self):
+        """Single-precision floats are read"""
+
+        self.assertEqual(self.module.unpackb(b'\xca\x3f\xc0\x00\x00'), 1.5)
+
+    def test_malformed(self):
+        """Truncated data and extension types raise MessagePackError"""
+
+        error = self.module.MessagePackError
+        self.assertRaises(error, self.module.unpackb, b'\x92\x01')
+        self.assertRaises(error, self.module.unpackb, b'\xd4\x01\x01')
+        self.assertRaises(error, self.module.unpackb, b'\x01\x01')
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
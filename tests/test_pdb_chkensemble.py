@@ -140,6 +140,41 @@ class TestTool(unittest.TestCase):
         self.assertEqual(self.stderr[0],
                          "ERROR!! MODEL record found before ENDMDL at line '6'")
 
+    def test_run_many_models(self):
+        """pdb_chkensemble.run compares all models to the first"""
+        from utils import OutputCapture
+
+        with open(os.path.join(data_dir, 'ensemble_OK.pdb')) as handle:
+            lines = handle.readlines()
+
+        header, model, footer = lines[:2], lines[2:6], lines[-1:]
+        swapped = [model[0], model[2], model[1], model[3]]  # atom order
+        missing = model[:2] + model[3:]  # no H atom
+        renumber = lambda m, n: ['MODEL     {:>4d}\n'.format(n)] + m[1:]
+
+        ensemble = header + model + renumber(swapped, 2) + \
+            renumber(missing, 3) + renumber(model, 4) + footer
+
+        with OutputCapture() as output:
+            retcode = self.module.run(ensemble)
+
+        self.assertEqual(retcode, 1)
+        self.assertEqual(len(output.stdout), 0)
+        self.assertEqual(output.stderr,
+                         ["Models 1 and 3 differ:",
+                          "Atoms in model 1 only:",
+                          "    2  H   ASN A   1 "])
+
+        ensemble = header + model + renumber(swapped, 2) + \
+            renumber(model[:3] + model[2:], 3) + footer
+
+        with OutputCapture() as output:
+            retcode = self.module.run(ensemble)
+
+        self.assertEqual(retcode, 0)  # duplicated atoms are OK
+        self.assertEqual(output.stdout,
+                         ["Ensemble of 3 models *seems* OK"])
+
     def test_file_not_found(self):
         """$ pdb_chkensemble not_existing.pdb"""
 
@@ -109,6 +109,40 @@ class TestTool(unittest.TestCase):
         self.assertEqual(len(self.stdout), 160)
         self.assertEqual(len(self.stderr), 0)
 
+    def test_run_step(self):
+        """pdb_delres.run(fh, residues, step)"""
+
+        records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            lines = list(self.module.run(fh, set(range(1, 11)), 2))
+
+        # Every 2nd residue of the file, counted from the first.
+        residues = [l[21:26] for l in lines if l.startswith(records)]
+        deleted = set(['B   4', 'B   7', 'A   2', 'C   5'])
+        self.assertEqual(len(lines), 117)
+        self.assertFalse(deleted & set(residues))
+        self.assertIn('D   2', residues)
+
+    def test_range_chains(self):
+        """$ pdb_delres -A:1:3,B:5: data/dummy.pdb"""
+
+        # Simulate input
+        sys.argv = ['', '-A:1:3,B:5:', os.path.join(data_dir, 'dummy.pdb')]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 120)
+        self.assertEqual(len(self.stderr), 0)
+
+        records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+        residues = set(l[21:26] for l in self.stdout if l.startswith(records))
+        selected = set(['A   1', 'A   2', 'A   3', 'B   6', 'B   7',
+                        'B 301'])
+        self.assertFalse(residues & selected)
+
     def test_invalid_range_1(self):
         """$ pdb_delres --9998:: data/dummy.pdb"""
 
@@ -125,10 +159,10 @@ class TestTool(unittest.TestCase):
                          "ERROR!! Starting value")
 
     def test_invalid_range_2(self):
-        """$ pdb_delres -:10000: data/dummy.pdb"""
+        """$ pdb_delres -:2436112: data/dummy.pdb"""
 
         # Simulate input
-        sys.argv = ['', '-:10000:', os.path.join(data_dir, 'dummy.pdb')]
+        sys.argv = ['', '-:2436112:', os.path.join(data_dir, 'dummy.pdb')]
 
         # Execute the script
         self.exec_module()
@@ -0,0 +1,760 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `pdb_fetch`.
+
+Structures are downloaded from a local HTTP server standing in for the RCSB.
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from config import data_dir
+from utils import OutputCapture
+
+
+def read_fixture(name):
+    """Returns the contents of a file in the data directory."""
+    with open(os.path.join(data_dir, name), 'rb') as handle:
+        return handle.read()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves gzipped files from `files`, a dictionary of path: content.
+
+    Files listed in `held` are sent in two halves: the second half is only
+    sent once the `resume` event is set. Paths are added to `completed` once
+    fully sent. Conditional requests (If-Modified-Since) are answered with
+    304 Not Modified, unless the file is listed in `changed`.
+
+    Every response is delayed by `latency` seconds. Paths in `failures`
+    fail with 503 errors that many times before being sent. Paths in
+    `redirects` are redirected to another path. Connections are kept open
+    between requests (HTTP/1.1), and the port of the client of each request
+    is added to `connections`.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    files = {}
+    held = set()
+    changed = set()
+    latency = 0.0
+    failures = {}
+    redirects = {}
+    resume = threading.Event()
+    requests = []
+    conditional = []
+    completed = []
+    connections = []
+
+    def log_message(self, *args):
+        pass  # keep the test output clean
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        self.connections.append(self.client_address[1])
+        time.sleep(self.latency)
+
+        if self.failures.get(self.path):
+            self.failures[self.path] -= 1
+            self.send_error(503, 'Service Unavailable')
+            return
+
+        if self.path in self.redirects:
+            self.send_response(302)
+            self.send_header('Location', self.redirects[self.path])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.path not in self.files:
+            self.send_error(404, 'Not Found')
+            return
+
+        if self.headers.get('If-Modified-Since'):
+            self.conditional.append(self.path)
+            if self.path not in self.changed:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+        data = self.files[self.path]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+        if self.path in self.held:
+            half = len(data) // 2
+            self.wfile.write(data[:half])
+            self.wfile.flush()
+            self.resume.wait(10)
+            data = data[half:]
+        self.wfile.write(data)
+        self.completed.append(self.path)
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestTool(unittest.TestCase):
+    """
+    Generic class for testing tools.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base_url = 'http://127.0.0.1:{}/download/'.format(
+            cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        StandInHandler.resume.set()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools.pdb_fetch'
+        self.module = __import__(name, fromlist=[''])
+
+        self.pdb_data = read_fixture('dummy.pdb')
+        StandInHandler.files = {
+            '/download/1abc.pdb.gz': gzip.compress(self.pdb_data),
+            '/download/1abc.pdb1.gz': gzip.compress(self.pdb_data[:400]),
+            '/download/2bad.pdb.gz': b'not gzipped data',
+        }
+        StandInHandler.held = set()
+        StandInHandler.changed = set()
+        StandInHandler.latency = 0.0
+        StandInHandler.failures = {}
+        StandInHandler.redirects = {}
+        StandInHandler.connections = []
+        StandInHandler.resume.clear()
+        StandInHandler.requests = []
+        StandInHandler.conditional = []
+        StandInHandler.completed = []
+
+        self._base_url = self.module.BASE_URL
+        self.module.BASE_URL = self.base_url
+
+        self._backoff = self.module.BACKOFF
+        self.module.BACKOFF = 0.01
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = self.module._cache.Cache(self.cache_dir)
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.module.BASE_URL = self._base_url
+        self.module.BACKOFF = self._backoff
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.outdir)
+
+    def add_files(self, codes):
+        """Serves a copy of the test structure under each code."""
+        for code in codes:
+            path = '/download/{}.pdb.gz'.format(code)
+            StandInHandler.files[path] = StandInHandler.files[
+                '/download/1abc.pdb.gz']
+
+    def read_output(self, code):
+        """Returns the contents of a file written in the output directory."""
+        with open(os.path.join(self.outdir, code + '.pdb'), 'rb') as handle:
+            return handle.read()
+
+    def exec_module(self):
+        """
+        Execs module.
+        """
+
+        with OutputCapture() as output:
+            try:
+                self.module.main()
+            except SystemExit as e:
+                self.retcode = e.code
+
+        self.stdout = output.stdout
+        self.stderr = output.stderr
+
+        return
+
+    def test_default(self):
+        """$ pdb_fetch 1abc"""
+
+        sys.argv = ['', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data.decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.pdb.gz'])
+
+    def test_biounit(self):
+        """$ pdb_fetch -biounit 1ABC"""
+
+        sys.argv = ['', '-biounit', '1ABC']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data[:400].decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.pdb1.gz'])
+
+    def test_streaming(self):
+        """Lines are yielded before the download is complete"""
+
+        StandInHandler.files['/download/1abc.pdb.gz'] = gzip.compress(
+            self.pdb_data * 20)
+        StandInHandler.held.add('/download/1abc.pdb.gz')
+
+        lines = self.module.run('1abc')
+        first_line = next(lines)
+        self.assertEqual(StandInHandler.completed, [])
+        StandInHandler.resume.set()
+
+        result = first_line + ''.join(lines)
+        self.assertEqual(result, (self.pdb_data * 20).decode('utf-8'))
+
+    def test_concatenated_members(self):
+        """Concatenated gzip members are all decompressed"""
+
+        StandInHandler.files['/download/1abc.pdb.gz'] = (
+            gzip.compress(self.pdb_data[:400]) +
+            gzip.compress(self.pdb_data[400:]))
+
+        result = ''.join(self.module.run('1abc'))
+        self.assertEqual(result, self.pdb_data.decode('utf-8'))
+
+    def test_not_found(self):
+        """$ pdb_fetch 9xyz"""
+
+        sys.argv = ['', '9xyz']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr,
+                         ['[!] Error fetching structure: (404) Not Found'])
+
+    def test_corrupt_data(self):
+        """$ pdb_fetch 2bad"""
+
+        sys.argv = ['', '2bad']
+        self.exec_module()
+
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:30], '[!] Error fetching structure: ')
+
+    def test_cache(self):
+        """$ pdb_fetch -cache:<dir> 1abc"""
+
+        sys.argv = ['', '-cache:' + self.cache_dir, '1abc']
+        self.exec_module()
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data.decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.pdb.gz'])
+
+        cached = os.path.join(self.cache_dir, 'ab', '1abc.pdb.gz')
+        self.assertEqual(os.listdir(os.path.dirname(cached)), ['1abc.pdb.gz'])
+
+    def test_cache_env(self):
+        """$ PDBTOOLS_CACHE=<dir> pdb_fetch 1abc"""
+
+        os.environ['PDBTOOLS_CACHE'] = self.cache_dir
+        try:
+            sys.argv = ['', '1abc']
+            self.exec_module()
+            self.exec_module()
+        finally:
+            del os.environ['PDBTOOLS_CACHE']
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data.decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.pdb.gz'])
+
+    def test_cache_incomplete(self):
+        """Downloads are not cached if they are not read entirely"""
+
+        StandInHandler.files['/download/1abc.pdb.gz'] = gzip.compress(
+            self.pdb_data * 20)
+
+        lines = self.module.run('1abc', cache=self.cache)
+        next(lines)
+        lines.close()
+        self.assertEqual(self.cache.files(), [])
+
+    def test_cache_corrupt_data(self):
+        """Corrupt downloads are not cached"""
+
+        with OutputCapture() as output:
+            result = list(self.module.run('2bad', cache=self.cache))
+
+        self.assertEqual(result, [])
+        self.assertEqual(output.stderr[0][:30], '[!] Error fetching structure: ')
+        self.assertEqual(self.cache.files(), [])
+
+    def test_offline(self):
+        """$ pdb_fetch -offline -cache:<dir> 1abc"""
+
+        list(self.module.run('1abc', cache=self.cache))
+        self.module.BASE_URL = 'http://127.0.0.1:1/'  # unreachable
+
+        sys.argv = ['', '-offline', '-cache:' + self.cache_dir, '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data.decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.pdb.gz'])
+
+    def test_offline_not_cached(self):
+        """$ pdb_fetch -offline -cache:<dir> 1abc (empty cache)"""
+
+        sys.argv = ['', '-offline', '-cache:' + self.cache_dir, '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(
+            self.stderr,
+            ['[!] Error fetching structure: not in cache (offline mode)'])
+        self.assertEqual(StandInHandler.requests, [])
+
+    def test_offline_without_cache(self):
+        """$ pdb_fetch -offline 1abc"""
+
+        sys.argv = ['', '-offline', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(
+            self.stderr[0],
+            'ERROR!! The -offline option requires a cache directory')
+
+    def _expire(self, name):
+        """Makes a cached file older than the time-to-live."""
+        self.cache.ttl = 60
+        path = self.cache.path(name)
+        old = time.time() - 3600
+        os.utime(path, (old, old))
+        return path
+
+    def test_revalidate_not_modified(self):
+        """Expired files are revalidated and kept if not modified"""
+
+        list(self.module.run('1abc', cache=self.cache))
+        path = self._expire('1abc.pdb.gz')
+
+        result = ''.join(self.module.run('1abc', cache=self.cache))
+
+        self.assertEqual(result, self.pdb_data.decode('utf-8'))
+        self.assertEqual(StandInHandler.conditional, ['/download/1abc.pdb.gz'])
+        self.assertTrue(self.cache.is_fresh(path))
+
+        # Fresh again: no request
+        list(self.module.run('1abc', cache=self.cache))
+        self.assertEqual(len(StandInHandler.requests), 2)
+
+    def test_revalidate_modified(self):
+        """Expired files are downloaded again if modified"""
+
+        list(self.module.run('1abc', cache=self.cache))
+        self._expire('1abc.pdb.gz')
+
+        new_data = self.pdb_data[:400]
+        StandInHandler.files['/download/1abc.pdb.gz'] = gzip.compress(new_data)
+        StandInHandler.changed.add('/download/1abc.pdb.gz')
+
+        result = ''.join(self.module.run('1abc', cache=self.cache))
+        self.assertEqual(result, new_data.decode('utf-8'))
+
+        self.module.BASE_URL = 'http://127.0.0.1:1/'  # unreachable
+        result = ''.join(self.module.run('1abc', cache=self.cache,
+                                         offline=True))
+        self.assertEqual(result, new_data.decode('utf-8'))
+
+    def test_revalidate_unreachable(self):
+        """Expired files are used if the server cannot be reached"""
+
+        list(self.module.run('1abc', cache=self.cache))
+        self._expire('1abc.pdb.gz')
+        self.module.BASE_URL = 'http://127.0.0.1:1/'  # unreachable
+
+        with OutputCapture() as output:
+            result = ''.join(self.module.run('1abc', cache=self.cache))
+
+        self.assertEqual(result, self.pdb_data.decode('utf-8'))
+        self.assertEqual(output.stderr[0][:28], '[!] Using cached structure: ')
+
+    def test_redirect(self):
+        """Redirects are followed"""
+
+        StandInHandler.redirects['/download/9xyz.pdb.gz'] = (
+            '/download/1abc.pdb.gz')
+
+        result = ''.join(self.module.run('9xyz'))
+        self.assertEqual(result, self.pdb_data.decode('utf-8'))
+
+    def test_keepalive(self):
+        """Connections are reused between downloads"""
+
+        self.module._POOL.close()
+        for _ in range(3):
+            list(self.module.run('1abc'))
+        list(self.module.run('9xyz'))  # errors too
+
+        self.assertEqual(len(StandInHandler.requests), 4)
+        self.assertEqual(len(set(StandInHandler.connections)), 1)
+
+    def test_batch(self):
+        """$ pdb_fetch -outdir:<dir> 1abc 2abc <file>"""
+
+        self.add_files(['2abc', '3abc', '4abc'])
+        codes_file = os.path.join(self.outdir, 'codes.txt')
+        with open(codes_file, 'w') as handle:
+            handle.write('# structures\n3abc, 4abc\n2ABC\n')
+
+        sys.argv = ['', '-outdir:' + self.outdir, '1abc', '2abc', codes_file]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(len(self.stderr), 5)
+        self.assertEqual(self.stderr[-1],
+                         'Fetched 4 structures, skipped 0, failed 0')
+        self.assertEqual(len(StandInHandler.requests), 4)
+        for code in ['1abc', '2abc', '3abc', '4abc']:
+            self.assertEqual(self.read_output(code), self.pdb_data)
+
+    def test_batch_skip_existing(self):
+        """$ pdb_fetch -outdir:<dir> 1abc 2abc (1abc.pdb exists)"""
+
+        self.add_files(['2abc'])
+        with open(os.path.join(self.outdir, '1abc.pdb'), 'w') as handle:
+            handle.write('END\n')
+
+        sys.argv = ['', '-outdir:' + self.outdir, '1abc', '2abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(self.stderr[-1],
+                         'Fetched 1 structures, skipped 1, failed 0')
+        self.assertEqual(StandInHandler.requests, ['/download/2abc.pdb.gz'])
+        self.assertEqual(self.read_output('1abc'), b'END\n')
+
+    def test_batch_retry(self):
+        """Transient server errors are retried"""
+
+        StandInHandler.failures['/download/1abc.pdb.gz'] = 2
+
+        sys.argv = ['', '-outdir:' + self.outdir, '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(StandInHandler.requests,
+                         ['/download/1abc.pdb.gz'] * 3)
+        self.assertEqual(self.read_output('1abc'), self.pdb_data)
+
+    def test_batch_failures(self):
+        """Failed downloads do not stop the others"""
+
+        self.add_files(['2abc', '3abc'])
+        StandInHandler.failures['/download/2abc.pdb.gz'] = 100
+
+        sys.argv = ['', '-outdir:' + self.outdir, '-nconn:2',
+                    '1abc', '2abc', '3abc', '9xyz']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(self.stderr[-1],
+                         'Fetched 2 structures, skipped 0, failed 2')
+        self.assertIn('2abc: [!] Error fetching structure: '
+                      '(503) Service Unavailable', '\n'.join(self.stderr))
+        self.assertIn('9xyz: [!] Error fetching structure: '
+                      '(404) Not Found', '\n'.join(self.stderr))
+
+        # Server errors are retried, missing files are not.
+        requests = StandInHandler.requests
+        self.assertEqual(requests.count('/download/2abc.pdb.gz'),
+                         self.module.RETRIES + 1)
+        self.assertEqual(requests.count('/download/9xyz.pdb.gz'), 1)
+
+        self.assertEqual(sorted(os.listdir(self.outdir)),
+                         ['1abc.pdb', '3abc.pdb'])
+
+    def test_batch_concurrent(self):
+        """Downloads run concurrently"""
+
+        codes = ['{}abc'.format(i) for i in range(1, 9)]
+        self.add_files(codes)
+        StandInHandler.latency = 0.25
+
+        start = time.time()
+        counts = self.module.fetch_all(codes, self.outdir, nconn=8)
+        elapsed = time.time() - start
+
+        self.assertEqual(counts, {'fetched': 8, 'skipped': 0, 'failed': 0})
+        self.assertLess(elapsed, 8 * 0.25 / 2)
+
+    def test_batch_requires_outdir(self):
+        """$ pdb_fetch 1abc 2abc"""
+
+        sys.argv = ['', '1abc', '2abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr, self.module.__doc__.split("\n")[:-1])
+
+    def test_invalid_nconn(self):
+        """$ pdb_fetch -outdir:<dir> -nconn:0 1abc"""
+
+        sys.argv = ['', '-outdir:' + self.outdir, '-nconn:0', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(
+            self.stderr[0],
+            'ERROR!! Number of connections must be a positive integer')
+
+    def add_cif_files(self):
+        """Serves the test structure in mmCIF and BinaryCIF formats."""
+        from pdbtools import pdb_fromcif, pdb_tocif
+
+        pdb_lines = self.pdb_data.decode('utf-8').splitlines(True)
+        cif_data = ''.join(pdb_tocif.run(pdb_lines)).encode('utf-8')
+        bcif_data = pdb_tocif.to_bcif(pdb_lines)
+
+        StandInHandler.files.update({
+            '/download/1abc.cif.gz': gzip.compress(cif_data),
+            '/download/1abc-assembly2.cif.gz': gzip.compress(cif_data),
+            '/download/1abc.bcif.gz': gzip.compress(bcif_data),
+        })
+
+        cif_lines = cif_data.decode('utf-8').splitlines(True)
+        return ''.join(pdb_fromcif.run(cif_lines)).splitlines()
+
+    def test_format_cif(self):
+        """$ pdb_fetch -format:cif 1abc"""
+
+        expected = self.add_cif_files()
+        sys.argv = ['', '-format:cif', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout, expected)
+        self.assertEqual(len(self.stdout), 186)  # 185 atoms + END
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.cif.gz'])
+
+    def test_format_bcif(self):
+        """$ pdb_fetch -format:bcif 1abc"""
+
+        expected = self.add_cif_files()
+        sys.argv = ['', '-format:bcif', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout, expected)
+        self.assertEqual(StandInHandler.requests, ['/download/1abc.bcif.gz'])
+
+    def test_format_cif_streaming(self):
+        """mmCIF files are converted before the download is complete"""
+        from pdbtools import pdb_tocif
+
+        atoms = [l for l in self.pdb_data.decode('utf-8').splitlines(True)
+                 if l.startswith(('ATOM', 'HETATM'))]
+        pdb_lines = []
+        for model_no in range(1, 21):
+            pdb_lines.append('MODEL {:>8d}\n'.format(model_no))
+            pdb_lines.extend(atoms)
+            pdb_lines.append('ENDMDL\n')
+        cif_data = ''.join(pdb_tocif.run(pdb_lines)).encode('utf-8')
+
+        StandInHandler.files['/download/1abc.cif.gz'] = gzip.compress(cif_data)
+        StandInHandler.held.add('/download/1abc.cif.gz')
+
+        lines = self.module.run('1abc', fmt='cif')
+        self.assertEqual(next(lines), 'MODEL     1\n')
+        self.assertEqual(StandInHandler.completed, [])
+        StandInHandler.resume.set()
+
+        self.assertEqual(len(list(lines)), 20 * (len(atoms) + 2))
+
+    def test_biounit_number(self):
+        """$ pdb_fetch -biounit:2 -format:cif 1abc"""
+
+        expected = self.add_cif_files()
+        sys.argv = ['', '-biounit:2', '-format:cif', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(self.stdout, expected)
+        self.assertEqual(StandInHandler.requests,
+                         ['/download/1abc-assembly2.cif.gz'])
+
+        sys.argv = ['', '-biounit:3', '1abc']
+        self.exec_module()
+        self.assertEqual(StandInHandler.requests[-1],
+                         '/download/1abc.pdb3.gz')
+
+    def test_batch_format_cif(self):
+        """$ pdb_fetch -outdir:<dir> -biounit:2 -format:cif 1abc"""
+
+        expected = self.add_cif_files()
+        sys.argv = ['', '-outdir:' + self.outdir, '-biounit:2',
+                    '-format:cif', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        with open(os.path.join(self.outdir, '1abc.pdb2')) as handle:
+            self.assertEqual(handle.read().splitlines(), expected)
+
+    def test_mirrors(self):
+        """Mirrors are tried in order until one sends the file"""
+
+        unreachable = 'http://127.0.0.1:1/download/'
+        missing = self.base_url + 'missing/'
+        sys.argv = ['', '-mirror:' + unreachable, '-mirror:' + missing,
+                    '-mirror:' + self.base_url.rstrip('/'), '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         self.pdb_data.decode('utf-8').splitlines())
+        self.assertEqual(StandInHandler.requests,
+                         ['/download/missing/1abc.pdb.gz',
+                          '/download/1abc.pdb.gz'])
+
+    def test_mirrors_env(self):
+        """$ PDBTOOLS_MIRRORS=<url>,<url> pdb_fetch 1abc"""
+
+        os.environ['PDBTOOLS_MIRRORS'] = 'http://127.0.0.1:1/,' + self.base_url
+        try:
+            result = ''.join(self.module.run('1abc'))
+        finally:
+            del os.environ['PDBTOOLS_MIRRORS']
+
+        self.assertEqual(result, self.pdb_data.decode('utf-8'))
+
+    def test_mirrors_all_fail(self):
+        """The error of the last mirror is reported"""
+
+        mirrors = ['http://127.0.0.1:1/', self.base_url]
+        with OutputCapture() as output:
+            result = list(self.module.run('9xyz', mirrors=mirrors))
+
+        self.assertEqual(result, [])
+        self.assertEqual(output.stderr,
+                         ['[!] Error fetching structure: (404) Not Found'])
+
+    def test_invalid_format(self):
+        """$ pdb_fetch -format:xml 1abc"""
+
+        sys.argv = ['', '-format:xml', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! Format must be one of pdb, cif, bcif: 'xml'")
+
+    def test_invalid_biounit(self):
+        """$ pdb_fetch -biounit:2 -format:bcif 1abc"""
+
+        sys.argv = ['', '-biounit:2', '-format:bcif', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(
+            self.stderr[0],
+            'ERROR!! Biounits are not available in BinaryCIF format')
+
+        sys.argv = ['', '-biounit:0', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(self.stderr[0],
+                         'ERROR!! Biounit number must be a positive integer')
+
+    def test_invalid_option(self):
+        """$ pdb_fetch -cache 1abc"""
+
+        sys.argv = ['', '-cache', '1abc']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0], "ERROR!! Invalid option: '-cache'")
+
+    def test_invalid_code(self):
+        """$ pdb_fetch 1abcd"""
+
+        sys.argv = ['', '1abcd']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0], "ERROR!! Invalid PDB code: '1abcd'")
+
+    def test_helptext(self):
+        """$ pdb_fetch"""
+
+        sys.argv = ['']
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr, self.module.__doc__.split("\n")[:-1])
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
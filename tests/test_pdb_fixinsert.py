@@ -139,6 +139,21 @@ class TestTool(unittest.TestCase):
 
         self.assertEqual(resid, expected)
 
+    def test_hybrid36(self):
+        """Residue numbers above 9999 are read and written in hybrid-36"""
+
+        from pdbtools import pdb_shiftres
+
+        fpath = os.path.join(data_dir, 'dummy_insertions.pdb')
+        with open(fpath) as fh:
+            lines = fh.readlines()
+
+        shifted = list(pdb_shiftres.run(lines, 10000))
+        for options, shifted_options in (([], []), (['A1'], ['A10001'])):
+            expected = pdb_shiftres.run(self.module.run(lines, options), 10000)
+            result = self.module.run(shifted, shifted_options)
+            self.assertEqual(list(result), list(expected))
+
     def test_file_not_found(self):
         """$ pdb_fixinsert not_existing.pdb"""
 
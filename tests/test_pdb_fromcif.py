@@ -19,8 +19,11 @@
 Unit Tests for `pdb_fromcif`.
 """
 
+import gzip
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from config import data_dir
@@ -73,6 +76,300 @@ class TestTool(unittest.TestCase):
         records = [l[:6] for l in self.stdout]
         self.assertEqual(records, expected)
 
+    def test_ensemble_option(self):
+        """$ pdb_fromcif -ensemble data/ensemble_OK.cif"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.cif')
+        sys.argv = ['', '-ensemble', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 9)
+        self.assertEqual(len(self.stderr), 0)
+
+        expected = ['MODEL ', 'ATOM  ', 'ATOM  ', 'ENDMDL',
+                    'MODEL ', 'ATOM  ', 'ATOM  ', 'ENDMDL', 'END   ']
+        records = [l[:6] for l in self.stdout]
+        self.assertEqual(records, expected)
+
+    def test_streaming(self):
+        """Models are yielded before the rest of the file is read"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.cif')
+        with open(fpath) as handle:
+            lines = handle.readlines()
+
+        n_read = [0]
+
+        def _reader():
+            for line in lines:
+                n_read[0] += 1
+                yield line
+
+        # First model is written when the second starts.
+        result = self.module.run(_reader())
+        self.assertEqual(next(result)[:6], 'MODEL ')
+        self.assertLess(n_read[0], len(lines))
+
+        # With -ensemble, the first atom is written right away.
+        n_read[0] = 0
+        result = self.module.run(_reader(), ensemble=True)
+        self.assertEqual(next(result)[:6], 'MODEL ')
+        self.assertEqual(next(result)[:6], 'ATOM  ')
+        self.assertEqual(lines[n_read[0] - 1][:6], 'ATOM  ')
+        self.assertLess(n_read[0], len(lines) - 2)
+
+    def test_quoted_values(self):
+        """Quoted atom names and multi-line rows are converted"""
+
+        cif = [
+            'data_test\n',
+            '#\n',
+            'loop_\n',
+            '_atom_site.group_PDB\n',
+            '_atom_site.type_symbol\n',
+            '_atom_site.label_atom_id\n',
+            '_atom_site.label_comp_id\n',
+            '_atom_site.label_asym_id\n',
+            '_atom_site.label_seq_id\n',
+            '_atom_site.Cartn_x\n',
+            '_atom_site.Cartn_y\n',
+            '_atom_site.Cartn_z\n',
+            '_atom_site.occupancy\n',
+            '_atom_site.B_iso_or_equiv\n',
+            '_atom_site.pdbx_formal_charge\n',
+            'HETATM O "O5\'" DA B 3 1.000 2.000 3.000 1.00 10.00 -1\n',
+            "HETATM C 'C1\"' DA B 3\n",
+            '4.000 5.000 6.000 1.00 10.00 ?\n',
+            '#\n',
+        ]
+
+        result = list(self.module.run(cif))
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0][12:27], " O5' DA  B   3 ")
+        self.assertEqual(result[0][78:80], '1-')
+        self.assertEqual(result[1][12:27], ' C1" DA  B   3 ')
+        self.assertEqual(result[1][30:54], '   4.000   5.000   6.000')
+        self.assertEqual(result[1][78:80], '  ')
+
+    def test_hybrid36(self):
+        """Residue numbers above 9999 are written in hybrid-36"""
+
+        cif = [
+            'data_test\n',
+            'loop_\n',
+            '_atom_site.group_PDB\n',
+            '_atom_site.label_atom_id\n',
+            '_atom_site.label_comp_id\n',
+            '_atom_site.label_asym_id\n',
+            '_atom_site.label_seq_id\n',
+            '_atom_site.Cartn_x\n',
+            '_atom_site.Cartn_y\n',
+            '_atom_site.Cartn_z\n',
+            'ATOM CA ALA A 9999 1.000 2.000 3.000\n',
+            'ATOM CA ALA A 10000 1.000 2.000 3.000\n',
+            'ATOM CA ALA A 10036 1.000 2.000 3.000\n',
+            '#\n',
+        ]
+
+        result = list(self.module.run(cif))
+        self.assertEqual([l[22:26] for l in result[:3]],
+                         ['9999', 'A000', 'A010'])
+
+    def write_cif(self, lines):
+        """Writes a mmCIF file to a temporary directory."""
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+
+        fpath = os.path.join(tempdir, 'test.cif')
+        with open(fpath, 'w') as handle:
+            handle.write(''.join(lines))
+        return fpath
+
+    def test_nproc(self):
+        """Parallel conversion gives the same output as a single process"""
+
+        with open(os.path.join(data_dir, 'ensemble_OK.cif')) as handle:
+            header = [l for l in handle if not l.startswith('ATOM')]
+
+        row = 'ATOM {0} N N . ASN . . {1} ? 1.0 2.0 3.0 1.00 0.00 0 A {2}\n'
+        atoms = [row.format(i, i // 3 + 1, m)
+                 for m in (1, 2, 3) for i in range(1, 41)]
+        fpath = self.write_cif(header + atoms + ['#\n'])
+
+        chunk_size = self.module.CHUNK_SIZE_MIN
+        self.addCleanup(setattr, self.module, 'CHUNK_SIZE_MIN', chunk_size)
+        self.module.CHUNK_SIZE_MIN = 100
+
+        tags, start, end = self.module._locate_rows(fpath)
+        self.assertEqual(len(tags), 18)
+        self.assertGreater(len(self.module._split_rows(fpath, start, end, 8)),
+                           1)
+
+        for ensemble in (False, True):
+            with open(fpath) as handle:
+                expected = list(self.module.run(handle, ensemble))
+            with open(fpath) as handle:
+                result = list(self.module.run(handle, ensemble, nproc=3))
+            self.assertEqual(result, expected)
+
+        self.assertEqual(len(expected), 127)
+        self.assertEqual(expected[43][:11], 'ATOM      1')
+
+    def test_nproc_multiline_rows(self):
+        """Files with rows over several lines are converted in one process"""
+
+        cif = [
+            'data_test\n',
+            'loop_\n',
+            '_atom_site.group_PDB\n',
+            '_atom_site.label_atom_id\n',
+            '_atom_site.label_comp_id\n',
+            '_atom_site.label_asym_id\n',
+            '_atom_site.label_seq_id\n',
+            '_atom_site.Cartn_x\n',
+            '_atom_site.Cartn_y\n',
+            '_atom_site.Cartn_z\n',
+            'ATOM CA ALA A 1 1.000 2.000 3.000\n',
+            'ATOM CA ALA A 2\n',
+            '4.000 5.000 6.000\n',
+            '#\n',
+        ]
+        fpath = self.write_cif(cif)
+
+        with open(fpath) as handle:
+            result = list(self.module.run(handle, nproc=2))
+        self.assertEqual(result, list(self.module.run(cif)))
+        self.assertEqual(len(result), 3)
+
+    def test_nproc_option(self):
+        """$ pdb_fromcif -nproc:2 data/ensemble_OK.cif"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.cif')
+        sys.argv = ['', '-nproc:2', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 9)
+        self.assertEqual(len(self.stderr), 0)
+
+    def test_invalid_nproc(self):
+        """$ pdb_fromcif -nproc:0 data/ensemble_OK.cif"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.cif')
+        sys.argv = ['', '-nproc:0', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:39],
+                         "ERROR!! Number of processes must be a p")
+
+    def test_outdir(self):
+        """$ pdb_fromcif -outdir:<dir> data/ensemble_OK.cif <dir>"""
+
+        indir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, indir)
+        outdir = os.path.join(indir, 'out')
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.cif')
+        os.mkdir(os.path.join(indir, 'sub'))
+        shutil.copy(fpath, os.path.join(indir, 'sub', 'copy.cif'))
+        with open(os.path.join(indir, 'bad.cif'), 'w') as handle:
+            handle.write('loop_\n_atom_site.group_PDB\nATOM\n')
+
+        sys.argv = ['', '-outdir:' + outdir, fpath, indir]
+        self.exec_module()
+
+        # Errors in one file do not stop the others
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(len(self.stderr), 4)
+        self.assertEqual(self.stderr[-1],
+                         'Converted 2 files, skipped 0, failed 1')
+        self.assertIn('failed', self.stderr[1])
+
+        with open(os.path.join(outdir, 'sub', 'copy.pdb')) as handle:
+            result = handle.readlines()
+        with open(fpath) as handle:
+            self.assertEqual(result, list(self.module.run(handle)))
+        self.assertEqual(sorted(os.listdir(outdir)),
+                         ['ensemble_OK.pdb', 'sub'])
+
+        # Up-to-date files are skipped
+        self.exec_module()
+        self.assertEqual(self.stderr[-1],
+                         'Converted 0 files, skipped 2, failed 1')
+
+    def write_bcif(self, compress=False):
+        """Writes data/dummy.pdb as BinaryCIF, and as text mmCIF lines."""
+        from pdbtools import pdb_tocif
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as handle:
+            pdb_lines = handle.readlines()
+
+        fpath = os.path.join(tempdir, 'dummy.bcif')
+        data = pdb_tocif.to_bcif(pdb_lines)
+        if compress:
+            fpath += '.gz'
+            data = gzip.compress(data)
+        with open(fpath, 'wb') as handle:
+            handle.write(data)
+
+        cif_lines = ''.join(pdb_tocif.run(pdb_lines)).splitlines(True)
+        return fpath, cif_lines
+
+    def test_bcif(self):
+        """$ pdb_fromcif dummy.bcif"""
+
+        fpath, cif_lines = self.write_bcif()
+        sys.argv = ['', fpath]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        expected = ''.join(self.module.run(cif_lines)).splitlines()
+        self.assertEqual(self.stdout, expected)
+        self.assertEqual(len(self.stdout), 186)  # 185 atoms + END
+
+    def test_bcif_compressed(self):
+        """$ pdb_fromcif dummy.bcif.gz"""
+
+        fpath, cif_lines = self.write_bcif(compress=True)
+        sys.argv = ['', fpath]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        expected = ''.join(self.module.run(cif_lines)).splitlines()
+        self.assertEqual(self.stdout, expected)
+
+    def test_bcif_malformed(self):
+        """$ pdb_fromcif malformed.bcif"""
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        fpath = os.path.join(tempdir, 'malformed.bcif')
+        with open(fpath, 'wb') as handle:
+            handle.write(b'\x83\xa7version\xa50.3.0')
+
+        sys.argv = ['', fpath]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertTrue(self.stderr[0].startswith(
+            'ERROR!! Could not parse mmCIF file'))
+
     def test_file_not_found(self):
         """$ pdb_fromcif not_existing.pdb"""
 
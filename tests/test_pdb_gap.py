@@ -74,6 +74,97 @@ class TestTool(unittest.TestCase):
                           "C:GLU2 <   95.75A > C:MET-1",
                           "Found 4 gap(s) in the structure"])
 
+    def test_trace_CN(self):
+        """$ pdb_gap -trace:CN data/dummy.pdb"""
+
+        sys.argv = ['', '-trace:CN', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         ["B:ARG4 < Seq. Gap > B:GLU6",
+                          "C:ARG5 < Seq. Gap > C:GLU2",
+                          "C:GLU2 <   96.38A > C:MET-1",
+                          "Found 3 gap(s) in the structure"])
+
+    def test_trace_P(self):
+        """$ pdb_gap -trace:P data/dummy.pdb"""
+
+        sys.argv = ['', '-trace:P', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout, ["Found 0 gap(s) in the structure"])
+
+    def test_cutoff(self):
+        """$ pdb_gap -cutoff:10 data/dummy.pdb"""
+
+        sys.argv = ['', '-cutoff:10', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         ["B:ARG4 < Seq. Gap > B:GLU6",
+                          "A:ASN1 < Seq. Gap > A:ASN1",
+                          "C:ARG5 < Seq. Gap > C:GLU2",
+                          "C:GLU2 <   95.75A > C:MET-1",
+                          "Found 4 gap(s) in the structure"])
+
+    def test_table(self):
+        """$ pdb_gap -cutoff:3.8 -table data/dummy.pdb"""
+
+        sys.argv = ['', '-cutoff:3.8', '-table',
+                    os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(self.stdout,
+                         ["model\tchain\tresname_1\tresnum_1\tresname_2\t"
+                          "resnum_2\tdistance\ttype",
+                          "0\tB\tARG\t4\tGLU\t6\t3.82\tdistance",
+                          "0\tA\tASN\t1\tASN\t1\t9.42\tdistance",
+                          "0\tA\tARG\t2\tGLU\t3\t3.84\tdistance",
+                          "0\tC\tARG\t5\tGLU\t2\t3.82\tdistance",
+                          "0\tC\tGLU\t2\tMET\t-1\t95.75\tdistance"])
+
+    def test_hybrid36(self):
+        """$ pdb_shiftres 10000 data/dummy.pdb | pdb_gap -table"""
+
+        from pdbtools import pdb_shiftres
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as handle:
+            lines = list(pdb_shiftres.run(handle, 10000))
+        resnums = set(line[22:26] for line in lines if line[:4] == 'ATOM')
+        self.assertIn('A001', resnums)  # 10001 in hybrid-36
+
+        with OutputCapture() as output:
+            self.module.run(lines, cutoff=3.8, table=True)
+
+        self.assertEqual(output.stdout[1:],
+                         ["0\tB\tARG\t10004\tGLU\t10006\t3.82\tdistance",
+                          "0\tA\tASN\t10001\tASN\t10001\t9.42\tdistance",
+                          "0\tA\tARG\t10002\tGLU\t10003\t3.84\tdistance",
+                          "0\tC\tARG\t10005\tGLU\t10002\t3.82\tdistance",
+                          "0\tC\tGLU\t10002\tMET\t9999\t95.75\tdistance"])
+
+        with OutputCapture() as output:
+            self.module.run(lines)
+
+        self.assertEqual(output.stdout,
+                         ["B:ARG10004 < Seq. Gap > B:GLU10006",
+                          "A:ASN10001 <    9.42A > A:ASN10001",
+                          "C:ARG10005 < Seq. Gap > C:GLU10002",
+                          "C:GLU10002 <   95.75A > C:MET9999",
+                          "Found 4 gap(s) in the structure"])
+
     def test_file_not_found(self):
         """$ pdb_gap not_existing.pdb"""
 
@@ -114,6 +205,30 @@ class TestTool(unittest.TestCase):
         self.assertEqual(self.stderr[0][:36],
                          "ERROR!! Script takes 1 argument, not")
 
+    def test_invalid_trace(self):
+        """$ pdb_gap -trace:CB data/dummy.pdb"""
+
+        sys.argv = ['', '-trace:CB', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:31],
+                         "ERROR!! Trace must be one of CA")
+
+    def test_invalid_cutoff(self):
+        """$ pdb_gap -cutoff:-1 data/dummy.pdb"""
+
+        sys.argv = ['', '-cutoff:-1', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:40],
+                         "ERROR!! Cutoff must be a positive number")
+
 
 if __name__ == '__main__':
     from config import test_dir
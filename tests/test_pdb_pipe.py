@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Tests for `pdb_pipe`.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from config import data_dir
+from utils import OutputCapture
+
+
+class TestTool(unittest.TestCase):
+    """
+    Generic class for testing tools.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools.pdb_pipe'
+        self.module = __import__(name, fromlist=[''])
+
+    def exec_module(self):
+        """
+        Execs module.
+        """
+
+        with OutputCapture() as output:
+            try:
+                self.module.main()
+            except SystemExit as e:
+                self.retcode = e.code
+
+        self.stdout = output.stdout
+        self.stderr = output.stderr
+
+        return
+
+    def test_single_tool(self):
+        """$ pdb_pipe -selchain:A data/dummy.pdb"""
+
+        sys.argv = ['', '-selchain:A', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 76)  # same as pdb_selchain -A
+        self.assertEqual(len(self.stderr), 0)  # no stats by default
+
+    def test_stats(self):
+        """$ pdb_pipe -stats -selchain:A data/dummy.pdb"""
+
+        sys.argv = ['', '-stats', '-selchain:A',
+                    os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 76)
+        self.assertEqual(len(self.stderr), 2)  # input + 1 tool
+        self.assertEqual(self.stderr[1].split()[:2], ['pdb_selchain', '76'])
+
+    def test_multiple_tools(self):
+        """$ pdb_pipe -stats -'selchain:A,B|delhetatm|reres:1|tidy' dummy.pdb"""
+
+        from pdbtools import pdb_selchain, pdb_delhetatm, pdb_reres, pdb_tidy
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-stats', '-selchain:A,B|delhetatm|reres:1|tidy',
+                    fpath]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 5)  # input + 4 tools
+
+        with open(fpath) as fh:
+            data = pdb_selchain.run(fh, set(['A', 'B']))
+            data = pdb_delhetatm.run(data)
+            data = pdb_reres.run(data, 1)
+            data = pdb_tidy.run(data, '')
+            expected = ''.join(data).splitlines()
+
+        self.assertEqual(self.stdout, expected)
+
+    def test_selres(self):
+        """$ pdb_pipe -'selchain:A,B|selres:::5|reres:1' data/dummy.pdb"""
+
+        from pdbtools import _ranges, pdb_selchain, pdb_selres, pdb_reres
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-selchain:A,B|selres:::5|reres:1', fpath]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+
+        # Steps count the residues of the output of selchain
+        with open(fpath) as fh:
+            data = pdb_selchain.run(fh, set(['A', 'B']))
+            data = pdb_selres.run(data, _ranges.ResidueRanges.parse('::5'))
+            data = pdb_reres.run(data, 1)
+            expected = ''.join(data).splitlines()
+
+        self.assertEqual(self.stdout, expected)
+
+    def test_run_stats(self):
+        """pdb_pipe.run fills stats in order"""
+
+        from pdbtools import pdb_selchain, pdb_delhetatm
+
+        pipeline = [
+            ('pdb_selchain', pdb_selchain.run, (set(['A', 'B']),)),
+            ('pdb_delhetatm', pdb_delhetatm.run, ()),
+        ]
+
+        stats = []
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            lines = list(self.module.run(fh, pipeline, stats))
+
+        self.assertEqual(len(lines), 125)
+        self.assertEqual([s[0] for s in stats],
+                         ['input', 'pdb_selchain', 'pdb_delhetatm'])
+        self.assertEqual([s[1] for s in stats], [204, 129, 125])
+        self.assertTrue(all(s[2] >= 0 for s in stats))
+
+    def test_bcif_output(self):
+        """$ pdb_pipe -'selchain:A|tocif:bcif' data/dummy.pdb"""
+
+        from pdbtools import pdb_selchain, pdb_tocif
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-selchain:A|tocif:bcif', fpath]
+
+        stdout = sys.stdout
+        sys.stdout = io.TextIOWrapper(io.BytesIO())
+        try:
+            self.module.main()
+        except SystemExit as e:
+            self.retcode = e.code
+        finally:
+            sys.stdout.flush()
+            result = sys.stdout.buffer.getvalue()
+            sys.stdout = stdout
+
+        self.assertEqual(self.retcode, 0)
+        with open(fpath) as fh:
+            expected = pdb_tocif.to_bcif(pdb_selchain.run(fh, set(['A'])))
+        self.assertEqual(result, expected)
+
+    def test_bcif_output_not_last(self):
+        """$ pdb_pipe -'tocif:bcif|selchain:A' data/dummy.pdb"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-tocif:bcif|selchain:A', fpath]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! BinaryCIF output must be the last step: "
+                         "'tocif:bcif'")
+
+    def _write_bcif(self):
+        """Writes dummy.pdb as a BinaryCIF file, and returns its path."""
+        from pdbtools import pdb_tocif
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            data = pdb_tocif.to_bcif(fh)
+
+        handle, path = tempfile.mkstemp(suffix='.bcif')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'wb') as outfile:
+            outfile.write(data)
+        return path
+
+    def test_bcif_input(self):
+        """$ pdb_pipe -'fromcif|selchain:A' dummy.bcif"""
+
+        from pdbtools import pdb_fromcif, pdb_selchain
+
+        fpath = self._write_bcif()
+        with open(fpath) as fh:
+            data = pdb_fromcif.run(fh)
+            expected = ''.join(pdb_selchain.run(data, set(['A'])))
+
+        for stats in ([], ['-stats']):
+            sys.argv = [''] + stats + ['-fromcif|selchain:A', fpath]
+
+            self.exec_module()
+
+            self.assertEqual(self.retcode, 0)
+            self.assertEqual(self.stdout, expected.splitlines())
+
+    def test_bcif_input_not_fromcif(self):
+        """$ pdb_pipe -'selchain:A' dummy.bcif"""
+
+        sys.argv = ['', '-selchain:A', self._write_bcif()]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! BinaryCIF files must be read with fromcif, "
+                         "as the first step")
+
+    def test_invalid_tool_option(self):
+        """$ pdb_pipe -selchain:AB data/dummy.pdb"""
+
+        sys.argv = ['', '-selchain:AB', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:40],
+                         "ERROR!! Chain identifier name is invalid")
+
+    def test_unknown_tool(self):
+        """$ pdb_pipe -foo data/dummy.pdb"""
+
+        sys.argv = ['', '-foo', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0], "ERROR!! Tool not found: 'pdb_foo'")
+
+    def test_not_pipeable(self):
+        """$ pdb_pipe -'selchain:A|wc' data/dummy.pdb"""
+
+        sys.argv = ['', '-selchain:A|wc', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! Tool cannot be used in a pipeline: 'pdb_wc'")
+
+    def test_empty_step(self):
+        """$ pdb_pipe -'selchain:A||tidy' data/dummy.pdb"""
+
+        sys.argv = ['', '-selchain:A||tidy', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:47],
+                         "ERROR!! You must provide a pipeline of one or m")
+
+    def test_file_not_found(self):
+        """$ pdb_pipe not_existing.pdb"""
+
+        afile = os.path.join(data_dir, 'not_existing.pdb')
+        sys.argv = ['', afile]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)  # exit code is 1 (error)
+        self.assertEqual(len(self.stdout), 0)  # nothing written to stdout
+        self.assertEqual(self.stderr[0][:22],
+                         "ERROR!! File not found")  # proper error message
+
+    def test_file_missing(self):
+        """$ pdb_pipe -tidy"""
+
+        sys.argv = ['', '-tidy']
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)  # no output
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! No data to process!")
+
+    def test_helptext(self):
+        """$ pdb_pipe"""
+
+        sys.argv = ['']
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)  # ensure the program exited gracefully.
+        self.assertEqual(len(self.stdout), 0)  # no output
+        self.assertEqual(self.stderr, self.module.__doc__.split("\n")[:-1])
+
+    def test_not_an_option(self):
+        """$ pdb_pipe tidy data/dummy.pdb"""
+
+        sys.argv = ['', 'tidy', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR! First argument is not an option: 'tidy'")
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
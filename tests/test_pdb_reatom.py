@@ -157,13 +157,34 @@ class TestTool(unittest.TestCase):
 
         self.assertEqual(serial_list, expected)
 
-    def test_too_many_atoms(self):
+    def test_hybrid36(self):
         """$ pdb_reatom -99998 data/dummy.pdb"""
 
         sys.argv = ['', '-99998', os.path.join(data_dir, 'dummy.pdb')]
 
         self.exec_module()
 
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 204)
+        self.assertEqual(len(self.stderr), 0)
+
+        records = (('ATOM', 'HETATM'))
+        serial_list = [l[6:11] for l in self.stdout if l.startswith(records)]
+
+        self.assertEqual(serial_list[:4], ['99998', '99999', 'A0000', 'A0001'])
+
+        # CONECT records follow the new serials
+        conect = [l for l in self.stdout if l.startswith('CONECT')]
+        self.assertTrue(conect)
+        self.assertTrue(all(l[6:11] in serial_list for l in conect))
+
+    def test_too_many_atoms(self):
+        """$ pdb_reatom -87440000 data/dummy.pdb"""
+
+        sys.argv = ['', '-87440000', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
         self.assertEqual(self.retcode, 1)
         self.assertEqual(len(self.stdout), 0)
         self.assertEqual(len(self.stderr), 1)
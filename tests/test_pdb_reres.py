@@ -195,13 +195,31 @@ class TestTool(unittest.TestCase):
         models_expected = [1, 2]
         self.assertEqual(models_int, models_expected)
 
-    def test_too_many_residues(self):
+    def test_hybrid36(self):
         """$ pdb_reres -9998 data/dummy.pdb"""
 
         sys.argv = ['', '-9998', os.path.join(data_dir, 'dummy.pdb')]
 
         self.exec_module()
 
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+
+        records = (('ATOM', 'HETATM'))
+        resid_list = []
+        for line in self.stdout:
+            if line.startswith(records) and line[22:26] not in resid_list:
+                resid_list.append(line[22:26])
+
+        self.assertEqual(resid_list[:4], ['9998', '9999', 'A000', 'A001'])
+
+    def test_too_many_residues(self):
+        """$ pdb_reres -2436100 data/dummy.pdb"""
+
+        sys.argv = ['', '-2436100', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
         self.assertEqual(self.retcode, 1)
         self.assertEqual(len(self.stdout), 0)
         self.assertEqual(len(self.stderr), 1)
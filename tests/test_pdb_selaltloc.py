@@ -533,6 +533,31 @@ class TestTool(unittest.TestCase):
                 ]
             )
 
+    def test_hybrid36(self):
+        """Serials and residue numbers in hybrid-36 are decoded"""
+
+        from pdbtools import _hybrid36, pdb_shiftres
+
+        def _shift(lines):
+            """Shifts residue numbers by 10000 and serials by 100000."""
+            records = ('ATOM', 'HETATM', 'ANISOU')
+            for line in pdb_shiftres.run(lines, 10000):
+                if line.startswith(records):
+                    serial = _hybrid36.decode_serial(line[6:11]) + 100000
+                    serial = _hybrid36.encode_serial(serial)
+                    line = line[:6] + serial + line[11:]
+                yield line
+
+        fpath = os.path.join(data_dir, 'dummy_altloc.pdb')
+        with open(fpath) as fh:
+            lines = fh.readlines()
+
+        shifted = list(_shift(lines))
+        for option in (None, 'A', 'B'):
+            expected = list(_shift(self.module.run(lines, option)))
+            result = list(self.module.run(shifted, option))
+            self.assertEqual(result, expected)
+
     def test_anisou_lines(self):
         """
         Test anisou.pdb is not altered because there are not altlocs.
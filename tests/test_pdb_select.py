@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `pdb_select`.
+"""
+
+import os
+import sys
+import unittest
+
+from config import data_dir
+from utils import OutputCapture
+
+
+class TestTool(unittest.TestCase):
+    """
+    Generic class for testing tools.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools.pdb_select'
+        self.module = __import__(name, fromlist=[''])
+
+    def exec_module(self):
+        """
+        Execs module.
+        """
+
+        with OutputCapture() as output:
+            try:
+                self.module.main()
+            except SystemExit as e:
+                self.retcode = e.code
+
+        self.stdout = output.stdout
+        self.stderr = output.stderr
+
+        return
+
+    def chain_tools(self, fname, tools):
+        """Runs several tools in sequence, with their `run` functions."""
+        with open(os.path.join(data_dir, fname)) as handle:
+            lines = handle.readlines()
+
+        for name, option in tools:
+            module = __import__('pdbtools.' + name, fromlist=[''])
+            lines = list(module.run(lines, option))
+        return [l.rstrip('\n') for l in lines]
+
+    def test_and(self):
+        """$ pdb_select -'chain A,B and resname ALA,ARG and not element H'"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        expression = 'chain A,B and resname ALA,ARG and not element H'
+        sys.argv = ['', '-' + expression, fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+
+        expected = self.chain_tools('dummy.pdb', [
+            ('pdb_selchain', set(['A', 'B'])),
+            ('pdb_selresname', set(['ALA', 'ARG'])),
+            ('pdb_delelem', set(['H'])),
+        ])
+        self.assertEqual(self.stdout, expected)
+
+    def test_or(self):
+        """$ pdb_select -'(resid 1:2 and name CA) or hetatm'"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-(resid 1:2 and name CA) or hetatm', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+
+        atoms = [l for l in self.stdout if l.startswith(('ATOM', 'HETATM'))]
+        for line in atoms:
+            if line.startswith('ATOM'):
+                self.assertEqual(line[12:16], ' CA ')
+                self.assertIn(int(line[22:26]), (1, 2))
+
+        self.assertEqual(len(atoms), 13)
+        self.assertEqual(len([l for l in atoms if l.startswith('ATOM')]), 4)
+
+    def test_ter(self):
+        """$ pdb_select -'name CA' keeps TER records"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-name CA', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+
+        n_ter = len([l for l in self.stdout if l.startswith('TER')])
+        self.assertEqual(n_ter, 3)
+
+    def test_file_not_found(self):
+        """$ pdb_select not_existing.pdb"""
+
+        afile = os.path.join(data_dir, 'not_existing.pdb')
+        sys.argv = ['', afile]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)  # exit code is 1 (error)
+        self.assertEqual(len(self.stdout), 0)  # nothing written to stdout
+        self.assertEqual(self.stderr[0][:22],
+                         "ERROR!! File not found")  # proper error message
+
+    def test_file_missing(self):
+        """$ pdb_select -'chain A'"""
+
+        sys.argv = ['', '-chain A']
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)  # no output
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! No data to process!")
+
+    def test_helptext(self):
+        """$ pdb_select"""
+
+        sys.argv = ['']
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)  # ensure the program exited gracefully.
+        self.assertEqual(len(self.stdout), 0)  # no output
+        self.assertEqual(self.stderr, self.module.__doc__.split("\n")[:-1])
+
+    def test_empty_expression(self):
+        """$ pdb_select data/dummy.pdb"""
+
+        sys.argv = ['', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! Selection expression is empty")
+
+    def test_invalid_selector(self):
+        """$ pdb_select -'chain A and color red' data/dummy.pdb"""
+
+        sys.argv = ['', '-chain A and color red',
+                    os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:34],
+                         "ERROR!! Unknown selector: 'color'.")
+
+    def test_invalid_expression(self):
+        """$ pdb_select -'(chain A or chain B' data/dummy.pdb"""
+
+        for expression, emsg in (('(chain A or chain B', "Missing ')'"),
+                                 ('chain A B', "Unexpected 'B'"),
+                                 ('chain and name CA', "Selector 'chain'"),
+                                 ('chain AB', 'Chain identifiers'),
+                                 ('resid 1:10:2', 'Steps are not')):
+
+            sys.argv = ['', '-' + expression,
+                        os.path.join(data_dir, 'dummy.pdb')]
+
+            self.exec_module()
+
+            self.assertEqual(self.retcode, 1)
+            self.assertEqual(len(self.stdout), 0)
+            self.assertEqual(self.stderr[0][:8 + len(emsg)],
+                             'ERROR!! ' + emsg)
+
+    def test_not_an_option(self):
+        """$ pdb_select 20 data/dummy.pdb"""
+
+        sys.argv = ['', '20', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR! First argument is not an option: '20'")
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -19,6 +19,7 @@
 Unit Tests for `pdb_selres`.
 """
 
+import io
 import os
 import sys
 import unittest
@@ -123,6 +124,92 @@ class TestTool(unittest.TestCase):
         self.assertEqual(len(self.stdout), 31)
         self.assertEqual(len(self.stderr), 0)
 
+    def test_range_stdin(self):
+        """$ cat data/dummy.pdb | pdb_selres -::5"""
+
+        class _Pipe(io.StringIO):
+            """Mock of stdin: not a terminal."""
+            def isatty(self):
+                return False
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as handle:
+            data = handle.read()
+
+        sys.argv = ['', '-::5']
+
+        stdin = sys.stdin
+        spool_size = self.module.SPOOL_MAX_SIZE
+        for max_size in (spool_size, 1000):  # in memory, then on disk
+            self.module.SPOOL_MAX_SIZE = max_size
+            sys.stdin = _Pipe(data)
+            try:
+                self.exec_module()
+            finally:
+                sys.stdin = stdin
+                self.module.SPOOL_MAX_SIZE = spool_size
+
+            # Validate results
+            self.assertEqual(self.retcode, 0)
+            self.assertEqual(len(self.stdout), 63)
+            self.assertEqual(len(self.stderr), 0)
+
+    def test_run_step(self):
+        """pdb_selres.run reads files and other iterators twice"""
+
+        from pdbtools import _ranges
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        resrange = _ranges.ResidueRanges.parse('::5')
+
+        with open(fpath) as fh:
+            header = next(fh)
+            from_file = list(self.module.run(fh, resrange))
+
+        with open(fpath) as fh:
+            lines = fh.readlines()
+        from_iter = list(self.module.run(iter(lines[1:]), resrange))
+
+        self.assertEqual(header, lines[0])
+        self.assertEqual(from_file, from_iter)
+        self.assertEqual(len(from_file), 62)  # without the HEADER line
+        self.assertTrue(resrange.has_steps())  # not modified by run
+
+    def test_hybrid36(self):
+        """pdb_selres -10001:10003 on residues numbered in hybrid-36"""
+
+        from pdbtools import _ranges, pdb_shiftres
+
+        with open(os.path.join(data_dir, 'dummy.pdb')) as fh:
+            shifted = list(pdb_shiftres.run(fh, 10000))
+
+        resrange = _ranges.ResidueRanges.parse('10001:10003')
+        lines = [l for l in self.module.run(shifted, resrange)
+                 if l.startswith('ATOM')]
+
+        self.assertEqual(len(lines), 91)
+        self.assertEqual(set(l[22:26] for l in lines),
+                         set(['A001', 'A002', 'A003']))
+
+    def test_range_chains(self):
+        """$ pdb_selres -A:1:3,B:5: data/dummy.pdb"""
+
+        # Simulate input
+        sys.argv = ['', '-A:1:3,B:5:', os.path.join(data_dir, 'dummy.pdb')]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 100)
+        self.assertEqual(len(self.stderr), 0)
+
+        records = ('ATOM', 'HETATM', 'TER', 'ANISOU')
+        residues = set(l[21:26] for l in self.stdout if l.startswith(records))
+        selected = set(['A   1', 'A   2', 'A   3', 'B   6', 'B   7',
+                        'B 301'])
+        self.assertEqual(residues, selected)
+
     def test_invalid_range_1(self):
         """$ pdb_selres --9998:: data/dummy.pdb"""
 
@@ -140,10 +227,10 @@ class TestTool(unittest.TestCase):
 
 
     def test_invalid_range_2(self):
-        """$ pdb_selres -:10000: data/dummy.pdb"""
+        """$ pdb_selres -:2436112: data/dummy.pdb"""
 
         # Simulate input
-        sys.argv = ['', '-:10000:', os.path.join(data_dir, 'dummy.pdb')]
+        sys.argv = ['', '-:2436112:', os.path.join(data_dir, 'dummy.pdb')]
 
         # Execute the script
         self.exec_module()
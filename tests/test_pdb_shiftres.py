@@ -155,13 +155,29 @@ class TestTool(unittest.TestCase):
 
         self.assertEqual(resid_list, expected)
 
-    def test_too_many_residues(self):
+    def test_hybrid36(self):
         """$ pdb_shiftres -9998 data/dummy.pdb"""
 
         sys.argv = ['', '-9998', os.path.join(data_dir, 'dummy.pdb')]
 
         self.exec_module()
 
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+
+        records = (('ATOM', 'HETATM'))
+        resids = set(l[22:26] for l in self.stdout if l.startswith(records))
+
+        self.assertIn('A000', resids)
+        self.assertNotIn('9998', resids)
+
+    def test_too_many_residues(self):
+        """$ pdb_shiftres -2436100 data/dummy.pdb"""
+
+        sys.argv = ['', '-2436100', os.path.join(data_dir, 'dummy.pdb')]
+
+        self.exec_module()
+
         self.assertEqual(self.retcode, 1)
         self.assertEqual(len(self.stdout), 0)
         self.assertEqual(len(self.stderr), 1)
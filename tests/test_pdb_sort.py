@@ -203,6 +203,144 @@ class TestTool(unittest.TestCase):
 
         self.assertEqual(altlocs, expected)
 
+    def test_ensemble(self):
+        """$ pdb_sort data/ensemble_OK.pdb"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.pdb')
+        sys.argv = ['', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+
+        records = [l[:6].strip() for l in self.stdout]
+        expected = ['HEADER', 'TITLE', 'MODEL', 'ATOM', 'ATOM', 'ENDMDL',
+                    'MODEL', 'ATOM', 'ATOM', 'ENDMDL']
+        self.assertEqual(records, expected)
+
+    def test_ensemble_missing_endmdl(self):
+        """$ pdb_sort data/ensemble_error_4.pdb"""
+
+        fpath = os.path.join(data_dir, 'ensemble_error_4.pdb')
+        sys.argv = ['', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! MODEL record found before ENDMDL: "
+                         "'MODEL        2'")
+
+    def test_ensemble_models_sorted(self):
+        """Each model of an ensemble is sorted on its own."""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        with open(fpath) as handle:
+            atoms = [l for l in handle if l.startswith(('ATOM', 'HETATM'))]
+
+        expected = list(self.module.run(atoms, 'CR'))
+
+        ensemble = []
+        for model_no in (1, 2):
+            ensemble.append('MODEL     {:>4d}\n'.format(model_no))
+            ensemble.extend(atoms)
+            ensemble.append('ENDMDL\n')
+
+        for max_lines in (None, 10):
+            result = list(self.module.run(ensemble, 'CR', max_lines))
+            self.assertEqual(result[0], 'MODEL        1\n')
+            self.assertEqual(result[1:len(expected) + 1], expected)
+            self.assertEqual(result[len(expected) + 1], 'ENDMDL\n')
+            self.assertEqual(result[len(expected) + 2:],
+                             ['MODEL        2\n'] + expected + ['ENDMDL\n'])
+
+    def test_hybrid36(self):
+        """Hybrid-36 serials and residue numbers are sorted numerically"""
+
+        fmt = 'ATOM  {:>5s}  CA  ALA A{:>4s}      0.000   0.000   0.000\n'
+        atoms = [fmt.format('A0001', 'A000'), fmt.format('A0000', '9999'),
+                 fmt.format('99999', 'A000'), fmt.format('    1', '   1')]
+
+        result = list(self.module.run(atoms, 'R'))
+        self.assertEqual([l[6:11] for l in result],
+                         ['    1', 'A0000', '99999', 'A0001'])
+
+        result = list(self.module.run(atoms, 'C'))
+        self.assertEqual([l[6:11] for l in result],
+                         ['    1', '99999', 'A0000', 'A0001'])
+
+    def test_max_lines(self):
+        """$ pdb_sort -CR:10 data/dummy.pdb"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-CR', fpath]
+        self.exec_module()
+        expected = self.stdout
+
+        sys.argv = ['', '-CR:10', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+        self.assertEqual(self.stdout, expected)
+
+    def test_max_lines_anisou(self):
+        """$ pdb_sort -R:3 data/anisou_altloc.pdb"""
+
+        fpath = os.path.join(data_dir, 'anisou_altloc.pdb')
+        sys.argv = ['', '-R', fpath]
+        self.exec_module()
+        expected = self.stdout
+
+        sys.argv = ['', '-R:3', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stderr), 0)  # no errors
+        self.assertEqual(self.stdout, expected)
+
+    def test_max_lines_anisou_apart(self):
+        """ANISOU records are matched to their atoms anywhere in the model"""
+
+        fpath = os.path.join(data_dir, 'anisou.pdb')
+        with open(fpath) as handle:
+            lines = handle.readlines()
+
+        # ANISOU records after all atoms, in reverse order.
+        atoms = [l for l in lines if not l.startswith('ANISOU')]
+        anisou = [l for l in lines if l.startswith('ANISOU')]
+        data = atoms + anisou[::-1]
+
+        expected = list(self.module.run(data, 'CR'))
+        self.assertEqual(len(expected), len(lines))
+        for max_lines in (1, 3, 10):
+            result = list(self.module.run(data, 'CR', max_lines))
+            self.assertEqual(result, expected)
+
+    def test_invalid_max_lines(self):
+        """$ pdb_sort -C:0 data/dummy.pdb"""
+
+        sys.argv = ['', '-C:0', os.path.join(data_dir, 'dummy.pdb')]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0][:39],
+                         "ERROR!! Maximum number of lines must be")
+
     def test_file_not_found(self):
         """$ pdb_sort not_existing.pdb"""
 
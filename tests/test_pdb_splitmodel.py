@@ -93,6 +93,36 @@ class TestTool(unittest.TestCase):
                 n_lines = len(handle.readlines())
                 self.assertEqual(n_lines, 2)
 
+    def test_compressed(self):
+        """$ pdb_splitmodel data/ensemble_OK.pdb.gz"""
+        import gzip
+
+        # Compress input file into tempdir
+        src = os.path.join(data_dir, 'ensemble_OK.pdb')
+        dst = os.path.join(self.tempdir, 'ensemble_OK.pdb.gz')
+        with open(src, 'rb') as fin, gzip.open(dst, 'wb') as fout:
+            fout.write(fin.read())
+        sys.argv = ['', dst]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)  # ensure the program exited OK.
+        self.assertEqual(len(self.stdout), 0)  # no output
+        self.assertEqual(len(self.stderr), 0)  # no errors
+
+        # Read files created by script
+        ofiles = sorted(f for f in os.listdir(self.tempdir)
+                        if f.startswith('ensemble_OK_'))
+        self.assertEqual(ofiles, ['ensemble_OK_1.pdb.gz',
+                                  'ensemble_OK_2.pdb.gz'])
+
+        for fpath in ofiles:
+            with gzip.open(os.path.join(self.tempdir, fpath), 'rt') as handle:
+                n_lines = len(handle.readlines())
+                self.assertEqual(n_lines, 2)
+
     def test_run_iterable(self):
         """pdb_splitmodel.run(iterable)"""
         from pdbtools import pdb_splitmodel
@@ -224,6 +224,20 @@ class TestTool(unittest.TestCase):
         self.assertEqual(len(self.stdout[-1]), 80)
 
 
+    def test_hybrid36(self):
+        """Serials above 99999 are written in hybrid-36"""
+
+        fmt = 'ATOM  {:>5s}  CA  ALA {:1s}   1       0.000   0.000   0.000\n'
+        atoms = [fmt.format('99997', 'A'), fmt.format('99998', 'A'),
+                 fmt.format('99999', 'B')]
+
+        result = list(self.module.run(iter(atoms)))
+        records = [(l[:6], l[6:11]) for l in result]
+        self.assertEqual(records, [('ATOM  ', '99997'), ('ATOM  ', '99998'),
+                                   ('TER   ', '99999'),
+                                   ('ATOM  ', 'A0000'), ('TER   ', 'A0001'),
+                                   ('END   ', '     ')])
+
     def test_file_not_found(self):
         """$ pdb_tidy not_existing.pdb"""
 
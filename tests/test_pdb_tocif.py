@@ -20,7 +20,9 @@ Unit Tests for `pdb_tocif`.
 """
 
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from config import data_dir
@@ -187,6 +189,71 @@ class TestTool(unittest.TestCase):
         n_fields = list(set(map(lambda x: len(x.split()), atom_lines)))
         self.assertEqual(n_fields, [21])
 
+    def test_outdir(self):
+        """$ pdb_tocif -nproc:2 -outdir:<dir> data/"""
+
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir)
+
+        sys.argv = ['', '-nproc:2', '-outdir:' + outdir,
+                    os.path.join(data_dir, 'dummy.pdb'),
+                    os.path.join(data_dir, 'ensemble_OK.pdb')]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(len(self.stderr), 3)
+        self.assertEqual(self.stderr[-1],
+                         'Converted 2 files, skipped 0, failed 0')
+
+        with open(os.path.join(outdir, 'dummy.cif')) as handle:
+            result = handle.read()
+        with open(os.path.join(data_dir, 'dummy.pdb')) as handle:
+            self.assertEqual(result, ''.join(self.module.run(handle)))
+
+    def test_bcif_run(self):
+        """$ pdb_tocif.run(fhandler, binary=True)"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        with open(fpath, 'r') as fin:
+            output = list(self.module.run(fin, binary=True))
+
+        self.assertEqual(len(output), 1)
+        self.assertIsInstance(output[0], bytes)
+        self.assertTrue(output[0].startswith(b'\x83'))  # 3-item map
+        self.assertIn(b'_atom_site', output[0])
+        self.assertIn(b'dummy', output[0])
+
+    def test_bcif_outdir(self):
+        """$ pdb_tocif -bcif -outdir:<dir> data/dummy.pdb"""
+
+        outdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outdir)
+
+        sys.argv = ['', '-bcif', '-outdir:' + outdir,
+                    os.path.join(data_dir, 'dummy.pdb')]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(self.stderr[-1],
+                         'Converted 1 files, skipped 0, failed 0')
+
+        with open(os.path.join(outdir, 'dummy.bcif'), 'rb') as handle:
+            result = handle.read()
+        with open(os.path.join(data_dir, 'dummy.pdb')) as handle:
+            self.assertEqual(result, self.module.to_bcif(handle))
+
+    def test_nproc_without_outdir(self):
+        """$ pdb_tocif -nproc:2 data/dummy.pdb"""
+
+        sys.argv = ['', '-nproc:2', os.path.join(data_dir, 'dummy.pdb')]
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         'ERROR!! The -nproc option requires -outdir')
+
     def test_file_not_found(self):
         """$ pdb_tocif not_existing.pdb"""
 
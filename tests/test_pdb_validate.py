@@ -19,8 +19,11 @@
 Unit Tests for `pdb_validate`.
 """
 
+import json
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from config import data_dir
@@ -91,6 +94,179 @@ class TestTool(unittest.TestCase):
         self.assertEqual(self.stdout,
                          ["It *seems* everything is OK."])
 
+    def test_report_json(self):
+        """$ pdb_validate -report:json data/dummy.pdb"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-report:json', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(len(self.stdout), 1)
+
+        report = json.loads(self.stdout[0])
+        self.assertEqual(report['file'], fpath)
+        self.assertFalse(report['valid'])
+        self.assertEqual(report['counts'], {'Short line': 70,
+                                            'At. Elemt': 18,
+                                            'At. Charg': 42})
+        self.assertEqual(report['errors'], 130)
+        self.assertEqual(len(report['details']), 130)
+        self.assertEqual(report['details'][-1],
+                         {'line': 203, 'error': 'Short line'})
+
+    def test_report_tsv(self):
+        """$ pdb_validate -report:tsv data/ensemble_OK.pdb"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.pdb')
+        sys.argv = ['', '-report:tsv', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stderr), 0)
+        self.assertEqual(len(self.stdout), 2)
+
+        header = self.stdout[0].split('\t')
+        row = self.stdout[1].split('\t')
+        self.assertEqual(header[:6], ['file', 'status', 'seconds', 'errors',
+                                      'Short line', 'Long line'])
+        self.assertEqual(len(header), 4 + 21)
+        self.assertEqual(row[:2], [fpath, 'OK'])
+        self.assertEqual(row[3:], ['0'] * 22)
+
+    def test_single_regex(self):
+        """The line regex agrees with the field-by-field checks"""
+
+        line = ('ATOM      1  N   ASN A   1      22.066  40.557   0.420'
+                '  1.00  0.00           N  ')
+        self.assertTrue(self.module._VALID_ATOM(line))
+
+        checks = self.module._FIELD_CHECKS
+        for name, cols, check, _ in checks:
+            for char in ' A-.9a#\t':
+                new_line = line[:cols.start] + char + line[cols.start + 1:]
+                expected = all(c(new_line[f]) for _, f, c, _ in checks)
+                self.assertEqual(bool(self.module._VALID_ATOM(new_line)),
+                                 expected, (name, char))
+
+        self.assertFalse(self.module._VALID_ATOM(line + ' '))
+        self.assertFalse(self.module._VALID_ATOM(line[:-1]))
+
+    def test_invalid_report(self):
+        """$ pdb_validate -report:xml data/dummy.pdb"""
+
+        sys.argv = ['', '-report:xml', os.path.join(data_dir, 'dummy.pdb')]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 0)
+        self.assertEqual(self.stderr[0],
+                         "ERROR!! Report format must be one of json, tsv: 'xml'")
+
+    def test_first_error(self):
+        """$ pdb_validate -firsterror data/dummy.pdb"""
+
+        fpath = os.path.join(data_dir, 'dummy.pdb')
+        sys.argv = ['', '-firsterror', fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(self.stdout[0], '[!] Line 7 is short: 48 < 80')
+        self.assertEqual(len(self.stdout), 4)  # error + footer
+
+    def test_summary(self):
+        """$ pdb_validate -summary data/dummy.pdb data/ensemble_OK.pdb"""
+
+        files = [os.path.join(data_dir, f)
+                 for f in ('dummy.pdb', 'ensemble_OK.pdb')]
+        sys.argv = ['', '-summary'] + files
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(len(self.stdout), 2)
+        self.assertEqual(self.stdout[0].split()[0], 'INVALID')
+        self.assertTrue(self.stdout[0].endswith('dummy.pdb: 130 errors'))
+        self.assertEqual(self.stdout[1].split()[0], 'OK')
+        self.assertTrue(self.stdout[1].endswith('ensemble_OK.pdb'))
+        self.assertEqual(self.stderr[0].split(': ')[1].split(' (')[0],
+                         '1 OK, 1 invalid, 0 unreadable')
+
+    def test_many_files(self):
+        """$ pdb_validate data/ensemble_OK.pdb data/dummy.pdb"""
+
+        files = [os.path.join(data_dir, f)
+                 for f in ('ensemble_OK.pdb', 'dummy.pdb')]
+        sys.argv = [''] + files
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 1)
+        self.assertEqual(self.stdout[0].split()[0], 'OK')
+        self.assertEqual(self.stdout[1].split()[0], 'INVALID')
+        # Status lines, then errors and footer as with a single file
+        self.assertEqual(len(self.stdout), 2 + 253)
+        self.assertEqual(self.stdout[2], '[!] Line 7 is short: 48 < 80')
+
+    def test_all_valid(self):
+        """$ pdb_validate -summary data/ensemble_OK.pdb (x2)"""
+
+        fpath = os.path.join(data_dir, 'ensemble_OK.pdb')
+        sys.argv = ['', '-summary', fpath, fpath]
+
+        # Execute the script
+        self.exec_module()
+
+        self.assertEqual(self.retcode, 0)
+        self.assertEqual(len(self.stdout), 2)
+
+    def test_directory_nproc(self):
+        """$ pdb_validate -nproc:2 -firsterror -report:json <dir>"""
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        for fname in ('dummy.pdb', 'ensemble_OK.pdb'):
+            shutil.copy(os.path.join(data_dir, fname), tempdir)
+        with open(os.path.join(tempdir, 'corrupt.pdb.gz'), 'wb') as handle:
+            handle.write(b'\x1f\x8bnot gzipped data')
+        with open(os.path.join(tempdir, 'notes.txt'), 'w') as handle:
+            handle.write('not a PDB file\n')
+
+        sys.argv = ['', '-nproc:2', '-firsterror', '-report:json', tempdir]
+
+        # Execute the script
+        self.exec_module()
+
+        # Validate results
+        self.assertEqual(self.retcode, 1)
+        reports = [json.loads(line) for line in self.stdout]
+        self.assertEqual([os.path.basename(r['file']) for r in reports],
+                         ['corrupt.pdb.gz', 'dummy.pdb', 'ensemble_OK.pdb'])
+        self.assertEqual([r['status'] for r in reports],
+                         ['ERROR', 'INVALID', 'OK'])
+        self.assertIn('failure', reports[0])
+        self.assertEqual(reports[1]['details'],
+                         [{'line': 7, 'error': 'Short line'}])
+        self.assertTrue(all(r['seconds'] >= 0 for r in reports))
+        self.assertEqual(self.stderr[0].split(': ')[1].split(' (')[0],
+                         '1 OK, 1 invalid, 1 unreadable')
+
     def test_file_not_found(self):
         """$ pdb_validate not_existing.pdb"""
 
@@ -128,8 +304,7 @@ class TestTool(unittest.TestCase):
 
         self.assertEqual(self.retcode, 1)
         self.assertEqual(len(self.stdout), 0)
-        self.assertEqual(self.stderr[0][:36],
-                         "ERROR!! Script takes 1 argument, not")
+        self.assertEqual(self.stderr[0], "ERROR!! Invalid option: '-A'")
 
 
 if __name__ == '__main__':
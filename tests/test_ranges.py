@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_ranges`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestResidueRanges(unittest.TestCase):
+    """
+    Tests for the interval-based residue selections.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._ranges'
+        self.module = __import__(name, fromlist=[''])
+
+    def select(self, option, residues):
+        """Returns the selected residues of a list of (chain, resid)."""
+        selection = self.module.ResidueRanges.parse(option)
+        is_selected = selection.matcher()
+        res_ids = ['{}{:>4d}'.format(c, r) for c, r in residues]
+        return [r for r, res_id in zip(residues, res_ids)
+                if is_selected(res_id)]
+
+    def test_merge(self):
+        """Overlapping and adjacent ranges are merged"""
+
+        selection = self.module.ResidueRanges.parse('1:5,3:8,9,20:30')
+        self.assertEqual(selection._merged(), {None: [[1, 10], [20, 31]]})
+
+    def test_huge_range(self):
+        """Open ranges are stored as a single interval"""
+
+        selection = self.module.ResidueRanges.parse(':')
+        self.assertEqual(selection._merged(), {None: [[-999, 2436112]]})
+
+    def test_chains(self):
+        """Ranges can be restricted to a chain"""
+
+        residues = [(c, r) for c in 'AB' for r in range(1, 11)]
+        result = self.select('A:2:4:,B:9:', residues)
+        expected = [('A', 2), ('A', 3), ('A', 4), ('B', 9), ('B', 10)]
+        self.assertEqual(result, expected)
+
+    def test_step(self):
+        """Steps count residues from the start of the file"""
+
+        residues = [('A', r) for r in (1, 2, 5, 6, 7, 8)]
+        result = self.select('2:7:2', residues)
+        self.assertEqual(result, [('A', 5), ('A', 7)])
+
+        result = self.select('A:1:8:3,B::', residues)
+        self.assertEqual(result, [('A', 1), ('A', 6)])
+
+    def test_hybrid36(self):
+        """Hybrid-36 residue numbers are decoded"""
+
+        selection = self.module.ResidueRanges.parse('9999:10001,A:12000:')
+        for as_bytes in (False, True):
+            is_selected = selection.matcher(as_bytes=as_bytes)
+            res_ids = ['A9999', 'AA000', 'AA001', 'AA002', 'BA002', 'AA7LS']
+            if as_bytes:
+                res_ids = [r.encode('ascii') for r in res_ids]
+            result = [is_selected(r) for r in res_ids]
+            self.assertEqual(result, [True, True, True, False, False, True])
+
+    def test_resolve_steps(self):
+        """Steps can be resolved to residue numbers"""
+
+        selection = self.module.ResidueRanges.parse('::2,A:7:7')
+        self.assertTrue(selection.has_steps())
+
+        residues = [('A', 1), ('A', 2), ('A', 3), ('B', 2)]
+        resolved = selection.resolve_steps(residues)
+        self.assertTrue(selection.has_steps())  # unchanged
+        self.assertFalse(resolved.has_steps())
+        self.assertEqual(resolved._merged(),
+                         {None: [[1, 2], [3, 4]], 'A': [[7, 8]]})
+
+    def test_bytes(self):
+        """Matchers can take bytes"""
+
+        selection = self.module.ResidueRanges.parse('A:1:1:,B:3:')
+        is_selected = selection.matcher(as_bytes=True)
+        self.assertTrue(is_selected(b'A   1'))
+        self.assertFalse(is_selected(b'A   3'))
+        self.assertTrue(is_selected(b'B   3'))
+
+    def test_errors(self):
+        """Invalid selections raise RangeError"""
+
+        cases = [
+            ('A:B', 'start', 'number'),
+            ('1:-9998', 'end', 'bounds'),
+            ('1:5:0', 'step', 'bounds'),
+            ('5:1', 'range', 'order'),
+            (':::', 'range', 'format'),
+            ('AB:1:5', 'chain', 'format'),
+        ]
+        for option, field, reason in cases:
+            with self.assertRaises(self.module.RangeError) as context:
+                self.module.ResidueRanges.parse(option)
+            self.assertEqual(context.exception.field, field)
+            self.assertEqual(context.exception.reason, reason)
+
+    def test_as_ranges(self):
+        """Collections of residue numbers are converted to ranges"""
+
+        selection = self.module.as_ranges(set([1, 2, 3, 7]))
+        self.assertEqual(selection._merged(), {None: [[1, 4], [7, 8]]})
+        self.assertIs(self.module.as_ranges(selection), selection)
+
+    def test_as_ranges_step(self):
+        """Steps apply to the residues in the collection"""
+
+        residues = [('A', r) for r in (1, 2, 3, 4, 5, 7, 8, 9)]
+        selection = self.module.as_ranges(set([2, 3, 4, 5, 7]), 2)
+        is_selected = selection.matcher()
+        result = [r for r in residues
+                  if is_selected('{}{:>4d}'.format(*r))]
+        self.assertEqual(result, [('A', 3), ('A', 5)])
+
+        with self.assertRaises(ValueError):
+            self.module.as_ranges(selection, 2)
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit Tests for `_records`.
+"""
+
+import os
+import sys
+import unittest
+
+
+class TestMemo(unittest.TestCase):
+    """
+    Tests for the bounded cache of formatted values.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._records'
+        self.module = __import__(name, fromlist=[''])
+
+    def test_cache(self):
+        """Values are computed once per key"""
+
+        calls = []
+
+        def func(key):
+            calls.append(key)
+            return key * 2
+
+        memo = self.module.Memo(func)
+        self.assertEqual(memo['a'], 'aa')
+        self.assertEqual(memo['a'], 'aa')
+        self.assertEqual(memo['b'], 'bb')
+        self.assertEqual(calls, ['a', 'b'])
+
+    def test_max_size(self):
+        """The cache is emptied when full"""
+
+        memo = self.module.Memo(str, max_size=2)
+        memo[1], memo[2], memo[3]
+        self.assertEqual(memo, {3: '3'})
+
+
+class TestPDBAtomWriter(unittest.TestCase):
+    """
+    Tests for the writer of PDB lines.
+    """
+
+    columns = {
+        'record': 0, 'atname': 1, 'altloc': 2, 'resname': 3, 'chainid': 4,
+        'resnum': 5, 'icode': 6, 'x': 7, 'y': 8, 'z': 9, 'occ': 10,
+        'bfactor': 11, 'element': 12, 'charge': 13,
+    }
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._records'
+        self.module = __import__(name, fromlist=[''])
+        self.write = self.module.PDBAtomWriter(self.columns).write
+
+    def test_write(self):
+        """Rows are written as PDB lines"""
+
+        rows = [
+            ['ATOM', 'N', '.', 'ALA', 'A', '1', '?', '1.0', '-2.5', '30.125',
+             '1.00', '15.50', 'N', '?'],
+            ['ATOM', 'CA', 'B', 'ALA', 'A', '1', '?', '2.0', '-2.5', '30.125',
+             '0.50', '15.50', 'C', '?'],
+            ['HETATM', 'FE', '.', 'HEM', 'A', '10000', 'B', '1.0', '1.0',
+             '1.0', '?', '?', 'FE', '2'],
+            ['HETATM', 'CL', '.', 'CL', 'B', '-5', '.', '1.0', '1.0', '1.0',
+             '1.00', '0.00', 'CL', '-1'],
+        ]
+        lines = [self.write(row, i) for i, row in enumerate(rows, 99998)]
+
+        expected = [
+            'ATOM  99998  N   ALA A   1       1.000  -2.500  30.125  1.00 15.50      A   N   \n',
+            'ATOM  99999  CA BALA A   1       2.000  -2.500  30.125  0.50 15.50      A   C   \n',
+            'HETATMA0000 FE   HEM AA000B      1.000   1.000   1.000  1.00  0.00      A   FE2+\n',
+            'HETATMA0001 CL   CL  B  -5       1.000   1.000   1.000  1.00  0.00      B   CL1-\n',
+        ]
+        self.assertEqual(lines, expected)
+
+    def test_residue_reuse(self):
+        """Consecutive atoms of different residues are not mixed up"""
+
+        row = ['ATOM', 'CA', '.', 'ALA', 'A', '1', '?', '0', '0', '0', '1',
+               '0', 'C', '?']
+        first = self.write(row, 1)
+        row[5] = '2'
+        second = self.write(row, 2)
+        self.assertEqual(first[22:26], '   1')
+        self.assertEqual(second[22:26], '   2')
+
+    def test_too_large(self):
+        """Atoms that do not fit in a PDB line raise FormatLimitError"""
+
+        error = self.module.FormatLimitError
+        row = ['ATOM', 'CA', '.', 'ALA', 'AB', '1', '?', '0', '0', '0', '1',
+               '0', 'C', '?']
+        self.assertRaises(error, self.write, row, 1)
+
+        row[4], row[5] = 'A', '2436112'
+        self.assertRaises(error, self.write, row, 1)
+
+        row[5] = '1'
+        self.assertRaises(error, self.write, row, 87440032)
+
+
+class TestCIFAtomWriter(unittest.TestCase):
+    """
+    Tests for the writer of mmCIF rows.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._records'
+        self.module = __import__(name, fromlist=[''])
+        self.write = self.module.CIFAtomWriter().write
+
+    def test_write(self):
+        """PDB lines are written as mmCIF rows"""
+
+        lines = [
+            'ATOM      1  N   ALA A   1      -1.000   2.500  30.125  1.00 15.50           N  \n',
+            "HETATM    2  O5'BNAG BA000A     1.000   1.000   1.000  0.50  0.00            O1-\n",
+            'ATOM      3  CA  ALA A   1       1.000   1.000   1.000  1.00  0.00\n',
+        ]
+        rows = [self.write(line, i, 1) for i, line in enumerate(lines, 1)]
+
+        expected = [
+            'ATOM       1 N  N      ? ALA A   ? 1     ?     -1.000      2.500     30.125      1.000     15.500 ? 1     ALA A N    1\n',
+            'HETATM     2 O  "O5\'"  B NAG B   ? 10000 A      1.000      1.000      1.000      0.500      0.000 1- 10000 NAG B "O5\'" 1\n',
+            'ATOM       3 ?  CA     ? ALA A   ? 1     ?      1.000      1.000      1.000      1.000      0.000 ? 1     ALA A CA   1\n',
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_columns(self):
+        """Rows have one field per tag"""
+
+        line = 'ATOM      1  N   ALA A   1      -1.000   2.500  30.125  1.00 15.50           N  \n'
+        row = self.write(line, 1, 2)
+        self.assertEqual(len(row.split()), len(self.module.CIFAtomWriter.TAGS))
+        self.assertTrue(row.endswith(' 2\n'))
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 1118 João Pedro Rodrigues
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit Tests for `_stream`.
+"""
+
+import bz2
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from config import data_dir
+from utils import OutputCapture
+
+
+class TestStream(unittest.TestCase):
+    """
+    Tests for the stream helper functions.
+    """
+
+    def setUp(self):
+        # Dynamically import the module
+        name = 'pdbtools._stream'
+        self.module = __import__(name, fromlist=[''])
+        self.tempdir = tempfile.mkdtemp()  # set temp dir
+
+        self.src = os.path.join(data_dir, 'dummy.pdb')
+        with open(self.src) as handle:
+            self.lines = handle.readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def compress(self, opener, ext):
+        """Writes a compressed copy of dummy.pdb to the temp dir."""
+        dst = os.path.join(self.tempdir, 'dummy.pdb' + ext)
+        with open(self.src, 'rb') as fin:
+            with opener(dst, 'wb') as fout:
+                fout.write(fin.read())
+        return dst
+
+    def test_open_file_plain(self):
+        """open_file reads uncompressed files"""
+        with self.module.open_file(self.src) as handle:
+            self.assertEqual(handle.readlines(), self.lines)
+
+    def test_open_file_gzip(self):
+        """open_file decompresses gzip files"""
+        fpath = self.compress(gzip.open, '.gz')
+        with self.module.open_file(fpath) as handle:
+            self.assertEqual(handle.name, fpath)
+            self.assertEqual(handle.readlines(), self.lines)
+
+    def test_open_file_bz2(self):
+        """open_file decompresses bzip2 files"""
+        fpath = self.compress(bz2.BZ2File, '.bz2')
+        with self.module.open_file(fpath) as handle:
+            self.assertEqual(handle.name, fpath)
+            self.assertEqual(handle.readlines(), self.lines)
+
+    def test_open_file_magic(self):
+        """open_file ignores the extension of the file"""
+        fpath = self.compress(gzip.open, '')
+        with self.module.open_file(fpath) as handle:
+            self.assertEqual(handle.readlines(), self.lines)
+
+    def test_open_output(self):
+        """open_output compresses according to the extension"""
+        fpath = os.path.join(self.tempdir, 'out.pdb.gz')
+        with self.module.open_output(fpath) as handle:
+            handle.write(''.join(self.lines))
+
+        with gzip.open(fpath, 'rt') as handle:
+            self.assertEqual(handle.readlines(), self.lines)
+
+    def test_split_compression_ext(self):
+        """split_compression_ext strips known extensions only"""
+        split = self.module.split_compression_ext
+        self.assertEqual(split('1ctf.pdb.gz'), ('1ctf.pdb', '.gz'))
+        self.assertEqual(split('1ctf.pdb.xz'), ('1ctf.pdb', '.xz'))
+        self.assertEqual(split('1ctf.pdb'), ('1ctf.pdb', ''))
+
+    def test_tool_compressed_input(self):
+        """$ pdb_selchain -A data/dummy.pdb.gz"""
+        from pdbtools import pdb_selchain
+
+        fpath = self.compress(gzip.open, '.gz')
+        sys.argv = ['', '-A', fpath]
+
+        with OutputCapture() as output:
+            try:
+                pdb_selchain.main()
+            except SystemExit as e:
+                retcode = e.code
+
+        self.assertEqual(retcode, 0)
+        self.assertEqual(len(output.stdout), 76)  # same as dummy.pdb
+        self.assertEqual(len(output.stderr), 0)
+
+
+if __name__ == '__main__':
+    from config import test_dir
+
+    mpath = os.path.abspath(os.path.join(test_dir, '..'))
+    sys.path.insert(0, mpath)  # so we load dev files before  any installation
+
+    unittest.main()